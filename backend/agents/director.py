@@ -11,6 +11,9 @@ from dotenv import load_dotenv
 from backend.utils.firestore_helpers import upload_to_storage, update_scene
 from backend.services.veo_service import VeoService, GenerationMode
 from backend.services.agent_framework import enhance_motion_prompt
+from backend.services.ken_burns import DEFAULT_COMPOSITION
+# Same module path VeoService raises from, so the exception class matches
+from services.cancellation import JobCancelled
 
 load_dotenv()
 
@@ -126,6 +129,10 @@ class DirectorAgent:
                     "status": "completed"
                 }
         
+        except JobCancelled as e:
+            if save_to_storage:
+                update_scene(project_id, scene_id, {"status": "cancelled", "error": str(e)})
+            raise
         except Exception as e:
             error_message = str(e)
             print(f"Error in DirectorAgent: {error_message}")
@@ -135,10 +142,7 @@ class DirectorAgent:
                 update_scene(project_id, scene_id, {
                     "status": "error",
                     "error": error_message,
-                    "videoComposition": {  # Fallback
-                        "type": "ken_burns",
-                        "config": {"duration": 5}
-                    }
+                    "videoComposition": DEFAULT_COMPOSITION  # Fallback, rendered by services/ken_burns.py
                 })
             
             raise RuntimeError(f"Video generation failed: {error_message}")
@@ -1,4 +1,5 @@
 from google.adk.agents import Agent
+from services.context_cache import context_cache
 from tools.director_tools import generate_video_task
 
 # Define the Director Agent
@@ -27,5 +28,7 @@ director_agent = Agent(
     
     Always call this tool to generate the video.
     """,
-    tools=[generate_video_task]
+    tools=[generate_video_task],
+    # Serve the static instruction/tool prefix from a Gemini context cache
+    before_model_callback=context_cache.before_model_callback
 )
@@ -2,6 +2,7 @@ import time
 import logging
 from backend.tools import director_tools
 from backend.utils.firestore_helpers import update_scene
+from backend.services.ken_burns import DEFAULT_COMPOSITION
 
 logger = logging.getLogger("DirectorAgent")
 
@@ -57,8 +58,5 @@ def process_video_task(scene_id: str, image_url: str, prompt: str, project_id: s
         # Fallback
         update_scene(project_id, scene_id, {
             "status": "error",
-            "videoComposition": {
-                "type": "ken_burns",
-                "config": {"zoomEnd": 1.2, "duration": 5}
-            }
+            "videoComposition": DEFAULT_COMPOSITION
         })
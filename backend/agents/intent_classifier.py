@@ -0,0 +1,166 @@
+"""
+Local intent classifier for the router.
+Answers confident cases without a model round-trip: keyword rules first,
+then a multinomial Naive Bayes over bag-of-words (NumPy) trained from the
+decisions the LLM router has logged. Returns None when unsure so the caller
+can fall back to router_agent.
+"""
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+INTENTS = ("NEW_PROJECT", "REVISE_SCENE", "REGENERATE_IMAGE", "OTHER")
+DECISION_LOG = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "router_decisions.jsonl")
+
+CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_FAST_PATH_CONFIDENCE", "0.9"))
+MIN_TRAINING_EXAMPLES = 20
+RETRAIN_EVERY = 10
+SMOOTHING = 1.0
+
+# Lookahead that fails anywhere in a text mentioning an image or video (use with re.S)
+_NO_VISUALS = r"^(?!.*\b(image|images|picture|pictures|photo|photos|video|videos|clip|clips|frame|frames|background)\b)"
+
+# Each rule votes for one intent; a rule hit is only trusted if no other intent matched
+RULES: Dict[str, List[re.Pattern]] = {
+    "NEW_PROJECT": [
+        # Only explicit "new project" phrasing: "make the video slower" or "start the video
+        # with a close-up" are edits, and looser wording is left to the model
+        re.compile(r"\b(new|start a new|create a new|make a new)\s+(project|story|movie|film)\b", re.I),
+        re.compile(r"(새|새로운)\s*(프로젝트|이야기|영화)"),
+    ],
+    "REVISE_SCENE": [
+        # Not when the request names a visual: "edit the scene 2 image" is an image or
+        # video edit, which is left to the model
+        re.compile(_NO_VISUALS + r".*\b(rewrite|revise|edit|change|fix)\b.*\b(script|dialogue|line|lines|scene|ending)\b", re.I | re.S),
+        re.compile(_NO_VISUALS + r".*\bmake (it|the scene) (funnier|shorter|longer|darker|sadder)\b", re.I | re.S),
+        re.compile(r"(대사|대본|스크립트).*(수정|고쳐|바꿔)"),
+    ],
+    "REGENERATE_IMAGE": [
+        re.compile(r"\b(redraw|regenerate|repaint|re-render)\b", re.I),
+        re.compile(r"\b(change|fix)\b.*\b(image|picture|background|color|colour|lighting)\b", re.I),
+        re.compile(r"(그림|이미지|배경).*(다시|바꿔)"),
+    ],
+}
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def rule_classify(text: str) -> Optional[str]:
+    """Returns the intent when exactly one intent's rules match."""
+    hits = {intent for intent, patterns in RULES.items() if any(p.search(text) for p in patterns)}
+    return hits.pop() if len(hits) == 1 else None
+
+
+class NaiveBayesIntentModel:
+    """Multinomial Naive Bayes over a bag-of-words, stored as dense NumPy arrays."""
+
+    def __init__(self, examples: List[Tuple[str, str]]):
+        vocabulary = sorted({token for text, _ in examples for token in tokenize(text)})
+        self.index = {token: i for i, token in enumerate(vocabulary)}
+        self.labels = [intent for intent in INTENTS if any(label == intent for _, label in examples)]
+        label_index = {label: i for i, label in enumerate(self.labels)}
+
+        counts = np.zeros((len(self.labels), len(vocabulary)), dtype=np.float64)
+        priors = np.zeros(len(self.labels), dtype=np.float64)
+        for text, label in examples:
+            row = label_index[label]
+            priors[row] += 1
+            for token in tokenize(text):
+                counts[row, self.index[token]] += 1
+
+        smoothed = counts + SMOOTHING
+        self.log_likelihood = np.log(smoothed / smoothed.sum(axis=1, keepdims=True))
+        self.log_prior = np.log(priors / priors.sum())
+
+    def predict(self, text: str) -> Tuple[Optional[str], float]:
+        """Returns (intent, posterior probability)."""
+        x = np.zeros(len(self.index), dtype=np.float64)
+        known = False
+        for token in tokenize(text):
+            i = self.index.get(token)
+            if i is not None:
+                x[i] += 1
+                known = True
+        if not known or len(self.labels) < 2:
+            return None, 0.0
+
+        scores = self.log_prior + self.log_likelihood @ x
+        scores -= scores.max()
+        probs = np.exp(scores)
+        probs /= probs.sum()
+        best = int(np.argmax(probs))
+        return self.labels[best], float(probs[best])
+
+
+class IntentClassifier:
+    """Rules + learned model in front of the LLM router, retrained from its logged decisions."""
+
+    def __init__(self, log_path: str = DECISION_LOG):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._model: Optional[NaiveBayesIntentModel] = None
+        self._examples: Dict[str, str] = {}
+        self._trained_on = 0
+        self._load_log()
+
+    def _load_log(self):
+        if not os.path.exists(self.log_path):
+            return
+        with open(self.log_path, "r") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if entry.get("source") == "llm" and entry.get("intent") in INTENTS:
+                    self._examples[entry["text"]] = entry["intent"]
+        self._maybe_retrain()
+
+    def _maybe_retrain(self):
+        count = len(self._examples)
+        if count < MIN_TRAINING_EXAMPLES:
+            return
+        if self._model is None or count - self._trained_on >= RETRAIN_EVERY:
+            self._model = NaiveBayesIntentModel(list(self._examples.items()))
+            self._trained_on = count
+
+    def classify(self, text: str) -> Optional[Tuple[str, str, float]]:
+        """
+        Returns (intent, source, confidence) for confident cases, where source
+        is "rules" or "model"; None means the LLM router should decide.
+        """
+        intent = rule_classify(text)
+        if intent:
+            return intent, "rules", 1.0
+
+        with self._lock:
+            model = self._model
+        if model:
+            intent, confidence = model.predict(text)
+            if intent and confidence >= CONFIDENCE_THRESHOLD:
+                return intent, "model", confidence
+        return None
+
+    def record(self, text: str, intent: str, source: str):
+        """Logs a routing decision; LLM decisions become training data."""
+        if intent not in INTENTS:
+            return
+        os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+        with self._lock:
+            with open(self.log_path, "a") as f:
+                f.write(json.dumps({"text": text, "intent": intent, "source": source, "at": time.time()}) + "\n")
+            if source == "llm":
+                self._examples[text] = intent
+                self._maybe_retrain()
+
+
+intent_classifier = IntentClassifier()
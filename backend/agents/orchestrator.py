@@ -1,66 +1,392 @@
+import asyncio
 import logging
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
+import os
+import time
 from agents.router_agent import router_agent
+from agents.intent_classifier import intent_classifier
 from agents.supervisor_agent import supervisor_agent
-from utils.local_db import get_latest_scene
+from tools.delegation_tools import checkpointing as delegation_checkpoints
+from utils.local_db import get_latest_scene, get_scene, update_project, delete_scenes
+from utils.events import publish
+from utils import workflow_store
+from services.llm_cache import llm_cache, cache_key
+from services.adk_runtime import session_manager, run_agent
+from services.dag_scheduler import DagScheduler
+from services.fair_scheduler import tenant_context, BATCH
+from services.cancellation import cancellations, check_cancelled, JobCancelled
 
 logger = logging.getLogger("Orchestrator")
 
-APP_NAME = "agents"
+# Intent labels for the same request text rarely change; keep them a week
+ROUTER_CACHE_TTL = 7 * 24 * 3600
 
-async def run_adk_pipeline(project_id: str, topic: str):
+# Auto-produce limits: tasks running at once overall and per stage
+AUTO_PRODUCE_CONCURRENCY = int(os.getenv("AUTO_PRODUCE_CONCURRENCY", "8"))
+AUTO_PRODUCE_STAGE_LIMITS = {
+    "script": 1,
+    "drafts": int(os.getenv("AUTO_PRODUCE_DRAFT_CONCURRENCY", "4")),
+    "selection": int(os.getenv("AUTO_PRODUCE_SELECTION_CONCURRENCY", "4")),
+    "motion_prompt": int(os.getenv("AUTO_PRODUCE_MOTION_CONCURRENCY", "8")),
+    "video": int(os.getenv("AUTO_PRODUCE_VIDEO_CONCURRENCY", "4")),
+    "assembly": 1,
+}
+AUTO_PRODUCE_DRAFTS = int(os.getenv("AUTO_PRODUCE_DRAFTS", "2"))
+
+WORKFLOW_KIND = "adk_pipeline"
+
+def create_pipeline_workflow(
+    project_id: str,
+    topic: str,
+    use_cache: bool = True,
+    auto_produce: bool = False,
+    timeout: float = None,
+    user_id: str = None
+) -> str:
     """
-    Executes the Hybrid Pipeline: Router -> Supervisor -> Specialists.
+    Registers a pipeline run; its params are kept so the run can be resumed later,
+    including the user it is scheduled for when it resumes without a request.
     """
-    session_service = InMemorySessionService()
-    session_id = project_id 
-    user_id = "system"
-
-    # Create session explicitly
-    await session_service.create_session(
-        app_name=APP_NAME,
-        user_id=user_id,
-        session_id=session_id
-    )
+    return workflow_store.create_workflow(WORKFLOW_KIND, project_id, {
+        "topic": topic, "useCache": use_cache, "autoProduce": auto_produce, "timeout": timeout,
+        "userId": user_id
+    })
+
+
+def _checkpointed(workflow_id: str, step_id: str, fn, reusable=None):
+    """
+    Wraps a DAG task so a step the workflow already completed returns its stored
+    output instead of running again. reusable(output) can veto a stale checkpoint
+    (e.g. draft files that no longer exist). Without a workflow, fn runs as is.
+    """
+    if not workflow_id:
+        return fn
+    
+    def run(inputs):
+        done = workflow_store.get_checkpoint(workflow_id, step_id)
+        if done and (reusable is None or reusable(done["output"])):
+            logger.info(f"⏭️ [Workflow] {step_id} restored from checkpoint")
+            return done["output"]
+        output = fn(inputs)
+        workflow_store.checkpoint(workflow_id, step_id, output)
+        return output
+    return run
+
 
+def _set_workflow_status(workflow_id: str, project_id: str, status: str, updates: dict = None):
+    workflow_store.transition(workflow_id, status, updates)
+    publish(project_id, "workflow", {"workflow_id": workflow_id, "status": status, **(updates or {})})
+
+
+async def _run_supervisor(workflow_id: str, project_id: str, prompt: str, session_id: str):
+    """
+    Runs the supervisor as one workflow step. It drives its tools itself, so its
+    delegations are checkpointed individually: a resumed run starts the supervisor
+    over, and the writer, artist and director calls it already made return their
+    stored results instead of running again.
+    """
+    if workflow_store.get_checkpoint(workflow_id, "supervisor"):
+        logger.info(f"⏭️ [Workflow] supervisor restored from checkpoint")
+        return
+    with delegation_checkpoints(workflow_id):
+        await run_agent(supervisor_agent, prompt, session_id, project_id=project_id)
+    workflow_store.checkpoint(workflow_id, "supervisor")
+
+
+async def run_adk_pipeline(
+    project_id: str,
+    topic: str,
+    use_cache: bool = True,
+    auto_produce: bool = False,
+    workflow_id: str = None,
+    timeout: float = None,
+    resume: bool = False
+):
+    """
+    Executes the Hybrid Pipeline: Router -> Supervisor -> Specialists.
+    With auto_produce, a NEW_PROJECT request skips the manual review steps and runs
+    the whole production graph (see run_auto_produce).
+    Progress is tracked as a workflow (created here unless workflow_id is given):
+    each completed step is checkpointed. A given workflow is started only while
+    still queued (it may have been cancelled before its task ran); with resume,
+    a failed, interrupted or cancelled one continues from its last checkpoint.
+    The run can be cancelled by workflow ID or project (see services/cancellation.py);
+    timeout, if given, is a deadline in seconds for this attempt.
+    """
+    workflow_id = workflow_id or create_pipeline_workflow(project_id, topic, use_cache, auto_produce, timeout)
+    status = (workflow_store.get_workflow(workflow_id) or {}).get("status")
+    if not resume and status != workflow_store.QUEUED:
+        logger.info(f"⏭️ Pipeline {workflow_id} not started: it is {status}")
+        return
     try:
-        # --- Step 1: Router (Intent Classification) ---
-        logger.info(f"📡 [Router] Analyzing request: {topic}")
-        
-        router_runner = Runner(agent=router_agent, app_name=APP_NAME, session_service=session_service)
-        content = types.Content(role='user', parts=[types.Part(text=topic)])
-        
-        intent = ""
-        async for event in router_runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-            if event.is_final_response():
-                intent = event.content.parts[0].text.strip()
-        
-        logger.info(f"📡 [Router] Intent detected: {intent}")
+        _set_workflow_status(workflow_id, project_id, workflow_store.RUNNING, {"error": None})
+    except (KeyError, ValueError) as e:
+        # Already running elsewhere, or finished
+        logger.error(f"❌ Pipeline not started: {e}")
+        return
+    
+    # Cancelling the workflow ID (or the project) cancels every step under this scope
+    with cancellations.scope(workflow_id, project_id, timeout=timeout):
+        # One fresh session per pipeline run, shared by the router and the supervisor
+        session_id = await session_manager.open(project_id)
 
-        # --- Step 2: Supervisor (Orchestration) ---
-        if intent == "NEW_PROJECT":
-            logger.info(f"👨‍💼 [Supervisor] Starting NEW_PROJECT workflow...")
-            
-            supervisor_runner = Runner(agent=supervisor_agent, app_name=APP_NAME, session_service=session_service)
-            
-            supervisor_prompt = f"Intent: NEW_PROJECT. Topic: {topic}. Project ID: {project_id}. Execute the full pipeline."
-            content = types.Content(role='user', parts=[types.Part(text=supervisor_prompt)])
+        try:
+            # --- Step 1: Router (Intent Classification) ---
+            routed = workflow_store.get_checkpoint(workflow_id, "route")
+            if routed:
+                intent = routed["output"]
+                logger.info(f"⏭️ [Workflow] route restored from checkpoint")
+            else:
+                logger.info(f"📡 [Router] Analyzing request: {topic}")
             
-            async for event in supervisor_runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-                pass
+                # Fast path: local rules/model answer confident cases without an LLM call
+                fast = intent_classifier.classify(topic)
+                if fast:
+                    intent, source, confidence = fast
+                    logger.info(f"📡 [Router] Fast path ({source}, {confidence:.2f})")
+                    intent_classifier.record(topic, intent, source)
+                else:
+                    async def _classify() -> str:
+                        return (await run_agent(router_agent, topic, session_id)).strip()
                 
-            logger.info(f"✅ [Supervisor] Workflow completed.")
+                    intent = await llm_cache.aget_or_compute(
+                        cache_key(router_agent.model, router_agent.instruction, None, topic),
+                        _classify,
+                        ttl=ROUTER_CACHE_TTL,
+                        use_cache=use_cache
+                    )
+                    intent_classifier.record(topic, intent, "llm")
+                workflow_store.checkpoint(workflow_id, "route", intent)
+        
+            logger.info(f"📡 [Router] Intent detected: {intent}")
+
+            # --- Step 2: Supervisor (Orchestration) ---
+            if intent == "NEW_PROJECT" and auto_produce:
+                summary = await run_auto_produce(project_id, topic, use_cache, workflow_id)
+                # Nodes stopped by a cancel show up as failed; report the cancel itself
+                check_cancelled()
+                failed = summary["counts"].get("failed", 0) + summary["counts"].get("skipped", 0)
+                if failed:
+                    raise RuntimeError(f"{failed} production steps did not complete")
             
-        else:
-            logger.info(f"⚠️ [Router] Intent '{intent}' not fully implemented in MVP. Passing to Supervisor anyway.")
-            supervisor_runner = Runner(agent=supervisor_agent, app_name=APP_NAME, session_service=session_service)
-            supervisor_prompt = f"Intent: {intent}. Request: {topic}. Project ID: {project_id}. Handle accordingly."
-            content = types.Content(role='user', parts=[types.Part(text=supervisor_prompt)])
+            elif intent == "NEW_PROJECT":
+                logger.info(f"👨‍💼 [Supervisor] Starting NEW_PROJECT workflow...")
+                supervisor_prompt = f"Intent: NEW_PROJECT. Topic: {topic}. Project ID: {project_id}. Execute the full pipeline."
+                await _run_supervisor(workflow_id, project_id, supervisor_prompt, session_id)
+                logger.info(f"✅ [Supervisor] Workflow completed.")
             
-            async for event in supervisor_runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
-                pass
+            else:
+                logger.info(f"⚠️ [Router] Intent '{intent}' not fully implemented in MVP. Passing to Supervisor anyway.")
+                supervisor_prompt = f"Intent: {intent}. Request: {topic}. Project ID: {project_id}. Handle accordingly."
+                await _run_supervisor(workflow_id, project_id, supervisor_prompt, session_id)
+        
+            _set_workflow_status(workflow_id, project_id, workflow_store.COMPLETED)
+
+        except JobCancelled as e:
+            logger.warning(f"🛑 Pipeline cancelled: {e}")
+            _set_workflow_status(workflow_id, project_id, workflow_store.CANCELLED, {"error": str(e)})
+        except Exception as e:
+            logger.error(f"❌ Pipeline Failed: {str(e)}")
+            _set_workflow_status(workflow_id, project_id, workflow_store.FAILED, {"error": str(e)})
+        finally:
+            await session_manager.close(session_id)
+
+
+async def resume_workflow(workflow_id: str):
+    """Continues a failed, interrupted or cancelled pipeline run from its last checkpoint."""
+    workflow = workflow_store.get_workflow(workflow_id)
+    if not workflow:
+        raise KeyError(f"Workflow {workflow_id} not found")
+    params = workflow.get("params", {})
+    logger.info(f"🔁 [Workflow] Resuming {workflow_id} ({len(workflow.get('steps', {}))} steps checkpointed)")
+    await run_adk_pipeline(
+        workflow["projectId"],
+        params.get("topic", ""),
+        params.get("useCache", True),
+        params.get("autoProduce", False),
+        workflow_id,
+        params.get("timeout"),
+        resume=True
+    )
+
+
+# Resumed runs are detached tasks; keep references so they are not garbage collected
+_recovery_tasks = set()
+
+def recover_interrupted_workflows(resume: bool = True) -> list:
+    """
+    Marks pipeline runs cut off (or never started) by a crash or redeploy as
+    interrupted and, with resume, continues them in the background. Call once
+    at startup, on the loop.
+    """
+    workflow_ids = workflow_store.mark_interrupted()
+    for workflow_id in workflow_ids:
+        logger.warning(f"⚠️ [Workflow] {workflow_id} was interrupted")
+        if resume:
+            workflow = workflow_store.get_workflow(workflow_id)
+            user_id = workflow.get("params", {}).get("userId")
+            with tenant_context(user_id=user_id, project_id=workflow["projectId"], priority=BATCH):
+                task = asyncio.create_task(resume_workflow(workflow_id))
+            _recovery_tasks.add(task)
+            task.add_done_callback(_recovery_tasks.discard)
+    return workflow_ids
+
 
-    except Exception as e:
-        logger.error(f"❌ Pipeline Failed: {str(e)}")
+def _add_scene_nodes(
+    scheduler: DagScheduler,
+    project_id: str,
+    scene_id: str,
+    scene: dict,
+    use_cache: bool,
+    workflow_id: str = None
+) -> str:
+    """
+    Adds drafts -> selection -> video (and motion prompt -> video) for one scene; returns the video node id.
+    With a workflow, every node is checkpointed, and selection/video also check the
+    scene itself so work finished just before a crash is not paid for twice.
+    """
+    from tools.artist_tools import generate_image, inspect_image_quality, submit_final_scene
+    from tools.director_tools import generate_video_task, write_motion_prompt
+    from utils.local_file_store import resolve_media_path
+    
+    visual_prompt = scene.get("visual_prompt", "")
+    
+    def drafts(_):
+        paths = [p for p in generate_image(visual_prompt, count=AUTO_PRODUCE_DRAFTS) if not p.startswith("Error")]
+        if not paths:
+            raise RuntimeError("No draft images generated")
+        return paths
+    
+    def selection(inputs):
+        current = get_scene(project_id, scene_id) or {}
+        if current.get("status") in ("image_completed", "completed") and current.get("imageUrl"):
+            return current["imageUrl"]
+        # Take the first draft the vision check passes; fall back to the first draft
+        paths = inputs[f"{scene_id}:drafts"]
+        chosen = paths[0]
+        if len(paths) > 1:
+            for path in paths:
+                if inspect_image_quality(path, visual_prompt).get("status") == "PASS":
+                    chosen = path
+                    break
+        result = submit_final_scene(project_id, scene_id, chosen, visual_prompt)
+        if result.startswith("Error"):
+            raise RuntimeError(result)
+        for path in paths:
+            if path != chosen and os.path.exists(path):
+                os.remove(path)
+        return (get_scene(project_id, scene_id) or {}).get("imageUrl")
+    
+    def motion_prompt(_):
+        # Only needs the script, so it runs alongside image generation
+        return write_motion_prompt(project_id, scene_id, use_cache)
+    
+    def video(inputs):
+        current = get_scene(project_id, scene_id) or {}
+        video_path = resolve_media_path(current.get("videoUrl"))
+        if current.get("status") == "completed" and video_path and os.path.isfile(video_path):
+            return current["videoUrl"]
+        result = generate_video_task(
+            project_id, scene_id, inputs[f"{scene_id}:selection"], inputs[f"{scene_id}:motion_prompt"]
+        )
+        if result.startswith("Failed"):
+            raise RuntimeError(f"Video generation failed for {scene_id}")
+        return (get_scene(project_id, scene_id) or {}).get("videoUrl")
+    
+    def step(name, fn, reusable=None):
+        def run(inputs):
+            # Editing the scene cancels this scope (see /api/scene/{id}/update)
+            with cancellations.scope(project_id=project_id, scene_id=scene_id):
+                return fn(inputs)
+        return _checkpointed(workflow_id, f"{scene_id}:{name}", run, reusable)
+    
+    drafts_exist = lambda paths: all(os.path.exists(p) for p in paths)
+    scheduler.add(f"{scene_id}:drafts", "drafts", step("drafts", drafts, drafts_exist))
+    scheduler.add(f"{scene_id}:selection", "selection", step("selection", selection), [f"{scene_id}:drafts"])
+    scheduler.add(f"{scene_id}:motion_prompt", "motion_prompt", step("motion_prompt", motion_prompt))
+    scheduler.add(
+        f"{scene_id}:video", "video", step("video", video), [f"{scene_id}:selection", f"{scene_id}:motion_prompt"]
+    )
+    return f"{scene_id}:video"
+
+
+async def run_auto_produce(project_id: str, topic: str, use_cache: bool = True, workflow_id: str = None) -> dict:
+    """
+    Auto-produce mode: streams the script and, as each scene arrives, schedules its
+    drafts -> selection -> video chain (motion prompt in parallel), then assembles
+    the film once every scene video exists. Independent scenes run concurrently
+    under AUTO_PRODUCE_CONCURRENCY and the per-stage limits, so total time tracks
+    the slowest scene rather than the sum of all scenes.
+    Progress is published as "auto_produce" events; the summary is stored on the project.
+    With a workflow, completed nodes are checkpointed and a resumed run rebuilds the
+    graph from the checkpointed script, re-running only unfinished nodes.
+    """
+    from tools.writer_tools import stream_script_to_project
+    from services.movie_assembler import assemble_project
+    
+    started_at = time.time()
+    loop = asyncio.get_running_loop()
+    
+    def on_event(event: str, task):
+        publish(project_id, "auto_produce", {"event": event, **task.summary()})
+        if event == "failed":
+            logger.error(f"❌ [AutoProduce] {task.id} failed: {task.error}")
+    
+    scheduler = DagScheduler(AUTO_PRODUCE_CONCURRENCY, AUTO_PRODUCE_STAGE_LIMITS, on_event)
+    video_nodes = []
+    
+    def add_batch(batch):
+        for scene_id, scene in batch:
+            video_nodes.append(_add_scene_nodes(scheduler, project_id, scene_id, scene, use_cache, workflow_id))
+    
+    def on_batch(batch):
+        if workflow_id:
+            # Remember scenes of an unfinished script so a resumed run can discard them
+            workflow_store.append_workflow_item(workflow_id, "scriptScenes", [scene_id for scene_id, _ in batch])
+        loop.call_soon_threadsafe(add_batch, batch)
+    
+    async def script(_):
+        done = workflow_store.get_checkpoint(workflow_id, "script") if workflow_id else None
+        if done:
+            scene_ids = done["output"]
+            logger.info(f"⏭️ [Workflow] script restored from checkpoint ({len(scene_ids)} scenes)")
+            add_batch([(scene_id, get_scene(project_id, scene_id) or {}) for scene_id in scene_ids])
+        else:
+            if workflow_id:
+                # A stream cut off mid-script cannot be continued; drop its scenes and write again
+                partial = (workflow_store.get_workflow(workflow_id) or {}).get("scriptScenes", [])
+                if partial:
+                    await asyncio.to_thread(delete_scenes, project_id, partial)
+                    workflow_store.update_workflow(workflow_id, {"scriptScenes": []})
+            # Scene nodes are added from the loop thread as the writer streams batches in
+            scene_ids = await asyncio.to_thread(
+                stream_script_to_project, project_id, topic, "", "", use_cache, on_batch
+            )
+            # Let any add_batch callbacks still queued on the loop run first
+            await asyncio.sleep(0)
+            if not scene_ids:
+                raise RuntimeError("Writer produced no scenes")
+            if workflow_id:
+                workflow_store.checkpoint(workflow_id, "script", scene_ids)
+        scheduler.add(
+            "assembly", "assembly",
+            _checkpointed(workflow_id, "assembly", lambda _: assemble_project(project_id)),
+            list(video_nodes)
+        )
+        return scene_ids
+    
+    scheduler.add("script", "script", script)
+    logger.info(f"🏭 [AutoProduce] Starting production graph for {project_id}")
+    # Every render in the graph queues as this project's batch work
+    with tenant_context(project_id=project_id, priority=BATCH):
+        await scheduler.run()
+    
+    summary = {
+        **scheduler.summary(),
+        "startedAt": started_at,
+        "finishedAt": time.time(),
+        "elapsed": round(time.time() - started_at, 3),
+    }
+    update_project(project_id, {"autoProduce": summary})
+    publish(project_id, "auto_produce_completed", {"counts": summary["counts"], "elapsed": summary["elapsed"]})
+    logger.info(f"🏭 [AutoProduce] Finished in {summary['elapsed']}s: {summary['counts']}")
+    return summary
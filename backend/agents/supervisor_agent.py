@@ -1,4 +1,5 @@
 from google.adk.agents import Agent
+from services.context_cache import context_cache
 from tools.delegation_tools import (
     delegate_to_writer, 
     delegate_to_artist, 
@@ -35,5 +36,7 @@ supervisor_agent = Agent(
         delegate_to_artist, 
         delegate_to_director,
         get_latest_scene_info
-    ]
+    ],
+    # Serve the static instruction/tool prefix from a Gemini context cache
+    before_model_callback=context_cache.before_model_callback
 )
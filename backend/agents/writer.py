@@ -4,7 +4,10 @@ import os
 import json
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from services.llm_cache import llm_cache, cache_key, CACHE_DISABLED
+from services.context_cache import context_cache
+from utils.json_stream import JsonArrayStreamParser
 
 load_dotenv()
 
@@ -24,8 +27,15 @@ class WriterAgent:
         self.model_name = "gemini-3-pro-preview" # Using Gemini 3 Pro Preview
         # TODO: Monitor for stability updates.
 
-    def generate_script(self, topic: str, genre: str, tone: str, previous_thought_signature: str = None) -> WriterOutput:
-        
+    def _build_request(
+        self,
+        topic: str,
+        genre: str,
+        tone: str,
+        previous_thought_signature: Optional[str],
+        bible: Optional[Dict[str, Any]],
+    ) -> Tuple[str, types.GenerateContentConfig, str]:
+        """Returns (system_instruction, config, prompt) for one script request."""
         system_instruction = f"""
         You are a professional screenwriter.
         Your task is to write a short video script based on the given topic, genre, and tone.
@@ -41,9 +51,15 @@ class WriterAgent:
         Tone: {tone}
         """
 
+        # The production bible is the large, stable part of the prompt; it rides along
+        # with the system instruction into the context cache
+        if bible:
+            system_instruction += f"\n        Production bible (JSON):\n{json.dumps(bible, indent=2, ensure_ascii=False)}\n"
+
         # Thinking config (if supported by the model/SDK version)
         # Currently simulating or using standard generation config
         config = types.GenerateContentConfig(
+            system_instruction=system_instruction,
             temperature=0.7,
             response_mime_type="application/json",
             response_schema=WriterOutput,
@@ -56,25 +72,98 @@ class WriterAgent:
         if previous_thought_signature:
             prompt += f"\n\nPrevious Context/Thought: {previous_thought_signature}"
 
-        try:
+        return system_instruction, config, prompt
+
+    def generate_script(
+        self,
+        topic: str,
+        genre: str,
+        tone: str,
+        previous_thought_signature: str = None,
+        use_cache: bool = True,
+        cache_ttl: Optional[int] = None,
+        bible: Optional[Dict[str, Any]] = None,
+        project_id: Optional[str] = None,
+    ) -> WriterOutput:
+        system_instruction, config, prompt = self._build_request(
+            topic, genre, tone, previous_thought_signature, bible
+        )
+
+        def _generate() -> dict:
+            tags = (f"bible:{project_id}",) if project_id else ()
             response = self.client.models.generate_content(
                 model=self.model_name,
                 contents=prompt,
-                config=config
+                config=context_cache.apply_to_config(self.model_name, config, tags=tags)
             )
             
             # Extracting the parsed object
             # The SDK might return a parsed object directly if response_schema is set
             if response.parsed:
-                return response.parsed
+                return response.parsed.model_dump()
             else:
                 # Fallback parsing
-                return WriterOutput.model_validate_json(response.text)
+                return WriterOutput.model_validate_json(response.text).model_dump()
+
+        try:
+            key = cache_key(self.model_name, system_instruction, config.temperature, prompt)
+            result = llm_cache.get_or_compute(key, _generate, ttl=cache_ttl, use_cache=use_cache)
+            return WriterOutput.model_validate(result)
 
         except Exception as e:
             print(f"Error in WriterAgent: {e}")
             raise e
 
+    def stream_script(
+        self,
+        topic: str,
+        genre: str,
+        tone: str,
+        previous_thought_signature: str = None,
+        use_cache: bool = True,
+        cache_ttl: Optional[int] = None,
+        bible: Optional[Dict[str, Any]] = None,
+        project_id: Optional[str] = None,
+    ) -> Iterator[List[Scene]]:
+        """
+        Like generate_script, but yields scenes as soon as their JSON objects are
+        complete in the streamed response: one list per chunk that completed any
+        (usually a single scene). The full output is cached at the end, so a cache
+        hit yields every scene at once.
+        """
+        system_instruction, config, prompt = self._build_request(
+            topic, genre, tone, previous_thought_signature, bible
+        )
+        key = cache_key(self.model_name, system_instruction, config.temperature, prompt)
+        use_cache = use_cache and not CACHE_DISABLED
+
+        cached = llm_cache.get(key) if use_cache else None
+        if cached:
+            yield WriterOutput.model_validate(cached).scenes
+            return
+
+        tags = (f"bible:{project_id}",) if project_id else ()
+        parser = JsonArrayStreamParser("scenes")
+        text = ""
+        try:
+            for chunk in self.client.models.generate_content_stream(
+                model=self.model_name,
+                contents=prompt,
+                config=context_cache.apply_to_config(self.model_name, config, tags=tags)
+            ):
+                if not chunk.text:
+                    continue
+                text += chunk.text
+                completed = parser.feed(chunk.text)
+                if completed:
+                    yield [Scene.model_validate(item) for item in completed]
+        except Exception as e:
+            print(f"Error in WriterAgent stream: {e}")
+            raise e
+
+        if use_cache:
+            llm_cache.set(key, WriterOutput.model_validate_json(text).model_dump(), cache_ttl)
+
 if __name__ == "__main__":
     # Simple test
     agent = WriterAgent()
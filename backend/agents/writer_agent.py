@@ -1,5 +1,6 @@
 from google.adk.agents import Agent
-from tools.writer_tools import save_scene_script, get_production_bible_tool
+from services.context_cache import context_cache
+from tools.writer_tools import save_scene_script, save_scene_scripts, get_production_bible_tool
 
 # Define the Writer Agent
 writer_agent = Agent(
@@ -32,7 +33,13 @@ writer_agent = Agent(
         }
     )
     
-    Always call this tool to save your work.
+    When you write several scenes at once, save them together with
+    'save_scene_scripts(project_id, scenes=[scene_data, ...])' instead of calling
+    'save_scene_script' once per scene.
+    
+    Always call one of these tools to save your work.
     """,
-    tools=[save_scene_script, get_production_bible_tool]
+    tools=[save_scene_script, save_scene_scripts, get_production_bible_tool],
+    # Serve the static instruction/tool prefix from a Gemini context cache
+    before_model_callback=context_cache.before_model_callback
 )
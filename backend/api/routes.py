@@ -18,13 +18,18 @@ class GenerateRequest(BaseModel):
 def run_writer_task(project_id: str, input_context: dict):
     agent = WriterAgent()
     try:
-        # Fetch bible/context if needed
-        # bible = get_project_bible(project_id)
+        # The bible goes into the writer's (context-cached) system prompt
+        try:
+            bible = get_project_bible(project_id)
+        except RuntimeError:
+            bible = None
         
         result = agent.generate_script(
             topic=input_context.get("topic"),
             genre=input_context.get("genre"),
-            tone=input_context.get("tone")
+            tone=input_context.get("tone"),
+            bible=bible,
+            project_id=project_id
         )
         
         # Save scenes to Firestore
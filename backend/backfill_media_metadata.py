@@ -0,0 +1,74 @@
+"""
+One-time backfill of the media metadata index.
+Probes every media file under static/media that is not indexed yet and copies
+the metadata onto scene records (imageMeta/videoMeta) and project movies.
+
+Usage: uv run python backfill_media_metadata.py [--force]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.local_db import list_projects, get_project, update_scene, update_project
+from utils.local_file_store import STATIC_MEDIA_DIR, get_media_metadata, index_media_metadata
+from utils.media_probe import IMAGE_EXTENSIONS, VIDEO_EXTENSIONS
+
+SCENE_FIELDS = {"imageUrl": "imageMeta", "videoUrl": "videoMeta"}
+
+
+def backfill_files(force: bool) -> int:
+    """Indexes every image/video file below static/media (derivatives and HLS output excluded)."""
+    count = 0
+    for root, dirs, files in os.walk(STATIC_MEDIA_DIR):
+        dirs[:] = [d for d in dirs if not d.endswith(".hls") and not d.startswith(".")]
+        for name in files:
+            parts = name.split(".")
+            # {sha}.thumb.webp etc. are derivatives, not originals
+            if name.startswith(".") or len(parts) != 2:
+                continue
+            if parts[1].lower() not in IMAGE_EXTENSIONS | VIDEO_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            url = "/static/media/" + os.path.relpath(path, STATIC_MEDIA_DIR).replace(os.sep, "/")
+            if force or get_media_metadata(url, probe_missing=False) is None:
+                if index_media_metadata(url, path):
+                    count += 1
+    return count
+
+
+def backfill_records(force: bool) -> int:
+    count = 0
+    for project_id in list_projects():
+        project = get_project(project_id)
+        for scene_id, scene in project.get("scenes", {}).items():
+            updates = {}
+            for url_field, meta_field in SCENE_FIELDS.items():
+                if scene.get(url_field) and (force or not scene.get(meta_field)):
+                    meta = get_media_metadata(scene[url_field])
+                    # None clears metadata left over from a file that no longer probes
+                    if meta or scene.get(meta_field):
+                        updates[meta_field] = meta
+            if updates:
+                update_scene(project_id, scene_id, updates)
+                count += 1
+
+        movie = project.get("movie")
+        if movie and movie.get("url") and (force or not movie.get("meta")):
+            meta = get_media_metadata(movie["url"])
+            if meta or movie.get("meta"):
+                update_project(project_id, {"movie": {**movie, "meta": meta}})
+                count += 1
+    return count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill media metadata for existing static/media content.")
+    parser.add_argument("--force", action="store_true", help="Re-probe files and overwrite existing metadata")
+    args = parser.parse_args()
+
+    files = backfill_files(args.force)
+    print(f"Indexed {files} media files")
+    records = backfill_records(args.force)
+    print(f"Updated {records} scene/movie records")
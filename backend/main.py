@@ -2,10 +2,11 @@ from fastapi import FastAPI, BackgroundTasks, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
+import mimetypes
 import os
 import sys
 from dotenv import load_dotenv
-from typing import Optional
+from typing import Optional, List
 
 # Load environment variables from .env file
 # Load environment variables from .env file
@@ -18,6 +19,7 @@ logging.basicConfig(level=logging.INFO)
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from agents import orchestrator
+from utils.local_file_store import BLOB_DIR
 from tools.delegation_tools import delegate_to_writer, delegate_to_artist, delegate_to_director
 
 try:
@@ -44,7 +46,24 @@ app.add_middleware(
 
 # Static Files (UI & Media)
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+
+# HLS types are missing from (or wrong in) many system mime tables
+mimetypes.add_type("application/vnd.apple.mpegurl", ".m3u8")
+mimetypes.add_type("video/mp2t", ".ts")
+
+class MediaStaticFiles(StaticFiles):
+    """
+    StaticFiles that marks content-addressed blobs (incl. their HLS output) as immutable.
+    Range requests, ETag and If-None-Match are handled by Starlette's FileResponse.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if os.path.abspath(full_path).startswith(BLOB_DIR + os.sep):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+app.mount("/static", MediaStaticFiles(directory=STATIC_DIR), name="static")
 
 if has_api_router:
     app.include_router(api_router, prefix="/api")
@@ -52,24 +71,100 @@ if has_api_router:
 class PipelineRequest(BaseModel):
     project_id: str
     topic: str
+    use_cache: bool = True
+    auto_produce: bool = False  # run script -> images -> videos -> assembly without manual review
+    timeout_seconds: Optional[float] = None  # deadline for each attempt (none by default)
 
 @app.post("/api/generate/full-scene")
-async def generate_full_scene(request: PipelineRequest, background_tasks: BackgroundTasks):
+async def generate_full_scene(
+    request: PipelineRequest,
+    background_tasks: BackgroundTasks,
+    authorization: Optional[str] = Header(None)
+):
     """
     Triggers the full Writer -> Artist -> Director pipeline using ADK.
     """
+    from services.fair_scheduler import as_tenant, user_id_from_token, BATCH
+
+    token = None
+    if authorization and authorization.startswith("Bearer "):
+        token = authorization.replace("Bearer ", "")
+    user_id = user_id_from_token(token)
+
+    workflow_id = orchestrator.create_pipeline_workflow(
+        request.project_id, request.topic, request.use_cache, request.auto_produce, request.timeout_seconds,
+        user_id
+    )
     background_tasks.add_task(
-        orchestrator.run_adk_pipeline, 
+        as_tenant(orchestrator.run_adk_pipeline, user_id, request.project_id, BATCH),
         request.project_id, 
-        request.topic
+        request.topic,
+        request.use_cache,
+        request.auto_produce,
+        workflow_id,
+        request.timeout_seconds
     )
 
     return {
         "status": "started",
         "message": "The AI production team has started working (ADK).",
-        "project_id": request.project_id
+        "project_id": request.project_id,
+        "workflow_id": workflow_id
     }
 
+@app.on_event("startup")
+async def recover_workflows():
+    # Pipelines cut off by a crash or redeploy continue from their last checkpoint
+    resume = os.getenv("WORKFLOW_AUTO_RESUME", "true").lower() in ("1", "true", "yes")
+    orchestrator.recover_interrupted_workflows(resume=resume)
+
+@app.get("/api/workflow/{workflow_id}")
+async def get_workflow_status(workflow_id: str):
+    """
+    Returns a pipeline run: its status and checkpointed steps.
+    """
+    from utils.workflow_store import get_workflow
+    workflow = get_workflow(workflow_id)
+    if not workflow:
+        return {"error": "Workflow not found"}
+    return workflow
+
+@app.get("/api/project/{project_id}/workflows")
+async def list_project_workflows(project_id: str, status: Optional[str] = None):
+    """
+    Returns the project's pipeline runs, newest first.
+    """
+    from utils.workflow_store import list_workflows
+    return {"workflows": list_workflows(project_id, status)}
+
+@app.post("/api/workflow/{workflow_id}/resume")
+async def resume_workflow(
+    workflow_id: str,
+    background_tasks: BackgroundTasks,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Continues a failed, interrupted or cancelled pipeline run from its last checkpoint.
+    It is scheduled for the calling user, or without a token for the user who started it.
+    """
+    from utils.workflow_store import get_workflow, TRANSITIONS, RUNNING
+    from services.fair_scheduler import as_tenant, user_id_from_token, BATCH
+    workflow = get_workflow(workflow_id)
+    if not workflow:
+        return {"error": "Workflow not found"}
+    if RUNNING not in TRANSITIONS[workflow["status"]]:
+        return {"error": f"Workflow is {workflow['status']} and cannot be resumed"}
+
+    if authorization and authorization.startswith("Bearer "):
+        user_id = user_id_from_token(authorization.replace("Bearer ", ""))
+    else:
+        user_id = workflow.get("params", {}).get("userId")
+    background_tasks.add_task(
+        as_tenant(orchestrator.resume_workflow, user_id, workflow["projectId"], BATCH),
+        workflow_id
+    )
+    return {"status": "resuming", "workflow_id": workflow_id, "checkpoints": list(workflow.get("steps", {}))}
+
 @app.get("/api/project/{project_id}")
 async def get_project_status(project_id: str):
     """
@@ -81,6 +176,279 @@ async def get_project_status(project_id: str):
         return {"error": "Project not found", "scenes": {}}
     return project_data
 
+@app.get("/api/project/{project_id}/bible")
+async def get_production_bible(project_id: str):
+    """
+    Returns the project's production bible and its version.
+    """
+    from utils.local_db import get_project_bible, get_project_bible_version
+    return {"version": get_project_bible_version(project_id), "bible": get_project_bible(project_id)}
+
+class BibleUpdateRequest(BaseModel):
+    bible: dict
+    replace: bool = False  # False merges top-level keys into the current bible
+    expected_version: Optional[int] = None  # optimistic concurrency check
+
+@app.put("/api/project/{project_id}/bible")
+async def update_production_bible(project_id: str, request: BibleUpdateRequest):
+    """
+    Updates the production bible, bumping its version.
+    """
+    from utils.local_db import update_project_bible
+    from services.context_cache import context_cache
+
+    try:
+        bible = update_project_bible(project_id, request.bible, request.replace, request.expected_version)
+    except ValueError as e:
+        return {"error": str(e)}
+    # Drop the Gemini context caches built from the previous version
+    context_cache.invalidate(f"bible:{project_id}")
+    return {"version": bible["version"], "bible": bible["data"]}
+
+@app.get("/api/project/{project_id}/events")
+async def stream_project_events(project_id: str):
+    """
+    Server-Sent Events stream of project updates (e.g. scenes as the writer streams them).
+    """
+    from fastapi.responses import StreamingResponse
+    from utils.events import sse_stream
+
+    return StreamingResponse(
+        sse_stream(project_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/api/project/{project_id}/contact-sheet")
+async def get_contact_sheet(project_id: str, columns: int = 5, if_none_match: Optional[str] = Header(None)):
+    """
+    Returns the project's storyboard as one tiled image (scenes in sequence order).
+    """
+    import asyncio
+    from fastapi.responses import FileResponse, Response
+    from utils.contact_sheet import build_contact_sheet
+
+    result = await asyncio.to_thread(build_contact_sheet, project_id, columns)
+    if not result:
+        return {"error": "No scene images found"}
+
+    path, key = result
+    etag = f'"{key}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match == etag:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(path, media_type="image/jpeg", headers=headers)
+
+@app.post("/api/project/{project_id}/assemble")
+async def assemble_project_movie(project_id: str):
+    """
+    Concatenates the project's completed scenes (in sequence order) into one film.
+    """
+    import asyncio
+    from services.movie_assembler import assemble_project
+
+    try:
+        movie = await asyncio.to_thread(assemble_project, project_id)
+        if not movie:
+            return {"error": "No completed scene videos found"}
+        return {"movie": movie}
+    except Exception as e:
+        return {"error": str(e)}
+
+class ContinuityRequest(BaseModel):
+    scene_ids: Optional[List[str]] = None
+    link: str = "frame"  # "frame" or "extend"
+    regenerate_first: bool = False
+    timeout_seconds: Optional[float] = None  # deadline for the whole chain (none by default)
+
+@app.post("/api/project/{project_id}/chain")
+async def chain_project_scenes(
+    project_id: str,
+    request: ContinuityRequest,
+    background_tasks: BackgroundTasks,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Regenerates scene videos in sequence, feeding each scene's last frame
+    (or Veo video, for link="extend") into the next one.
+    Progress is tracked on the returned job, which can be cancelled.
+    """
+    from utils.job_store import create_job
+    from tools.continuity_tools import run_continuity_chain
+    from services.fair_scheduler import as_tenant, user_id_from_token, BATCH
+    from services.cancellation import as_cancellable_job
+
+    token = None
+    if authorization and authorization.startswith("Bearer "):
+        token = authorization.replace("Bearer ", "")
+
+    job_id = create_job("continuity", project_id, data={"link": request.link})
+    run = as_cancellable_job(run_continuity_chain, job_id, project_id, timeout=request.timeout_seconds)
+    background_tasks.add_task(
+        as_tenant(run, user_id_from_token(token), project_id, BATCH),
+        project_id,
+        request.scene_ids,
+        request.link,
+        token,
+        request.regenerate_first
+    )
+    return {"status": "started", "project_id": project_id, "job_id": job_id}
+
+class LongFormRequest(BaseModel):
+    project_id: str
+    target_seconds: float = 30
+    prompt: str = None
+    timeout_seconds: Optional[float] = None  # defaults to GENERATION_JOB_TIMEOUT
+
+@app.post("/api/scene/{scene_id}/long-form")
+async def generate_long_form_video(
+    scene_id: str,
+    request: LongFormRequest,
+    background_tasks: BackgroundTasks,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Builds one long clip for the scene by chaining Veo extend operations.
+    Progress is tracked on the returned job.
+    """
+    from utils.job_store import create_job
+    from tools.long_form_tools import generate_long_form
+    from services.fair_scheduler import as_tenant, user_id_from_token
+    from services.cancellation import as_cancellable_job, DEFAULT_JOB_TIMEOUT
+
+    token = None
+    if authorization and authorization.startswith("Bearer "):
+        token = authorization.replace("Bearer ", "")
+
+    job_id = create_job("long_form", request.project_id, scene_id, {"targetSeconds": request.target_seconds})
+    run = as_cancellable_job(
+        generate_long_form, job_id, request.project_id, scene_id, request.timeout_seconds or DEFAULT_JOB_TIMEOUT
+    )
+    background_tasks.add_task(
+        as_tenant(run, user_id_from_token(token)),
+        request.project_id,
+        scene_id,
+        request.target_seconds,
+        request.prompt,
+        token,
+        job_id
+    )
+    return {"status": "started", "job_id": job_id}
+
+class VideoVariantsRequest(BaseModel):
+    project_id: str
+    prompt: str = ""
+    count: int = 2
+    image_url: str = None
+    timeout_seconds: Optional[float] = None  # defaults to GENERATION_JOB_TIMEOUT
+
+@app.post("/api/scene/{scene_id}/video/variants")
+async def generate_scene_video_variants(
+    scene_id: str,
+    request: VideoVariantsRequest,
+    background_tasks: BackgroundTasks,
+    authorization: Optional[str] = Header(None)
+):
+    """
+    Generates several takes of the scene in one Veo operation.
+    They are stored as videoCandidates; pick one with /video/select.
+    Progress is tracked on the returned job, which can be cancelled.
+    """
+    from utils.local_db import get_scene
+    from utils.job_store import create_job
+    from tools.director_tools import generate_video_variants
+    from services.fair_scheduler import as_tenant, user_id_from_token
+    from services.cancellation import as_cancellable_job, DEFAULT_JOB_TIMEOUT
+
+    scene = get_scene(request.project_id, scene_id)
+    if not scene:
+        return {"error": "Scene not found"}
+    image_url = request.image_url or scene.get("imageUrl")
+    if not image_url:
+        return {"error": "Scene has no image"}
+    prompt = request.prompt or scene.get("motion_prompt") or scene.get("visual_prompt", "")
+
+    token = None
+    if authorization and authorization.startswith("Bearer "):
+        token = authorization.replace("Bearer ", "")
+
+    job_id = create_job("video_variants", request.project_id, scene_id, {"count": request.count})
+    run = as_cancellable_job(
+        generate_video_variants, job_id, request.project_id, scene_id, request.timeout_seconds or DEFAULT_JOB_TIMEOUT
+    )
+    background_tasks.add_task(
+        as_tenant(run, user_id_from_token(token)),
+        request.project_id,
+        scene_id,
+        image_url,
+        prompt,
+        request.count,
+        token
+    )
+    return {"status": "started", "count": request.count, "job_id": job_id}
+
+class SelectVideoRequest(BaseModel):
+    project_id: str
+    video_url: str
+
+@app.post("/api/scene/{scene_id}/video/select")
+async def select_scene_video(scene_id: str, request: SelectVideoRequest):
+    """
+    Makes one of the scene's video candidates its final video.
+    """
+    from tools.director_tools import select_video_candidate
+    try:
+        video_url = select_video_candidate(request.project_id, scene_id, request.video_url)
+        return {"message": "Video selected successfully", "videoUrl": video_url}
+    except Exception as e:
+        return {"error": str(e)}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """
+    Returns the state of a background generation job.
+    """
+    from utils.job_store import get_job
+    job = get_job(job_id)
+    if not job:
+        return {"error": "Job not found"}
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """
+    Cancels a generation job or pipeline workflow. In-flight work stops polling,
+    cancels its Veo operation where the API allows, and frees its slot.
+    """
+    from utils.job_store import get_job, update_job
+    from utils.workflow_store import get_workflow, transition, QUEUED, CANCELLED
+    from utils.events import publish
+    from services.cancellation import cancellations
+
+    job = get_job(job_id)
+    workflow = get_workflow(job_id)
+    if not job and not workflow:
+        return {"error": "Job not found"}
+    if cancellations.cancel_job(job_id):
+        return {"status": "cancelling", "job_id": job_id}
+    # Jobs and workflows still waiting to start are skipped when their task runs
+    if job and job.get("status") in ("queued", "running"):
+        update_job(job_id, {"status": "cancelled", "error": "cancelled by user"})
+        return {"status": "cancelled", "job_id": job_id}
+    if workflow and workflow.get("status") == QUEUED:
+        transition(job_id, CANCELLED, {"error": "cancelled by user"})
+        publish(workflow["projectId"], "workflow", {"workflow_id": job_id, "status": CANCELLED, "error": "cancelled by user"})
+        return {"status": "cancelled", "job_id": job_id}
+    return {"error": f"Job is not running ({(job or workflow).get('status')})"}
+
+@app.get("/api/scheduler/stats")
+async def get_scheduler_stats():
+    """
+    Returns generation slot usage and queue wait times per priority class.
+    """
+    from services.fair_scheduler import generation_scheduler
+    return generation_scheduler.stats()
+
 @app.get("/api/scene/{scene_id}")
 async def get_scene_details(scene_id: str, project_id: str):
     """
@@ -102,9 +470,15 @@ class UpdateSceneRequest(BaseModel):
 @app.post("/api/scene/{scene_id}/update")
 async def update_scene_details(scene_id: str, request: UpdateSceneRequest):
     """
-    Updates the script and visual prompt of a scene.
+    Updates the script and visual prompt of a scene. Editing the script or
+    prompts cancels generations still running for the scene and drops its
+    workflow checkpoints, so a resumed pipeline regenerates it.
     """
-    from utils.local_db import update_scene
+    from utils.local_db import get_scene, update_scene
+    from utils.local_file_store import retain_media, release_media, get_media_metadata
+    from utils.workflow_store import clear_checkpoints
+    from services.cancellation import cancellations
+    from tools.director_tools import schedule_scene_hls
     
     updates = {}
     if request.script is not None:
@@ -119,8 +493,31 @@ async def update_scene_details(scene_id: str, request: UpdateSceneRequest):
     if not updates:
         return {"message": "No updates provided"}
         
+    # Renders still running (or checkpointed) for the old script/prompts are stale now;
+    # the assembled movie is too, since it contains the scene
+    cancelled = 0
+    if updates.keys() & {"script", "visual_prompt", "motion_prompt"}:
+        cancelled = cancellations.cancel_scene(request.project_id, scene_id, "scene edited")
+        clear_checkpoints(request.project_id, (f"{scene_id}:", "assembly"))
+    
+    previous = None
+    if "videoUrl" in updates:
+        previous = get_scene(request.project_id, scene_id)
+        if previous is None:
+            return {"error": "Scene not found"}
+        # Same as selecting a take: reference the new video before the old one is released
+        try:
+            retain_media(request.videoUrl)
+        except FileNotFoundError as e:
+            return {"error": str(e)}
+        updates["videoMeta"] = get_media_metadata(request.videoUrl)
+        updates["hlsUrl"] = None
+        
     update_scene(request.project_id, scene_id, updates)
-    return {"message": "Scene updated successfully", "updates": updates}
+    if previous is not None:
+        release_media(previous.get("videoUrl"))
+        schedule_scene_hls(request.project_id, scene_id, request.videoUrl)
+    return {"message": "Scene updated successfully", "updates": updates, "cancelledJobs": cancelled}
 
 @app.get("/api/projects")
 async def list_all_projects():
@@ -148,6 +545,32 @@ async def step_writer(request: StepRequest):
     except Exception as e:
         return {"error": str(e)}
 
+class StreamScriptRequest(BaseModel):
+    project_id: str
+    topic: str
+    genre: str = ""  # defaults to the production bible's genre
+    tone: str = ""   # defaults to the production bible's tone
+    use_cache: bool = True
+
+@app.post("/api/step/writer/stream")
+async def step_writer_stream(request: StreamScriptRequest, background_tasks: BackgroundTasks):
+    """
+    Writes a multi-scene script in the background. Each scene is saved as soon as it
+    is streamed and announced on /api/project/{project_id}/events as "scene_created".
+    """
+    from tools.writer_tools import stream_script_to_project
+
+    def _run():
+        try:
+            stream_script_to_project(
+                request.project_id, request.topic, request.genre, request.tone, request.use_cache
+            )
+        except Exception as e:
+            print(f"❌ Streaming writer failed: {e}")
+
+    background_tasks.add_task(_run)
+    return {"status": "started", "project_id": request.project_id}
+
 class SelectImageRequest(BaseModel):
     project_id: str
     image_path: str # The local temp path returned by the agent
@@ -156,28 +579,32 @@ class SelectImageRequest(BaseModel):
 async def select_scene_image(scene_id: str, request: SelectImageRequest):
     """
     Finalizes the scene image selection.
-    Moves the selected temp image to the project folder and updates the DB.
+    Stores the selected temp image in the content-addressed media store and updates the DB.
     """
-    from utils.local_db import update_scene
-    from utils.local_file_store import save_media
-    import shutil
-    
+    from utils.local_db import get_scene, update_scene
+    from utils.local_file_store import save_blob, release_media, get_media_metadata
+    from utils.image_derivatives import schedule_image_derivatives
+
     try:
         # Verify temp file exists
         if not os.path.exists(request.image_path):
             return {"error": f"Image file not found: {request.image_path}"}
-            
-        # Save to project folder (move/copy)
-        # We use save_media which copies the file
-        filename = f"{scene_id}.png"
-        public_url = save_media(request.image_path, filename, request.project_id)
-        
+
+        # Store in the content-addressed blob store (hardlink/reflink, copy only across filesystems)
+        # The draft stays in temp so the user can still switch selection
+        previous = get_scene(request.project_id, scene_id) or {}
+        public_url = save_blob(request.image_path, "png")
+
         # Update DB
         update_scene(request.project_id, scene_id, {
             "status": "image_selected",
-            "imageUrl": public_url
+            "imageUrl": public_url,
+            "imageMeta": get_media_metadata(public_url),
+            "imageVariants": None
         })
-        
+        release_media(previous.get("imageUrl"))
+        schedule_image_derivatives(request.project_id, scene_id, public_url)
+
         return {"message": "Image selected successfully", "imageUrl": public_url}
         
     except Exception as e:
@@ -186,57 +613,20 @@ async def select_scene_image(scene_id: str, request: SelectImageRequest):
 class GenerateMotionPromptRequest(BaseModel):
     project_id: str
     scene_id: str
+    use_cache: bool = True
 
 @app.post("/api/scene/{scene_id}/motion-prompt")
 async def generate_motion_prompt_endpoint(scene_id: str, request: GenerateMotionPromptRequest):
     """
     Generates a motion prompt based on the scene's script and image.
     """
-    from utils.local_db import get_scene, update_scene
-    from google import genai
-    import os
-    
-    # Get scene data
-    scene = get_scene(request.project_id, scene_id)
-    if not scene:
-        return {"error": "Scene not found"}
+    from tools.director_tools import write_motion_prompt
     
-    script = scene.get("script", "")
-    visual_prompt = scene.get("visual_prompt", "")
-    
-    # Use Gemini to generate motion prompt
     try:
-        client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
-        
-        prompt_text = f"""Based on the following scene script and visual description, generate a concise motion prompt (2-3 sentences) that describes camera movements and key actions for video generation.
-
-Script:
-{script}
-
-Visual Description:
-{visual_prompt}
-
-Generate a motion prompt that focuses on:
-- Camera movements (pan, zoom, tilt, etc.)
-- Key character actions
-- Important visual transitions
-
-Motion Prompt:"""
-        
-        response = client.models.generate_content(
-            model="gemini-2.0-flash-exp",
-            contents=prompt_text
-        )
-        
-        motion_prompt = response.text.strip()
-        
-        # Save to scene
-        update_scene(request.project_id, scene_id, {
-            "motion_prompt": motion_prompt
-        })
-        
+        motion_prompt = write_motion_prompt(request.project_id, scene_id, request.use_cache)
         return {"motion_prompt": motion_prompt}
-        
+    except LookupError:
+        return {"error": "Scene not found"}
     except Exception as e:
         return {"error": str(e)}
 
@@ -279,6 +669,9 @@ async def step_artist(request: StepRequest):
 @app.post("/api/step/director")
 async def step_director(request: StepRequest, authorization: Optional[str] = Header(None)):
     try:
+        from services.fair_scheduler import tenant_context, user_id_from_token, INTERACTIVE
+        from services.cancellation import cancellations, JobCancelled, DEFAULT_JOB_TIMEOUT
+        
         if not request.scene_id or not request.image_url:
             return {"error": "scene_id and image_url required"}
         
@@ -290,7 +683,14 @@ async def step_director(request: StepRequest, authorization: Optional[str] = Hea
         
         # Use the explicit prompt field; fallback to input_text if prompt empty
         used_prompt = request.prompt or request.input_text
-        result = await delegate_to_director(request.scene_id, request.image_url, used_prompt, request.project_id, token)
+        # A user is waiting on this render, so it queues as interactive work
+        # Editing the scene meanwhile cancels the render (scope keyed by scene)
+        with tenant_context(user_id_from_token(token), request.project_id, INTERACTIVE), \
+                cancellations.scope(project_id=request.project_id, scene_id=request.scene_id, timeout=DEFAULT_JOB_TIMEOUT):
+            try:
+                result = await delegate_to_director(request.scene_id, request.image_url, used_prompt, request.project_id, token)
+            except JobCancelled as e:
+                return {"error": f"Video generation cancelled: {e}"}
         return {"result": result}
     except Exception as e:
         return {"error": str(e)}
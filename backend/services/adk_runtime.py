@@ -0,0 +1,166 @@
+"""
+ADK Runtime
+Long-lived Runner registry (one per agent) over a shared session service, and
+a session manager that hands out a unique session per invocation so concurrent
+delegations for the same project or scene never share conversation state.
+Runs scoped to a project carry their history through services.session_store
+instead of a long-lived in-memory session.
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+
+from services.session_store import session_store
+from services.cancellation import check_cancelled, run_cancellable
+
+APP_NAME = "agents"
+DEFAULT_USER_ID = "system"
+# Upper bound on live sessions; the oldest are evicted first (covers leaked/cancelled runs)
+MAX_LIVE_SESSIONS = int(os.getenv("ADK_MAX_LIVE_SESSIONS", "256"))
+SESSION_IDLE_TTL = float(os.getenv("ADK_SESSION_IDLE_TTL", "21600"))
+
+session_service = InMemorySessionService()
+_runners: Dict[str, Runner] = {}
+
+
+def get_runner(agent) -> Runner:
+    """Returns the shared Runner for an agent, creating it on first use."""
+    runner = _runners.get(agent.name)
+    if runner is None:
+        runner = Runner(agent=agent, app_name=APP_NAME, session_service=session_service)
+        _runners[agent.name] = runner
+    return runner
+
+
+class SessionManager:
+    """Creates unique per-invocation sessions and keeps the live set bounded."""
+
+    def __init__(self, max_sessions: int = MAX_LIVE_SESSIONS, idle_ttl: float = SESSION_IDLE_TTL):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        # session_id -> [user_id, last_used, runs in progress], least recently used first
+        self._live: "OrderedDict[str, list]" = OrderedDict()
+        # Plain lock: bookkeeping never awaits, and callers may run on different event loops
+        self._lock = threading.Lock()
+
+    async def _delete(self, user_id: str, session_id: str):
+        try:
+            await session_service.delete_session(app_name=APP_NAME, user_id=user_id, session_id=session_id)
+        except Exception:
+            pass
+
+    def _pop_expired(self) -> list:
+        """
+        Removes sessions over capacity or idle past the TTL (least recently used
+        first) and returns them. Sessions with a run in progress are never removed.
+        """
+        now = time.monotonic()
+        expired = []
+        for session_id, (user_id, last_used, running) in list(self._live.items()):
+            if len(self._live) < self.max_sessions and now - last_used < self.idle_ttl:
+                break
+            if running:
+                continue
+            self._live.pop(session_id)
+            expired.append((user_id, session_id))
+        return expired
+
+    @contextmanager
+    def in_use(self, session_id: str):
+        """Marks a session busy for the block and refreshes its idle timer on entry and exit."""
+        def touch(delta: int):
+            with self._lock:
+                entry = self._live.get(session_id)
+                if entry:
+                    entry[1] = time.monotonic()
+                    entry[2] += delta
+                    self._live.move_to_end(session_id)
+
+        touch(1)
+        try:
+            yield
+        finally:
+            touch(-1)
+
+    async def open(self, scope: str, user_id: str = DEFAULT_USER_ID, state: Optional[dict] = None) -> str:
+        """Creates a fresh session named after scope (e.g. a project or scene ID) and returns its ID."""
+        session_id = f"{scope}_{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            expired = self._pop_expired()
+            self._live[session_id] = [user_id, time.monotonic(), 0]
+        for expired_user, expired_id in expired:
+            await self._delete(expired_user, expired_id)
+        await session_service.create_session(
+            app_name=APP_NAME,
+            user_id=user_id,
+            session_id=session_id,
+            state=state,
+        )
+        return session_id
+
+    async def close(self, session_id: str):
+        with self._lock:
+            entry = self._live.pop(session_id, None)
+        if entry:
+            await self._delete(entry[0], session_id)
+
+    @asynccontextmanager
+    async def session(self, scope: str, user_id: str = DEFAULT_USER_ID, state: Optional[dict] = None):
+        """Async context manager yielding a session ID that is deleted on exit."""
+        session_id = await self.open(scope, user_id, state)
+        try:
+            yield session_id
+        finally:
+            await self.close(session_id)
+
+    def stats(self) -> dict:
+        return {"live_sessions": len(self._live), "runners": sorted(_runners)}
+
+
+session_manager = SessionManager()
+
+
+async def run_agent(
+    agent,
+    prompt: str,
+    session_id: str,
+    user_id: str = DEFAULT_USER_ID,
+    project_id: Optional[str] = None,
+) -> str:
+    """
+    Sends one message to an agent through its shared Runner and returns the final response text.
+    With project_id, the compacted project history for this agent is prefixed to the prompt
+    and the exchange is recorded afterwards. Raises JobCancelled if the current work is cancelled.
+    """
+    runner = get_runner(agent)
+    message = prompt
+    if project_id:
+        context = await asyncio.to_thread(session_store.get_context, project_id, agent.name)
+        if context:
+            message = f"{context}\n\nCurrent request:\n{prompt}"
+    content = types.Content(role='user', parts=[types.Part(text=message)])
+
+    async def _collect() -> str:
+        final_response = ""
+        async for event in runner.run_async(user_id=user_id, session_id=session_id, new_message=content):
+            check_cancelled()
+            if event.is_final_response() and event.content and event.content.parts:
+                final_response = event.content.parts[0].text or ""
+        return final_response
+
+    # A cancelled run is abandoned mid-turn rather than at the next event
+    with session_manager.in_use(session_id):
+        final_response = await run_cancellable(_collect())
+
+    if project_id:
+        await asyncio.to_thread(session_store.record_exchange, project_id, agent.name, prompt, final_response)
+    return final_response
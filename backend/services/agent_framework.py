@@ -4,10 +4,16 @@ Refactored from veo-studio/src/services/agentFramework.ts
 """
 from google import genai
 from google.genai import types
+import asyncio
+import contextvars
 import os
-from typing import Dict, Any, List, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, AsyncIterator, Tuple
 from dataclasses import dataclass
 from dotenv import load_dotenv
+from services.llm_cache import llm_cache, cache_key
+from services.context_cache import context_cache
+from services.cancellation import JobCancelled, cancellations, check_cancelled, run_cancellable
 
 load_dotenv()
 
@@ -19,7 +25,10 @@ class AgentTool:
     Includes both the schema (for the model) and the implementation (for execution).
     """
     declaration: types.FunctionDeclaration
+    # Sync callables run in a worker thread; async callables are awaited directly
     execute: Callable[[Dict[str, Any]], Any]
+    # Overrides AgentConfig.tool_timeout for this tool
+    timeout: Optional[float] = None
 
 
 @dataclass
@@ -29,6 +38,21 @@ class AgentConfig:
     system_instruction: Optional[str] = None
     temperature: float = 0.7
     tools: Optional[List[AgentTool]] = None
+    max_concurrent_tools: int = 4
+    tool_timeout: float = 120.0
+    max_turns: int = 10  # Prevent infinite loops
+
+
+@dataclass
+class AgentEvent:
+    """
+    One step of an agent run, yielded by Agent.run_stream().
+    type is "tool_call", "tool_result" or "final" (data holds the response text).
+    """
+    type: str
+    name: Optional[str] = None
+    call_id: Optional[str] = None
+    data: Any = None
 
 
 class Agent:
@@ -41,6 +65,9 @@ class Agent:
         self.model_name = config.model
         self.system_instruction = config.system_instruction
         self.temperature = config.temperature
+        self.max_concurrent_tools = config.max_concurrent_tools
+        self.tool_timeout = config.tool_timeout
+        self.max_turns = config.max_turns
         self.tools: Dict[str, AgentTool] = {}
         self.gemini_tools: List[types.Tool] = []
         
@@ -57,16 +84,52 @@ class Agent:
                     types.Tool(function_declarations=function_declarations)
                 )
     
-    def run(self, input_text: str) -> str:
+    async def _execute_tool(self, index: int, call, semaphore: asyncio.Semaphore) -> Tuple[int, Any]:
+        """Runs one tool call under the concurrency limit and its timeout."""
+        tool = self.tools.get(call.name)
+        if not tool:
+            return index, {"error": f"Tool {call.name} not found"}
+        
+        timeout = tool.timeout or self.tool_timeout
+        # A thread cannot be killed, so a timed-out sync tool is stopped through its
+        # own cancellation scope: check_cancelled()/cancellable_sleep() raise there
+        async with semaphore:
+            with cancellations.scope() as tool_token:
+                try:
+                    print(f"Agent executing tool: {call.name}", call.args)
+                    if asyncio.iscoroutinefunction(tool.execute):
+                        pending = tool.execute(call.args)
+                    else:
+                        pending = asyncio.to_thread(tool.execute, call.args)
+                    return index, await asyncio.wait_for(pending, timeout=timeout)
+                except JobCancelled:
+                    # Cancellation ends the whole run, not just this tool call
+                    raise
+                except asyncio.TimeoutError:
+                    tool_token.cancel(f"tool {call.name} timed out")
+                    print(f"Tool execution timed out: {call.name} ({timeout}s)")
+                    return index, {"error": f"Tool {call.name} timed out after {timeout}s"}
+                except Exception as error:
+                    print(f"Tool execution failed: {call.name}", error)
+                    return index, {"error": str(error)}
+    
+    async def run_stream(self, input_text: str) -> AsyncIterator[AgentEvent]:
         """
-        Runs the agent with a given input.
-        Handles the "Reasoning Loop" (Model -> Tool Call -> Execute -> Model) automatically.
+        Runs the agent and yields events as the "Reasoning Loop" progresses
+        (Model -> Tool Calls -> Execute -> Model).
+        
+        All function calls of one model turn run concurrently (at most
+        max_concurrent_tools at a time, each under its timeout). Results are
+        yielded as they finish but sent back to the model in call order.
         
         Args:
             input_text: User input
             
-        Returns:
-            Agent's response text
+        Yields:
+            AgentEvent objects; the last one has type "final"
+            
+        Raises:
+            JobCancelled: The current work was cancelled (checked on every model call and turn)
         """
         try:
             # Create chat session
@@ -81,60 +144,95 @@ class Agent:
             if self.gemini_tools:
                 chat_config["config"].tools = self.gemini_tools
             
-            chat = self.client.chats.create(**chat_config)
+            # Large static prefixes (instruction + tools) are served from a context cache
+            chat_config["config"] = await asyncio.to_thread(
+                context_cache.apply_to_config, self.model_name, chat_config["config"]
+            )
+            
+            chat = self.client.aio.chats.create(**chat_config)
             
             # Send initial message
-            response = chat.send_message(message=input_text)
+            response = await run_cancellable(chat.send_message(message=input_text))
             
             # Agent execution loop
-            max_turns = 10  # Prevent infinite loops
             turns = 0
             
-            while (
-                hasattr(response, 'function_calls') and
-                response.function_calls and
-                len(response.function_calls) > 0 and
-                turns < max_turns
-            ):
+            while response.function_calls and turns < self.max_turns:
+                check_cancelled()
                 turns += 1
-                function_response_parts = []
+                calls = list(response.function_calls)
+                for call in calls:
+                    yield AgentEvent(type="tool_call", name=call.name, call_id=call.id, data=call.args)
                 
-                # Execute all requested tools
-                for call in response.function_calls:
-                    tool = self.tools.get(call.name)
-                    
-                    if tool:
-                        try:
-                            print(f"Agent executing tool: {call.name}", call.args)
-                            result = tool.execute(call.args)
-                        except Exception as error:
-                            print(f"Tool execution failed: {call.name}", error)
-                            result = {
-                                "error": str(error)
-                            }
-                    else:
-                        result = {"error": f"Tool {call.name} not found"}
-                    
-                    # Construct response part for the model
-                    function_response_parts.append(
-                        types.Part(
-                            function_response=types.FunctionResponse(
-                                id=call.id,
-                                name=call.name,
-                                response={"result": result}
-                            )
+                # Execute all requested tools concurrently
+                semaphore = asyncio.Semaphore(self.max_concurrent_tools)
+                tasks = [
+                    asyncio.create_task(self._execute_tool(index, call, semaphore))
+                    for index, call in enumerate(calls)
+                ]
+                results: List[Any] = [None] * len(calls)
+                try:
+                    for finished in asyncio.as_completed(tasks):
+                        index, result = await finished
+                        results[index] = result
+                        yield AgentEvent(type="tool_result", name=calls[index].name, call_id=calls[index].id, data=result)
+                finally:
+                    for task in tasks:
+                        task.cancel()
+                
+                # Construct response parts for the model, in the order the calls were made
+                function_response_parts = [
+                    types.Part(
+                        function_response=types.FunctionResponse(
+                            id=call.id,
+                            name=call.name,
+                            response={"result": result}
                         )
                     )
+                    for call, result in zip(calls, results)
+                ]
                 
                 # Send tool results back to the model
-                if function_response_parts:
-                    response = chat.send_message(message=function_response_parts)
+                response = await run_cancellable(chat.send_message(message=function_response_parts))
             
-            return response.text or ""
+            yield AgentEvent(type="final", data=response.text or "")
         
         except Exception as error:
             print(f"Agent run failed: {error}")
             raise
+    
+    async def run(self, input_text: str) -> str:
+        """
+        Runs the agent with a given input and returns its final response text.
+        
+        Args:
+            input_text: User input
+            
+        Returns:
+            Agent's response text
+        """
+        final_text = ""
+        async for event in self.run_stream(input_text):
+            if event.type == "final":
+                final_text = event.data
+        return final_text
+    
+    def run_sync(self, input_text: str) -> str:
+        """
+        Blocking wrapper around run() for synchronous callers (worker threads).
+        Called from a coroutine it still works, but blocks that event loop until
+        the run finishes, so async code should await run() instead.
+        """
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.run(input_text))
+        
+        # Already inside an event loop: run on a helper thread, carrying over the
+        # contextvars (tenant, cancellation scope) the executor would not copy
+        ctx = contextvars.copy_context()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(ctx.run, asyncio.run, self.run(input_text)).result()
 
 
 def create_director_agent() -> Agent:
@@ -166,15 +264,18 @@ EXAMPLE OUTPUT: "Close-up, low-angle shot of a fluffy calico cat sitting at a ne
 
 
 # Convenience function for motion prompt enhancement
-def enhance_motion_prompt(simple_prompt: str) -> str:
+def enhance_motion_prompt(simple_prompt: str, use_cache: bool = True, cache_ttl: Optional[int] = None) -> str:
     """
     Enhance a simple motion prompt into a cinematic description.
     
     Args:
         simple_prompt: Simple user prompt
+        use_cache: Reuse the answer for an identical earlier request
+        cache_ttl: Cache lifetime in seconds (defaults to LLM_CACHE_TTL)
         
     Returns:
         Enhanced cinematic prompt
     """
     agent = create_director_agent()
-    return agent.run(simple_prompt)
+    key = cache_key(agent.model_name, agent.system_instruction, agent.temperature, simple_prompt)
+    return llm_cache.get_or_compute(key, lambda: agent.run_sync(simple_prompt), ttl=cache_ttl, use_cache=use_cache)
@@ -0,0 +1,301 @@
+"""
+Cancellation and Deadlines
+A CancellationToken marks a unit of generation work as cancelled, either
+explicitly (user cancel, scene edited) or when its deadline passes. The
+current token travels in a contextvar (asyncio tasks and asyncio.to_thread
+inherit it), so deep call sites only need check_cancelled() between steps
+and cancellable_sleep() instead of time.sleep() in poll loops.
+
+Tokens opened with cancellations.scope() are registered by job, project and
+scene ID, which is how the API finds and cancels in-flight work. Nested scopes
+make child tokens: cancelling a parent cancels its children, and a child's
+deadline never outlives its parent's.
+"""
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Upper bound for one generation job unless the request sets its own timeout
+DEFAULT_JOB_TIMEOUT = float(os.getenv("GENERATION_JOB_TIMEOUT", "3600"))
+
+
+class JobCancelled(Exception):
+    """Raised inside work whose token was cancelled."""
+
+
+class DeadlineExceeded(JobCancelled):
+    """Raised inside work whose token's deadline has passed."""
+
+
+class CancellationToken:
+    def __init__(self, timeout: Optional[float] = None, parent: Optional["CancellationToken"] = None):
+        self.parent = parent
+        self.deadline = time.monotonic() + timeout if timeout else None
+        if parent and parent.deadline and (self.deadline is None or parent.deadline < self.deadline):
+            self.deadline = parent.deadline
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self._reason: Optional[str] = None
+        self._detach = parent.add_callback(lambda: self.cancel(parent.reason)) if parent else None
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        return self.deadline is not None and time.monotonic() >= self.deadline
+
+    @property
+    def reason(self) -> Optional[str]:
+        if self._reason:
+            return self._reason
+        if self.cancelled:
+            return "deadline exceeded"
+        return None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds until the deadline (None without one)."""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def cancel(self, reason: str = "cancelled"):
+        """Cancels the token and runs its callbacks once (in the calling thread)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Cancellation callback failed: {e}")
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """
+        Registers callback to run on cancel (immediately if already cancelled).
+        Deadlines do not fire callbacks; waiters bound their waits with remaining().
+        Returns a function that unregisters it.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback()
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def detach(self):
+        """Stops following the parent (called when the token's scope ends)."""
+        if self._detach:
+            self._detach()
+            self._detach = None
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            if self._event.is_set():
+                raise JobCancelled(self._reason)
+            raise DeadlineExceeded("deadline exceeded")
+
+    def sleep(self, seconds: float):
+        """Sleeps like time.sleep but wakes and raises as soon as the token is cancelled."""
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            self._event.wait(remaining)
+        else:
+            self._event.wait(seconds)
+        self.raise_if_cancelled()
+
+
+_current_token: ContextVar[Optional[CancellationToken]] = ContextVar("cancellation_token", default=None)
+
+
+def current_token() -> Optional[CancellationToken]:
+    return _current_token.get()
+
+
+def check_cancelled():
+    """Raises JobCancelled if the current work has been cancelled or is past its deadline."""
+    token = _current_token.get()
+    if token:
+        token.raise_if_cancelled()
+
+
+def cancellable_sleep(seconds: float):
+    """time.sleep that ends early (raising JobCancelled) when the current work is cancelled."""
+    token = _current_token.get()
+    if token:
+        token.sleep(seconds)
+    else:
+        time.sleep(seconds)
+
+
+async def run_cancellable(awaitable: Awaitable[Any]) -> Any:
+    """Awaits awaitable, abandoning it (and raising JobCancelled) once the current work is cancelled."""
+    token = _current_token.get()
+    if token is None:
+        return await awaitable
+    token.raise_if_cancelled()
+
+    task = asyncio.ensure_future(awaitable)
+    loop = asyncio.get_running_loop()
+    remove = token.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+    try:
+        return await asyncio.wait_for(task, token.remaining())
+    except (asyncio.CancelledError, asyncio.TimeoutError):
+        if token.cancelled:
+            token.raise_if_cancelled()
+        raise
+    finally:
+        remove()
+
+
+class CancellationRegistry:
+    """Tracks open tokens by job, project and scene so the API can cancel them."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Dict[str, Any]] = {}
+
+    @contextmanager
+    def scope(
+        self,
+        job_id: Optional[str] = None,
+        project_id: Optional[str] = None,
+        scene_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Runs the block under a new token (a child of the current one), registered
+        under the given IDs. Yields the token.
+        """
+        token = CancellationToken(timeout, parent=_current_token.get())
+        key = id(token)
+        with self._lock:
+            self._entries[key] = {"token": token, "job_id": job_id, "project_id": project_id, "scene_id": scene_id}
+        reset = _current_token.set(token)
+        try:
+            yield token
+        finally:
+            _current_token.reset(reset)
+            token.detach()
+            with self._lock:
+                self._entries.pop(key, None)
+
+    def _cancel_matching(self, reason: str, **ids) -> int:
+        with self._lock:
+            tokens = [
+                entry["token"] for entry in self._entries.values()
+                if all(entry[name] == value for name, value in ids.items())
+            ]
+        for token in tokens:
+            token.cancel(reason)
+        return len(tokens)
+
+    def cancel_job(self, job_id: str, reason: str = "cancelled by user") -> int:
+        """Cancels the work running under job_id; returns how many scopes were cancelled."""
+        return self._cancel_matching(reason, job_id=job_id)
+
+    def cancel_scene(self, project_id: str, scene_id: str, reason: str = "scene changed") -> int:
+        """Cancels every in-flight generation for one scene."""
+        return self._cancel_matching(reason, project_id=project_id, scene_id=scene_id)
+
+    def cancel_project(self, project_id: str, reason: str = "cancelled by user") -> int:
+        return self._cancel_matching(reason, project_id=project_id)
+
+    def active(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {
+                    "jobId": entry["job_id"],
+                    "projectId": entry["project_id"],
+                    "sceneId": entry["scene_id"],
+                    "remaining": entry["token"].remaining(),
+                }
+                for entry in self._entries.values()
+            ]
+
+
+cancellations = CancellationRegistry()
+
+
+def as_cancellable_job(
+    fn: Callable[..., Any],
+    job_id: Optional[str] = None,
+    project_id: Optional[str] = None,
+    scene_id: Optional[str] = None,
+    timeout: Optional[float] = DEFAULT_JOB_TIMEOUT,
+) -> Callable[..., Any]:
+    """
+    Wraps fn (sync or async) to run in a registered cancellation scope, e.g. for
+    a BackgroundTasks job. With a job_id, the job record follows the run: a job
+    cancelled before it started is skipped, and the job is marked running, then
+    completed, failed or cancelled, unless fn already set a final status itself.
+    """
+    from utils.job_store import get_job, update_job
+
+    def status() -> Optional[str]:
+        return (get_job(job_id) or {}).get("status") if job_id else None
+
+    def start() -> bool:
+        if status() == "cancelled":
+            return False
+        if status() == "queued":
+            update_job(job_id, {"status": "running"})
+        return True
+
+    def finish(updates: Dict[str, Any]):
+        if status() in ("queued", "running"):
+            update_job(job_id, updates)
+
+    def cancelled(error: JobCancelled):
+        print(f"🛑 Job {job_id or scene_id or project_id} cancelled: {error}")
+        if job_id:
+            update_job(job_id, {"status": "cancelled", "error": str(error)})
+
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def run_async(*args, **kwargs):
+            if not start():
+                return None
+            with cancellations.scope(job_id, project_id, scene_id, timeout):
+                try:
+                    result = await fn(*args, **kwargs)
+                except JobCancelled as e:
+                    cancelled(e)
+                    return None
+                except Exception as e:
+                    finish({"status": "failed", "error": str(e)})
+                    raise
+            finish({"status": "completed"})
+            return result
+        return run_async
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        if not start():
+            return None
+        with cancellations.scope(job_id, project_id, scene_id, timeout):
+            try:
+                result = fn(*args, **kwargs)
+            except JobCancelled as e:
+                cancelled(e)
+                return None
+            except Exception as e:
+                finish({"status": "failed", "error": str(e)})
+                raise
+        finish({"status": "completed"})
+        return result
+    return run
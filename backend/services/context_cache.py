@@ -0,0 +1,225 @@
+"""
+Gemini Context Cache Manager
+Registers stable prompt prefixes (system instructions, tool declarations,
+production bibles) as Gemini cached content so they are not resent and
+re-processed on every call. Caches are keyed by a hash of their content,
+extended shortly before they expire, and superseded entries (e.g. an older
+bible for the same project) are deleted.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+from google import genai
+from google.genai import types
+
+CACHE_TTL = int(os.getenv("CONTEXT_CACHE_TTL", "3600"))
+# Extend a cache when it has less than this many seconds left
+REFRESH_MARGIN = int(os.getenv("CONTEXT_CACHE_REFRESH_MARGIN", "300"))
+# Gemini rejects caches below a minimum token count (~1-4k tokens depending on the model);
+# smaller prefixes are sent inline as before
+MIN_CACHE_CHARS = int(os.getenv("CONTEXT_CACHE_MIN_CHARS", "4096"))
+# After a failed create (unsupported model, quota, too small) don't retry for a while
+FAILURE_BACKOFF = 600
+CACHE_DISABLED = os.getenv("CONTEXT_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+
+def _dump(value: Any) -> Any:
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    if isinstance(value, (list, tuple)):
+        return [_dump(v) for v in value]
+    return value
+
+
+def _system_text(system_instruction: Any) -> str:
+    if system_instruction is None:
+        return ""
+    if isinstance(system_instruction, str):
+        return system_instruction
+    return json.dumps(_dump(system_instruction), sort_keys=True, default=str)
+
+
+def content_key(
+    model: str,
+    system_instruction: Any,
+    tools: Optional[List[Any]],
+    contents: Optional[List[Any]],
+    tool_config: Any = None,
+) -> str:
+    payload = json.dumps(
+        {
+            "model": model,
+            "system": _system_text(system_instruction),
+            "tools": _dump(tools or []),
+            "tool_config": _dump(tool_config),
+            "contents": _dump(contents or []),
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ContextCacheManager:
+    """Creates, refreshes and invalidates Gemini cached contents."""
+
+    def __init__(self, client: Optional[genai.Client] = None):
+        self._client = client
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._failures: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._create_lock = threading.Lock()
+
+    @property
+    def client(self) -> genai.Client:
+        if self._client is None:
+            self._client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        return self._client
+
+    def _create(self, key: str, model: str, system_instruction, tools, contents, tags, tool_config=None) -> Dict[str, Any]:
+        cached = self.client.caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                display_name=f"ctx_{key[:16]}",
+                system_instruction=system_instruction,
+                tools=tools or None,
+                tool_config=tool_config,
+                contents=contents or None,
+                ttl=f"{CACHE_TTL}s",
+            ),
+        )
+        return {"name": cached.name, "expires_at": time.time() + CACHE_TTL, "tags": set(tags)}
+
+    def _refresh(self, entry: Dict[str, Any]):
+        self.client.caches.update(
+            name=entry["name"],
+            config=types.UpdateCachedContentConfig(ttl=f"{CACHE_TTL}s"),
+        )
+        entry["expires_at"] = time.time() + CACHE_TTL
+
+    def _delete(self, name: str):
+        try:
+            self.client.caches.delete(name=name)
+        except Exception:
+            # Already expired or deleted
+            pass
+
+    def get_or_create(
+        self,
+        model: str,
+        system_instruction: Any = None,
+        tools: Optional[List[Any]] = None,
+        contents: Optional[List[Any]] = None,
+        tags: Iterable[str] = (),
+        tool_config: Any = None,
+    ) -> Optional[str]:
+        """
+        Returns the cached content name for this prefix, creating or extending it as needed.
+        Blocking (create/extend are API calls): async callers go through a worker thread.
+        Returns None when caching is disabled, the prefix is too small, or the API refused it;
+        callers then send the prefix inline.
+
+        tags: labels such as "bible:{project_id}". Creating a cache with a tag deletes older
+        caches carrying the same tag, and invalidate(tag) drops them explicitly.
+        """
+        if CACHE_DISABLED:
+            return None
+        size = len(_system_text(system_instruction)) + len(json.dumps(_dump(tools or []), default=str)) \
+            + len(json.dumps(_dump(contents or []), default=str))
+        if size < MIN_CACHE_CHARS:
+            return None
+
+        key = content_key(model, system_instruction, tools, contents, tool_config)
+        entry = self._entries.get(key)
+        if entry and entry["expires_at"] - time.time() > REFRESH_MARGIN:
+            return entry["name"]
+
+        # Creates/refreshes are rare (about once per TTL); serialize them so concurrent
+        # callers don't register duplicate caches for the same prefix
+        with self._create_lock:
+            now = time.time()
+            if self._failures.get(key, 0) > now:
+                return None
+            entry = self._entries.get(key)
+            try:
+                if entry and entry["expires_at"] - now > REFRESH_MARGIN:
+                    return entry["name"]
+                if entry and entry["expires_at"] > now:
+                    self._refresh(entry)
+                    return entry["name"]
+                entry = self._create(key, model, system_instruction, tools, contents, tags, tool_config)
+            except Exception as e:
+                print(f"⚠️ Context cache unavailable for {model}: {e}")
+                with self._lock:
+                    self._entries.pop(key, None)
+                self._failures[key] = now + FAILURE_BACKOFF
+                return None
+
+            with self._lock:
+                superseded = [
+                    k for k, other in self._entries.items()
+                    if k != key and other["tags"] & entry["tags"]
+                ]
+                stale = [self._entries.pop(k)["name"] for k in superseded]
+                self._entries[key] = entry
+        for name in stale:
+            self._delete(name)
+        return entry["name"]
+
+    def invalidate(self, tag: str):
+        """Deletes every cache carrying the tag (e.g. when a project's bible changes)."""
+        with self._lock:
+            keys = [k for k, entry in self._entries.items() if tag in entry["tags"]]
+            names = [self._entries.pop(k)["name"] for k in keys]
+        for name in names:
+            self._delete(name)
+
+    def apply_to_config(
+        self,
+        model: str,
+        config: types.GenerateContentConfig,
+        contents: Optional[List[Any]] = None,
+        tags: Iterable[str] = (),
+    ) -> types.GenerateContentConfig:
+        """
+        Returns a copy of config that references cached content instead of carrying the
+        system instruction and tools inline (or config unchanged when not cached).
+        The API rejects tool_config next to cached_content, so it is stored in the cache too.
+        """
+        name = self.get_or_create(model, config.system_instruction, config.tools, contents, tags, config.tool_config)
+        if not name:
+            return config
+        return config.model_copy(update={
+            "cached_content": name,
+            "system_instruction": None,
+            "tools": None,
+            "tool_config": None,
+        })
+
+    async def before_model_callback(self, callback_context, llm_request):
+        """
+        ADK before_model_callback: moves the agent's instruction, tool declarations and
+        tool config into a context cache. Returns None so the (now lighter) request proceeds.
+        Cache creation and refresh run on a worker thread, off the event loop.
+        """
+        config = llm_request.config
+        if config is None or config.cached_content or not llm_request.model:
+            return None
+        name = await asyncio.to_thread(
+            self.get_or_create, llm_request.model, config.system_instruction, config.tools,
+            None, (), config.tool_config
+        )
+        if name:
+            config.cached_content = name
+            config.system_instruction = None
+            config.tools = None
+            config.tool_config = None
+        return None
+
+
+context_cache = ContextCacheManager()
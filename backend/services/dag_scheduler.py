@@ -0,0 +1,171 @@
+"""
+DAG Scheduler
+Runs a dependency graph of tasks on asyncio: every task whose dependencies
+have finished starts immediately, bounded by a global concurrency limit and
+per-stage limits (e.g. at most 4 Veo renders at once). Tasks may add new
+tasks while the graph runs (a writer streaming scenes adds their nodes as
+they arrive). When a task fails, everything downstream of it is skipped and
+independent branches keep going.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from services.cancellation import check_cancelled
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+@dataclass
+class DagTask:
+    """
+    One node of the graph. fn receives {dependency_id: result} and may be sync
+    (run in a worker thread) or async.
+    """
+    id: str
+    stage: str
+    fn: Callable[[Dict[str, Any]], Any]
+    deps: List[str] = field(default_factory=list)
+    status: str = PENDING
+    result: Any = None
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "stage": self.stage,
+            "status": self.status,
+            "error": self.error,
+            "elapsed": round(self.finished_at - self.started_at, 3) if self.started_at and self.finished_at else None,
+        }
+
+
+class DagScheduler:
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        stage_limits: Optional[Dict[str, int]] = None,
+        on_event: Optional[Callable[[str, DagTask], None]] = None,
+    ):
+        """
+        Args:
+            max_concurrency: Tasks running at once across all stages
+            stage_limits: {stage: max running tasks of that stage}; unlisted stages only share the global limit
+            on_event: Called with ("started" | "done" | "failed" | "skipped", task)
+        """
+        self.max_concurrency = max_concurrency
+        self.stage_limits = stage_limits or {}
+        self.on_event = on_event
+        self.tasks: Dict[str, DagTask] = {}
+        self._global: Optional[asyncio.Semaphore] = None
+        self._stages: Dict[str, asyncio.Semaphore] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wake: Optional[asyncio.Event] = None
+
+    def add(self, task_id: str, stage: str, fn: Callable[[Dict[str, Any]], Any], deps: Sequence[str] = ()) -> DagTask:
+        """Adds a task. Allowed before run() and from tasks running on the scheduler's loop."""
+        if task_id in self.tasks:
+            raise ValueError(f"Duplicate task id: {task_id}")
+        unknown = [d for d in deps if d not in self.tasks]
+        if unknown:
+            # Dependencies must already exist, which also rules out cycles
+            raise ValueError(f"Task {task_id} depends on unknown tasks: {', '.join(unknown)}")
+        task = DagTask(id=task_id, stage=stage, fn=fn, deps=list(deps))
+        self.tasks[task_id] = task
+        if self._wake:
+            self._wake.set()
+        return task
+
+    def _emit(self, event: str, task: DagTask):
+        if self.on_event:
+            try:
+                self.on_event(event, task)
+            except Exception as e:
+                print(f"⚠️ DAG event handler failed: {e}")
+
+    def _stage_semaphore(self, stage: str) -> Optional[asyncio.Semaphore]:
+        limit = self.stage_limits.get(stage)
+        if not limit:
+            return None
+        if stage not in self._stages:
+            self._stages[stage] = asyncio.Semaphore(limit)
+        return self._stages[stage]
+
+    async def _execute(self, task: DagTask):
+        stage_semaphore = self._stage_semaphore(task.stage)
+        inputs = {dep: self.tasks[dep].result for dep in task.deps}
+        try:
+            # Wait for the stage first: a task queued behind its stage limit must not
+            # hold a global slot that another stage could use meanwhile
+            if stage_semaphore:
+                await stage_semaphore.acquire()
+            try:
+                async with self._global:
+                    # A cancelled run fails its remaining tasks instead of starting them
+                    check_cancelled()
+                    task.status = RUNNING
+                    task.started_at = time.time()
+                    self._emit("started", task)
+                    if asyncio.iscoroutinefunction(task.fn):
+                        task.result = await task.fn(inputs)
+                    else:
+                        task.result = await asyncio.to_thread(task.fn, inputs)
+            finally:
+                if stage_semaphore:
+                    stage_semaphore.release()
+            task.status = DONE
+            task.finished_at = time.time()
+            self._emit("done", task)
+        except Exception as e:
+            task.status = FAILED
+            task.error = str(e)
+            task.finished_at = time.time()
+            self._emit("failed", task)
+        finally:
+            self._wake.set()
+
+    def _schedule_ready(self):
+        for task in self.tasks.values():
+            if task.status != PENDING or task.id in self._running:
+                continue
+            dep_states = [self.tasks[d].status for d in task.deps]
+            if any(state in (FAILED, SKIPPED) for state in dep_states):
+                task.status = SKIPPED
+                task.error = "upstream task failed"
+                self._emit("skipped", task)
+                # A newly skipped task may unblock skipping of its own dependents
+                self._wake.set()
+            elif all(state == DONE for state in dep_states):
+                self._running[task.id] = asyncio.create_task(self._execute(task))
+
+    async def run(self) -> Dict[str, DagTask]:
+        """Runs until no task is pending or running; returns all tasks by id."""
+        self._global = asyncio.Semaphore(self.max_concurrency)
+        self._wake = asyncio.Event()
+        self._wake.set()
+        try:
+            while True:
+                await self._wake.wait()
+                self._wake.clear()
+                for task_id in [t for t, handle in self._running.items() if handle.done()]:
+                    del self._running[task_id]
+                self._schedule_ready()
+                if not self._running and not self._wake.is_set():
+                    break
+        finally:
+            for handle in self._running.values():
+                handle.cancel()
+        return self.tasks
+
+    def summary(self) -> Dict[str, Any]:
+        counts: Dict[str, int] = {}
+        for task in self.tasks.values():
+            counts[task.status] = counts.get(task.status, 0) + 1
+        return {"counts": counts, "tasks": [t.summary() for t in self.tasks.values()]}
@@ -0,0 +1,330 @@
+"""
+Fair Generation Scheduler
+Shares a fixed number of generation slots (concurrent Veo operations) between
+tenants. Waiting requests are ordered by weighted fair queuing: priority
+classes get slots in proportion to their weights (interactive previews well
+ahead of batch renders), and within a class, users are served round-robin by
+virtual finish time so one large project cannot take every slot. Per-user and
+per-project caps bound any single tenant. Queue wait times are tracked per
+class.
+
+The tenant (user, project, priority class) travels in a contextvar set with
+tenant_context(), so deep call sites only need `with generation_scheduler.slot():`.
+"""
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from services.cancellation import current_token
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+
+GENERATION_SLOTS = int(os.getenv("GENERATION_SLOTS", "4"))
+# Relative share of slots each class gets while both have waiters
+CLASS_WEIGHTS = {
+    INTERACTIVE: float(os.getenv("SCHEDULER_INTERACTIVE_WEIGHT", "8")),
+    BATCH: float(os.getenv("SCHEDULER_BATCH_WEIGHT", "1")),
+}
+PER_USER_CAP = int(os.getenv("SCHEDULER_PER_USER_CAP", "3"))
+PER_PROJECT_CAP = int(os.getenv("SCHEDULER_PER_PROJECT_CAP", "3"))
+WAIT_SAMPLES = 1000
+
+
+@dataclass(frozen=True)
+class Tenant:
+    user_id: str = "anonymous"
+    project_id: Optional[str] = None
+    priority: str = BATCH
+    weight: float = 1.0
+
+
+_current_tenant: ContextVar[Tenant] = ContextVar("generation_tenant", default=Tenant())
+
+
+def current_tenant() -> Tenant:
+    return _current_tenant.get()
+
+
+@contextmanager
+def tenant_context(
+    user_id: Optional[str] = None,
+    project_id: Optional[str] = None,
+    priority: Optional[str] = None,
+    weight: Optional[float] = None,
+):
+    """Sets the tenant for generation work started in this block (unset fields are inherited)."""
+    parent = _current_tenant.get()
+    token = _current_tenant.set(Tenant(
+        user_id=user_id or parent.user_id,
+        project_id=project_id or parent.project_id,
+        priority=priority or parent.priority,
+        weight=weight or parent.weight,
+    ))
+    try:
+        yield
+    finally:
+        _current_tenant.reset(token)
+
+
+def as_tenant(
+    fn: Callable[..., Any],
+    user_id: Optional[str] = None,
+    project_id: Optional[str] = None,
+    priority: Optional[str] = None,
+) -> Callable[..., Any]:
+    """
+    Wraps fn (sync or async) to run inside tenant_context. Background tasks start
+    after the request's own context is gone, so they carry the tenant this way.
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def run_async(*args, **kwargs):
+            with tenant_context(user_id, project_id, priority):
+                return await fn(*args, **kwargs)
+        return run_async
+
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        with tenant_context(user_id, project_id, priority):
+            return fn(*args, **kwargs)
+    return run
+
+
+# Verified ID tokens (by sha256) -> (uid, expires_at), so each token is checked once
+_verified_tokens: "OrderedDict[str, tuple]" = OrderedDict()
+_verified_lock = threading.Lock()
+VERIFIED_TOKEN_CACHE_SIZE = 1024
+
+
+def _verified_uid(token: str) -> Optional[str]:
+    """uid of a valid Firebase ID token, or None if it cannot be verified."""
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    with _verified_lock:
+        cached = _verified_tokens.get(key)
+        if cached and cached[1] > time.time():
+            _verified_tokens.move_to_end(key)
+            return cached[0]
+
+    try:
+        # Importing the config initializes the Firebase app the verifier needs
+        import utils.firebase_config  # noqa: F401
+        from firebase_admin import auth
+        decoded = auth.verify_id_token(token)
+    except Exception as e:
+        print(f"⚠️ Unverified bearer token scheduled as anonymous: {e}")
+        return None
+
+    with _verified_lock:
+        _verified_tokens[key] = (decoded["uid"], decoded.get("exp", 0))
+        _verified_tokens.move_to_end(key)
+        while len(_verified_tokens) > VERIFIED_TOKEN_CACHE_SIZE:
+            _verified_tokens.popitem(last=False)
+    return decoded["uid"]
+
+
+def user_id_from_token(token: Optional[str]) -> str:
+    """
+    Tenant key for a bearer token: the uid of a verified Firebase ID token, so a
+    refreshed token stays the same tenant and made-up tokens cannot add tenants.
+    Missing or unverifiable tokens are scheduled as "anonymous".
+    """
+    uid = _verified_uid(token) if token else None
+    return f"user_{uid}" if uid else "anonymous"
+
+
+@dataclass
+class _Waiter:
+    tenant: Tenant
+    virtual_finish: float
+    enqueued_at: float
+    granted: bool = False
+
+
+@dataclass
+class _ClassStats:
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=WAIT_SAMPLES))
+    granted: int = 0
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return round(ordered[index], 3)
+
+
+class FairScheduler:
+    def __init__(
+        self,
+        slots: int = GENERATION_SLOTS,
+        class_weights: Optional[Dict[str, float]] = None,
+        per_user_cap: int = PER_USER_CAP,
+        per_project_cap: int = PER_PROJECT_CAP,
+    ):
+        self.slots = slots
+        self.class_weights = class_weights or dict(CLASS_WEIGHTS)
+        self.per_user_cap = per_user_cap
+        self.per_project_cap = per_project_cap
+        self._cond = threading.Condition()
+        self._waiting: Dict[str, List[_Waiter]] = {cls: [] for cls in self.class_weights}
+        self._running = 0
+        self._running_by_user: Dict[str, int] = {}
+        self._running_by_project: Dict[str, int] = {}
+        # WFQ clocks: per class (across classes) and per (class, user) flow (within a class)
+        self._class_clock: Dict[str, float] = {cls: 0.0 for cls in self.class_weights}
+        self._flow_finish: Dict[tuple, float] = {}
+        self._class_vtime: Dict[str, float] = {cls: 0.0 for cls in self.class_weights}
+        # Tag of the last grant; a class that was idle restarts from here instead of bursting
+        self._system_clock = 0.0
+        self._stats: Dict[str, _ClassStats] = {cls: _ClassStats() for cls in self.class_weights}
+
+    def _eligible(self, tenant: Tenant) -> bool:
+        if self._running_by_user.get(tenant.user_id, 0) >= self.per_user_cap:
+            return False
+        if tenant.project_id and self._running_by_project.get(tenant.project_id, 0) >= self.per_project_cap:
+            return False
+        return True
+
+    def _dispatch(self):
+        """Grants free slots to eligible waiters in WFQ order. Caller holds the lock."""
+        granted_any = False
+        while self._running < self.slots:
+            best_cls, best = None, None
+            for cls, waiters in self._waiting.items():
+                candidates = [w for w in waiters if self._eligible(w.tenant)]
+                if not candidates:
+                    continue
+                head = min(candidates, key=lambda w: (w.virtual_finish, w.enqueued_at))
+                # The class whose next grant finishes earliest on its weighted clock goes first
+                tag = self._class_clock[cls] + 1.0 / self.class_weights[cls]
+                if best is None or tag < best[0]:
+                    best_cls, best = cls, (tag, head)
+            if best is None:
+                break
+
+            tag, waiter = best
+            self._class_clock[best_cls] = tag
+            self._system_clock = tag
+            self._class_vtime[best_cls] = max(self._class_vtime[best_cls], waiter.virtual_finish)
+            self._waiting[best_cls].remove(waiter)
+            waiter.granted = True
+            tenant = waiter.tenant
+            self._running += 1
+            self._running_by_user[tenant.user_id] = self._running_by_user.get(tenant.user_id, 0) + 1
+            if tenant.project_id:
+                self._running_by_project[tenant.project_id] = self._running_by_project.get(tenant.project_id, 0) + 1
+            stats = self._stats[best_cls]
+            stats.waits.append(time.monotonic() - waiter.enqueued_at)
+            stats.granted += 1
+            granted_any = True
+
+        if granted_any:
+            self._cond.notify_all()
+
+    def _release(self, tenant: Tenant):
+        with self._cond:
+            self._running -= 1
+            self._running_by_user[tenant.user_id] -= 1
+            if not self._running_by_user[tenant.user_id]:
+                del self._running_by_user[tenant.user_id]
+            if tenant.project_id:
+                self._running_by_project[tenant.project_id] -= 1
+                if not self._running_by_project[tenant.project_id]:
+                    del self._running_by_project[tenant.project_id]
+            self._dispatch()
+
+    @contextmanager
+    def slot(
+        self,
+        project_id: Optional[str] = None,
+        priority: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Blocks until a generation slot is granted to the current tenant, holds it for the block.
+        project_id/priority override the tenant context. Raises TimeoutError after `timeout` seconds,
+        and JobCancelled as soon as the current work is cancelled while still queued.
+        """
+        base = current_tenant()
+        cls = priority or base.priority
+        if cls not in self.class_weights:
+            cls = BATCH
+        tenant = Tenant(base.user_id, project_id or base.project_id, cls, base.weight)
+
+        token = current_token()
+        if token:
+            token.raise_if_cancelled()
+
+        def wake():
+            with self._cond:
+                self._cond.notify_all()
+
+        with self._cond:
+            flow = (cls, tenant.user_id)
+            start = max(self._class_vtime[cls], self._flow_finish.get(flow, 0.0))
+            waiter = _Waiter(tenant, start + 1.0 / max(tenant.weight, 1e-6), time.monotonic())
+            self._flow_finish[flow] = waiter.virtual_finish
+            if not self._waiting[cls]:
+                self._class_clock[cls] = max(self._class_clock[cls], self._system_clock)
+            self._waiting[cls].append(waiter)
+            self._dispatch()
+
+            deadline = time.monotonic() + timeout if timeout else None
+            remove_wake = token.add_callback(wake) if token else None
+            try:
+                while not waiter.granted:
+                    remaining = deadline - time.monotonic() if deadline else None
+                    if token and token.cancelled:
+                        self._waiting[cls].remove(waiter)
+                        token.raise_if_cancelled()
+                    if remaining is not None and remaining <= 0:
+                        self._waiting[cls].remove(waiter)
+                        raise TimeoutError(f"No generation slot within {timeout}s")
+                    # The token's deadline does not notify, so bound the wait by it too
+                    token_remaining = token.remaining() if token else None
+                    if token_remaining is not None:
+                        remaining = token_remaining if remaining is None else min(remaining, token_remaining)
+                    self._cond.wait(remaining)
+            finally:
+                if remove_wake:
+                    remove_wake()
+
+        try:
+            yield
+        finally:
+            self._release(tenant)
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            classes = {}
+            for cls, stats in self._stats.items():
+                waits = list(stats.waits)
+                classes[cls] = {
+                    "waiting": len(self._waiting[cls]),
+                    "granted": stats.granted,
+                    "waitP50": _percentile(waits, 50),
+                    "waitP95": _percentile(waits, 95),
+                    "waitMax": round(max(waits), 3) if waits else None,
+                }
+            return {
+                "slots": self.slots,
+                "running": self._running,
+                "runningByUser": dict(self._running_by_user),
+                "runningByProject": dict(self._running_by_project),
+                "perUserCap": self.per_user_cap,
+                "perProjectCap": self.per_project_cap,
+                "classes": classes,
+            }
+
+
+generation_scheduler = FairScheduler()
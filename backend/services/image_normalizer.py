@@ -0,0 +1,186 @@
+"""
+Reference Image Normalization for Veo submissions
+Detects formats by magic bytes, fits images to the target resolution/aspect
+ratio and caches the encoded payload by content hash.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional, Tuple
+
+import requests
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache", "veo_images")
+MEMORY_CACHE_SIZE = 64
+# Digest entries are tiny, so many more source files are remembered than payloads
+SOURCE_DIGEST_CACHE_SIZE = 4096
+JPEG_QUALITY = 90
+
+# (resolution, aspect_ratio) -> (width, height)
+TARGET_SIZES = {
+    ("720p", "16:9"): (1280, 720),
+    ("720p", "9:16"): (720, 1280),
+    ("1080p", "16:9"): (1920, 1080),
+    ("1080p", "9:16"): (1080, 1920),
+}
+
+_payloads: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+# (path, mtime_ns, size) -> content sha256, so unchanged files are never re-read
+_source_digests: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def detect_mime_type(data: bytes) -> Optional[str]:
+    """Identifies an image by its magic bytes rather than its file extension."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return None
+
+
+def target_size(resolution: str, aspect_ratio: str) -> Tuple[int, int]:
+    return TARGET_SIZES.get((resolution, aspect_ratio), TARGET_SIZES[("720p", "16:9")])
+
+
+def _cache_key(digest: str, size: Tuple[int, int], crop: bool) -> str:
+    return f"{digest}_{size[0]}x{size[1]}_{'crop' if crop else 'fit'}"
+
+
+def _encode(data: bytes, size: Tuple[int, int], crop: bool) -> Tuple[bytes, str]:
+    from PIL import Image, ImageOps
+
+    mime_type = detect_mime_type(data)
+    with Image.open(BytesIO(data)) as im:
+        im = ImageOps.exif_transpose(im)
+        if crop:
+            if im.size == size and mime_type in ("image/jpeg", "image/png"):
+                return data, mime_type
+            # Center-crop to the target aspect ratio, then resize to the exact frame size
+            out = ImageOps.fit(im, size, Image.Resampling.LANCZOS)
+        else:
+            if im.width <= size[0] and im.height <= size[1] and mime_type in ("image/jpeg", "image/png"):
+                return data, mime_type
+            out = im.copy()
+            out.thumbnail(size, Image.Resampling.LANCZOS)
+
+        has_alpha = out.mode in ("RGBA", "LA") or (out.mode == "P" and "transparency" in out.info)
+        buffer = BytesIO()
+        if has_alpha:
+            out.save(buffer, format="PNG", optimize=True)
+            return buffer.getvalue(), "image/png"
+        out.convert("RGB").save(buffer, format="JPEG", quality=JPEG_QUALITY, optimize=True)
+        return buffer.getvalue(), "image/jpeg"
+
+
+def _remember(key: str, payload: Tuple[bytes, str]):
+    with _lock:
+        _payloads[key] = payload
+        _payloads.move_to_end(key)
+        while len(_payloads) > MEMORY_CACHE_SIZE:
+            _payloads.popitem(last=False)
+
+
+def _lookup(key: str) -> Optional[Tuple[bytes, str]]:
+    with _lock:
+        if key in _payloads:
+            _payloads.move_to_end(key)
+            return _payloads[key]
+
+    for ext, mime_type in (("jpg", "image/jpeg"), ("png", "image/png")):
+        path = os.path.join(CACHE_DIR, f"{key}.{ext}")
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                payload = (f.read(), mime_type)
+            _remember(key, payload)
+            return payload
+    return None
+
+
+def normalize_image_bytes(
+    data: bytes,
+    resolution: str = "720p",
+    aspect_ratio: str = "16:9",
+    crop: bool = True,
+    digest: Optional[str] = None,
+) -> Tuple[bytes, str]:
+    """
+    Returns (payload, mime_type) ready for types.Image.
+    crop=True fits frames exactly to the output size; crop=False only downscales
+    (for reference/style images). Results are cached in memory and on disk.
+    """
+    size = target_size(resolution, aspect_ratio)
+    digest = digest or hashlib.sha256(data).hexdigest()
+    key = _cache_key(digest, size, crop)
+
+    cached = _lookup(key)
+    if cached:
+        return cached
+
+    payload = _encode(data, size, crop)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    ext = "png" if payload[1] == "image/png" else "jpg"
+    path = os.path.join(CACHE_DIR, f"{key}.{ext}")
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(payload[0])
+    os.replace(tmp_path, path)
+
+    _remember(key, payload)
+    return payload
+
+
+def normalize_image_file(
+    path: str,
+    resolution: str = "720p",
+    aspect_ratio: str = "16:9",
+    crop: bool = True,
+) -> Tuple[bytes, str]:
+    """Like normalize_image_bytes, but skips reading the file when its payload is already cached."""
+    stat = os.stat(path)
+    source_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        digest = _source_digests.get(source_key)
+        if digest:
+            _source_digests.move_to_end(source_key)
+    if digest:
+        cached = _lookup(_cache_key(digest, target_size(resolution, aspect_ratio), crop))
+        if cached:
+            return cached
+
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()
+    with _lock:
+        _source_digests[source_key] = digest
+        _source_digests.move_to_end(source_key)
+        while len(_source_digests) > SOURCE_DIGEST_CACHE_SIZE:
+            _source_digests.popitem(last=False)
+    return normalize_image_bytes(data, resolution, aspect_ratio, crop, digest=digest)
+
+
+def normalize_image_source(
+    source: str,
+    resolution: str = "720p",
+    aspect_ratio: str = "16:9",
+    crop: bool = True,
+) -> Tuple[bytes, str]:
+    """Normalizes a local path, a /static/media URL or a remote http(s) URL."""
+    from utils.local_file_store import resolve_media_path
+
+    local_path = resolve_media_path(source) or source
+    if os.path.exists(local_path):
+        return normalize_image_file(local_path, resolution, aspect_ratio, crop)
+
+    response = requests.get(source)
+    response.raise_for_status()
+    return normalize_image_bytes(response.content, resolution, aspect_ratio, crop)
@@ -0,0 +1,143 @@
+"""
+Local Ken Burns Renderer
+Renders the `videoComposition` (type "ken_burns") stored on scenes into an MP4
+with ffmpeg's zoompan filter. Matches the Remotion preview in MoviePlayer.tsx
+(zoomStart/zoomEnd/panX/panY/duration) and adds easing.
+Each job renders in its own temp dir on a process pool.
+"""
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+OUTPUT_WIDTH = 1280
+OUTPUT_HEIGHT = 720
+
+# libx264 settings per preset; "fast" is meant for fallbacks
+ENCODER_PRESETS = {
+    "fast": {"preset": "veryfast", "crf": 26, "fps": 24},
+    "balanced": {"preset": "medium", "crf": 22, "fps": 30},
+    "quality": {"preset": "slow", "crf": 18, "fps": 30},
+}
+DEFAULT_PRESET = os.getenv("KEN_BURNS_PRESET", "fast")
+KEN_BURNS_WORKERS = int(os.getenv("KEN_BURNS_WORKERS", "2"))
+RENDER_TIMEOUT = 300
+
+DEFAULT_COMPOSITION = {
+    "type": "ken_burns",
+    "config": {
+        "zoomStart": 1.0,
+        "zoomEnd": 1.2,
+        "panX": 0,
+        "panY": 0,
+        "duration": 5,
+        "easing": "ease_in_out",
+    },
+}
+
+# Easing curves as ffmpeg expressions of the progress t in [0, 1]
+EASINGS = {
+    "linear": "({t})",
+    "ease_in": "(({t})*({t}))",
+    "ease_out": "(1-(1-({t}))*(1-({t})))",
+    "ease_in_out": "((1-cos(PI*({t})))/2)",
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Called from request threads; the lock keeps them from each starting a pool
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=KEN_BURNS_WORKERS)
+        return _pool
+
+
+def resolve_config(composition: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Merges a stored composition config over the defaults."""
+    config = dict(DEFAULT_COMPOSITION["config"])
+    if composition and composition.get("type", "ken_burns") == "ken_burns":
+        config.update({k: v for k, v in (composition.get("config") or {}).items() if v is not None})
+    if config["easing"] not in EASINGS:
+        config["easing"] = "linear"
+    return config
+
+
+def build_filter(config: Dict[str, Any], width: int, height: int, fps: int) -> str:
+    """Builds the scale/crop/zoompan filter graph for one composition."""
+    frames = max(1, round(float(config["duration"]) * fps))
+    progress = f"min(on/{max(frames - 1, 1)},1)"
+    eased = EASINGS[config["easing"]].format(t=progress)
+
+    zoom_start = float(config["zoomStart"])
+    zoom_end = float(config["zoomEnd"])
+    # panX/panY are output-pixel offsets like the CSS translate in the Remotion preview
+    pan_x = float(config["panX"]) / width
+    pan_y = float(config["panY"]) / height
+
+    zoom = f"{zoom_start}+({zoom_end}-{zoom_start})*{eased}"
+    x = f"max(0,min(iw-iw/zoom,(iw-iw/zoom)/2-{pan_x}*{eased}*iw))"
+    y = f"max(0,min(ih-ih/zoom,(ih-ih/zoom)/2-{pan_y}*{eased}*ih))"
+
+    # Upsample 2x first so sub-pixel zoom steps don't jitter
+    return (
+        f"scale={width * 2}:{height * 2}:force_original_aspect_ratio=increase,"
+        f"crop={width * 2}:{height * 2},"
+        f"zoompan=z='{zoom}':x='{x}':y='{y}':d={frames}:s={width}x{height}:fps={fps},"
+        f"format=yuv420p"
+    )
+
+
+def _render(image_bytes: bytes, config: Dict[str, Any], encoder: Dict[str, Any], width: int, height: int) -> bytes:
+    """Worker entry point: renders one composition in a private temp dir."""
+    fps = int(encoder["fps"])
+    with tempfile.TemporaryDirectory(prefix="kenburns_") as job_dir:
+        image_path = os.path.join(job_dir, "frame")
+        output_path = os.path.join(job_dir, "out.mp4")
+        with open(image_path, "wb") as f:
+            f.write(image_bytes)
+
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-i", image_path,
+            "-vf", build_filter(config, width, height, fps),
+            "-t", str(config["duration"]),
+            "-r", str(fps),
+            "-c:v", "libx264",
+            "-preset", encoder["preset"],
+            "-crf", str(encoder["crf"]),
+            "-pix_fmt", "yuv420p",
+            "-movflags", "+faststart",
+            output_path,
+        ], check=True, timeout=RENDER_TIMEOUT)
+
+        with open(output_path, "rb") as f:
+            return f.read()
+
+
+def render_ken_burns(
+    image_bytes: bytes,
+    composition: Optional[Dict[str, Any]] = None,
+    preset: Optional[str] = None,
+    width: int = OUTPUT_WIDTH,
+    height: int = OUTPUT_HEIGHT,
+) -> bytes:
+    """
+    Renders a Ken Burns clip from an image and returns the MP4 bytes.
+
+    Args:
+        image_bytes: Source still (any format ffmpeg can decode)
+        composition: Stored videoComposition ({"type": "ken_burns", "config": {...}})
+        preset: Encoder preset name (see ENCODER_PRESETS); defaults to KEN_BURNS_PRESET
+        width: Output width
+        height: Output height
+    """
+    config = resolve_config(composition)
+    preset_name = preset or config.get("preset") or DEFAULT_PRESET
+    encoder = ENCODER_PRESETS.get(preset_name, ENCODER_PRESETS["fast"])
+    return _get_pool().submit(_render, image_bytes, config, encoder, width, height).result()
@@ -0,0 +1,123 @@
+"""
+LLM Response Cache
+Two tiers: an in-process LRU in front of JSON files on disk. Keys hash the
+model, system instruction, temperature and input, so only identical requests
+share an answer. Every call site can opt out per call (use_cache=False).
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache", "llm")
+DEFAULT_TTL = int(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+CACHE_DISABLED = os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
+
+
+def cache_key(model: str, system_instruction: Optional[str], temperature: Optional[float], contents: Any) -> str:
+    """Stable key for one model request."""
+    payload = json.dumps(
+        {"model": model, "system": system_instruction, "temperature": temperature, "input": contents},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """In-memory LRU + on-disk cache of JSON-serializable model responses, with per-entry TTLs."""
+
+    def __init__(self, cache_dir: str = CACHE_DIR, memory_entries: int = MEMORY_ENTRIES):
+        self.cache_dir = cache_dir
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _remember(self, key: str, expires_at: float, value: Any):
+        with self._lock:
+            self._memory[key] = (expires_at, value)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value, or None if missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    return entry[1]
+                del self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if entry["expiresAt"] <= now:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+        self._remember(key, entry["expiresAt"], entry["value"])
+        return entry["value"]
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        expires_at = time.time() + (ttl or DEFAULT_TTL)
+        self._remember(key, expires_at, value)
+
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"expiresAt": expires_at, "value": value}, f)
+        os.replace(tmp_path, path)
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: Optional[int] = None, use_cache: bool = True) -> Any:
+        """Returns the cached value or computes, stores and returns it. Empty results are not cached."""
+        if not use_cache or CACHE_DISABLED:
+            return compute()
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = compute()
+        if value:
+            self.set(key, value, ttl)
+        return value
+
+    async def aget_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[Any]], ttl: Optional[int] = None, use_cache: bool = True
+    ) -> Any:
+        """Async variant of get_or_compute."""
+        if not use_cache or CACHE_DISABLED:
+            return await compute()
+        value = self.get(key)
+        if value is not None:
+            return value
+        value = await compute()
+        if value:
+            self.set(key, value, ttl)
+        return value
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,181 @@
+"""
+Project Movie Assembly
+Concatenates a project's completed scene videos (in sequence order) into one
+film with ffmpeg's concat demuxer and stream copy. Only segments whose stream
+parameters differ from the film's are re-encoded, and those conformed
+segments are cached by source hash, so changing one scene rebuilds one segment.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, Any, List, Optional
+
+from utils.local_db import get_project, list_scenes, update_project
+from utils.local_file_store import get_media_metadata, media_digest, release_media, resolve_media_path, save_blob
+from utils.media_probe import probe_video
+from services.video_packaging import package_hls
+
+SEGMENT_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache", "segments")
+CONFORM_PRESET = os.getenv("ASSEMBLY_PRESET", "veryfast")
+CONFORM_CRF = 20
+FFMPEG_TIMEOUT = 600
+
+# Stream parameters that must match for a stream-copy concat
+SPEC_FIELDS = ("codec", "width", "height", "pixFmt", "fps", "hasAudio", "audioCodec", "sampleRate", "channels")
+
+# One assembly per project at a time
+_project_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _project_lock(project_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _project_locks.setdefault(project_id, threading.Lock())
+
+
+def _video_meta(scene: Dict[str, Any]) -> Dict[str, Any]:
+    """Uses the metadata recorded at save time; only unindexed files hit ffprobe."""
+    meta = scene.get("videoMeta")
+    if meta and "codec" in meta:
+        return meta
+    return get_media_metadata(scene["videoUrl"]) or probe_video(resolve_media_path(scene["videoUrl"]))
+
+
+def _spec(meta: Dict[str, Any]) -> tuple:
+    return tuple(meta.get(field) for field in SPEC_FIELDS)
+
+
+def _spec_id(spec: tuple) -> str:
+    return hashlib.sha256(json.dumps(spec).encode("utf-8")).hexdigest()[:12]
+
+
+def _conform(src_path: str, digest: str, source: Dict[str, Any], target: Dict[str, Any]) -> str:
+    """Re-encodes one segment to the target stream parameters (cached)."""
+    os.makedirs(SEGMENT_CACHE_DIR, exist_ok=True)
+    out_path = os.path.join(SEGMENT_CACHE_DIR, f"{digest}_{_spec_id(_spec(target))}.mp4")
+    if os.path.exists(out_path):
+        return out_path
+
+    width, height = target["width"], target["height"]
+    video_filter = (
+        f"scale={width}:{height}:force_original_aspect_ratio=decrease,"
+        f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2,"
+        f"fps={target['fps']},format={target['pixFmt']}"
+    )
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-i", src_path]
+
+    if target["hasAudio"] and not source["hasAudio"]:
+        # Silent track so the audio stream layout matches the other segments
+        layout = "mono" if target.get("channels") == 1 else "stereo"
+        cmd += ["-f", "lavfi", "-i", f"anullsrc=r={target['sampleRate']}:cl={layout}",
+                "-map", "0:v:0", "-map", "1:a:0", "-shortest"]
+    elif target["hasAudio"]:
+        cmd += ["-map", "0:v:0", "-map", "0:a:0"]
+    else:
+        cmd += ["-an"]
+
+    cmd += ["-vf", video_filter, "-c:v", "libx264", "-preset", CONFORM_PRESET, "-crf", str(CONFORM_CRF)]
+    if target["hasAudio"]:
+        cmd += ["-c:a", "aac", "-ar", str(target["sampleRate"]), "-ac", str(target.get("channels") or 2)]
+
+    tmp_path = f"{out_path}.{os.getpid()}.tmp.mp4"
+    cmd += ["-movflags", "+faststart", tmp_path]
+    subprocess.run(cmd, check=True, timeout=FFMPEG_TIMEOUT)
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+def _target_meta(metas: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """The most common H.264 stream layout wins, so the fewest segments are re-encoded."""
+    candidates = [m for m in metas if m.get("codec") == "h264"] or metas
+    spec, _ = Counter(_spec(m) for m in candidates).most_common(1)[0]
+    target = dict(zip(SPEC_FIELDS, spec))
+    if target["codec"] != "h264":
+        target.update({"codec": "h264", "pixFmt": "yuv420p"})
+    if target["hasAudio"] and target.get("audioCodec") != "aac":
+        target["audioCodec"] = "aac"
+    return target
+
+
+def assemble_project(project_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Builds the project film from its completed scenes and stores it on the
+    project as `movie`. Returns the movie record, or None if no scene has a video.
+    """
+    with _project_lock(project_id):
+        segments = []
+        for scene in list_scenes(project_id):
+            path = resolve_media_path(scene.get("videoUrl"))
+            if scene.get("status") != "completed" or not path or not os.path.isfile(path):
+                continue
+            digest = media_digest(scene["videoUrl"])
+            segments.append({"scene_id": scene["id"], "path": path, "digest": digest, "meta": _video_meta(scene)})
+
+        if not segments:
+            return None
+
+        metas = [s["meta"] for s in segments]
+        target = _target_meta(metas)
+        key = hashlib.sha256(
+            ("|".join(s["digest"] for s in segments) + _spec_id(_spec(target))).encode("utf-8")
+        ).hexdigest()[:20]
+
+        previous = get_project(project_id).get("movie") or {}
+        if previous.get("key") == key and resolve_media_path(previous.get("url")) and \
+                os.path.exists(resolve_media_path(previous["url"])):
+            return previous
+
+        started = time.time()
+        reencoded = 0
+        concat_paths = []
+        for segment, meta in zip(segments, metas):
+            if _spec(meta) == _spec(target):
+                concat_paths.append(segment["path"])
+            else:
+                concat_paths.append(_conform(segment["path"], segment["digest"], meta, target))
+                reencoded += 1
+
+        with tempfile.TemporaryDirectory(prefix="assembly_") as work_dir:
+            list_path = os.path.join(work_dir, "segments.txt")
+            with open(list_path, "w") as f:
+                for path in concat_paths:
+                    escaped = os.path.abspath(path).replace("'", "'\\''")
+                    f.write(f"file '{escaped}'\n")
+
+            output_path = os.path.join(work_dir, "movie.mp4")
+            subprocess.run([
+                "ffmpeg", "-y", "-loglevel", "error",
+                "-f", "concat", "-safe", "0", "-i", list_path,
+                "-c", "copy", "-movflags", "+faststart",
+                output_path,
+            ], check=True, timeout=FFMPEG_TIMEOUT)
+
+            movie_url = save_blob(output_path, "mp4", move=True)
+
+        try:
+            hls_url = package_hls(movie_url)
+        except Exception as e:
+            print(f"⚠️ HLS packaging failed for {project_id} movie: {e}")
+            hls_url = None
+
+        movie = {
+            "url": movie_url,
+            "hlsUrl": hls_url,
+            "meta": get_media_metadata(movie_url),
+            "key": key,
+            "scenes": [s["scene_id"] for s in segments],
+            "duration": round(sum(m.get("duration") or 0 for m in metas), 3),
+            "reencodedSegments": reencoded,
+            "assembledAt": time.time(),
+            "elapsed": round(time.time() - started, 3),
+        }
+        update_project(project_id, {"movie": movie})
+        release_media(previous.get("url"))
+
+        print(f"🎞️ Assembled {len(segments)} scenes for {project_id} ({reencoded} re-encoded) -> {movie_url}")
+        return movie
@@ -0,0 +1,206 @@
+"""
+Persistent Session Store
+Per-project, per-agent conversation history in SQLite (data/sessions.db).
+Once the stored turns exceed a token budget, the oldest ones are folded into
+a running summary and deleted, so storage and prompt size stay flat no matter
+how long a project runs.
+"""
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "sessions.db")
+# Approximate tokens kept as raw turns before compaction kicks in
+TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "4000"))
+# Tokens of the newest turns kept verbatim after compaction
+KEEP_RECENT_TOKENS = int(os.getenv("SESSION_KEEP_RECENT_TOKENS", "1500"))
+SUMMARY_MAX_TOKENS = int(os.getenv("SESSION_SUMMARY_MAX_TOKENS", "800"))
+SUMMARY_MODEL = os.getenv("SESSION_SUMMARY_MODEL", "gemini-2.0-flash-exp")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS turns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    role TEXT NOT NULL,
+    text TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS turns_scope ON turns (project_id, agent, id);
+CREATE TABLE IF NOT EXISTS summaries (
+    project_id TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    tokens INTEGER NOT NULL,
+    turns_compacted INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (project_id, agent)
+);
+"""
+
+SUMMARY_INSTRUCTION = (
+    "You maintain the running memory of a film production assistant. Merge the previous summary "
+    "and the new conversation turns into one concise summary. Keep decisions, scene numbers and IDs, "
+    "character names, style choices and open requests; drop pleasantries and repetition."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting."""
+    return max(1, len(text) // 4)
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    limit = max_tokens * 4
+    return text if len(text) <= limit else "…" + text[-limit:]
+
+
+def llm_summarize(previous_summary: str, turns: List[Dict[str, str]]) -> str:
+    """Summarizes with a small Gemini model; falls back to keeping the tail of the text."""
+    transcript = "\n".join(f"{t['role']}: {t['text']}" for t in turns)
+    try:
+        from google import genai
+        from google.genai import types
+
+        client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
+        response = client.models.generate_content(
+            model=SUMMARY_MODEL,
+            contents=f"Previous summary:\n{previous_summary or '(none)'}\n\nNew turns:\n{transcript}",
+            config=types.GenerateContentConfig(
+                system_instruction=SUMMARY_INSTRUCTION,
+                temperature=0.2,
+                max_output_tokens=SUMMARY_MAX_TOKENS,
+            ),
+        )
+        if response.text:
+            return response.text.strip()
+    except Exception as e:
+        print(f"⚠️ Session summary failed, truncating instead: {e}")
+    return _truncate(f"{previous_summary}\n{transcript}".strip(), SUMMARY_MAX_TOKENS)
+
+
+class SessionStore:
+    """SQLite-backed turn log + rolling summary per (project, agent)."""
+
+    def __init__(self, db_path: str = DB_PATH, summarize: Callable[[str, List[Dict[str, str]]], str] = llm_summarize):
+        self.db_path = db_path
+        self.summarize = summarize
+        self._local = threading.local()
+        self._scope_locks: Dict[tuple, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers proceed during compaction
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def _scope_lock(self, project_id: str, agent: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._scope_locks.setdefault((project_id, agent), threading.Lock())
+
+    def append_turn(self, project_id: str, agent: str, role: str, text: str):
+        if not text:
+            return
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO turns (project_id, agent, role, text, tokens, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (project_id, agent, role, text, estimate_tokens(text), time.time()),
+            )
+
+    def get_summary(self, project_id: str, agent: str) -> Optional[str]:
+        row = self._connect().execute(
+            "SELECT summary FROM summaries WHERE project_id = ? AND agent = ?", (project_id, agent)
+        ).fetchone()
+        return row["summary"] if row else None
+
+    def get_turns(self, project_id: str, agent: str) -> List[Dict[str, str]]:
+        rows = self._connect().execute(
+            "SELECT id, role, text, tokens FROM turns WHERE project_id = ? AND agent = ? ORDER BY id",
+            (project_id, agent),
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def get_context(self, project_id: str, agent: str) -> str:
+        """Summary plus the retained recent turns, formatted for a prompt prefix ("" when empty)."""
+        summary = self.get_summary(project_id, agent)
+        turns = self.get_turns(project_id, agent)
+        if not summary and not turns:
+            return ""
+        parts = []
+        if summary:
+            parts.append(f"Summary of earlier work:\n{summary}")
+        if turns:
+            parts.append("Recent turns:\n" + "\n".join(f"{t['role']}: {t['text']}" for t in turns))
+        return "\n\n".join(parts)
+
+    def compact(self, project_id: str, agent: str, force: bool = False) -> bool:
+        """
+        Folds the oldest turns into the summary once the turn log exceeds TOKEN_BUDGET,
+        keeping roughly KEEP_RECENT_TOKENS of the newest turns verbatim.
+        Returns True when anything was compacted.
+        """
+        with self._scope_lock(project_id, agent):
+            turns = self.get_turns(project_id, agent)
+            total = sum(t["tokens"] for t in turns)
+            if not turns or (total <= TOKEN_BUDGET and not force):
+                return False
+
+            # Walk back from the newest turn until the keep budget is used up
+            kept_tokens = 0
+            split = len(turns)
+            while split > 0 and kept_tokens + turns[split - 1]["tokens"] <= KEEP_RECENT_TOKENS:
+                split -= 1
+                kept_tokens += turns[split]["tokens"]
+            old_turns = turns[:split] if split else turns[:-1]
+            if not old_turns:
+                return False
+
+            summary = self.summarize(self.get_summary(project_id, agent) or "", old_turns)
+            last_id = old_turns[-1]["id"]
+            with self._connect() as conn:
+                conn.execute(
+                    "DELETE FROM turns WHERE project_id = ? AND agent = ? AND id <= ?",
+                    (project_id, agent, last_id),
+                )
+                conn.execute(
+                    """
+                    INSERT INTO summaries (project_id, agent, summary, tokens, turns_compacted, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (project_id, agent) DO UPDATE SET
+                        summary = excluded.summary,
+                        tokens = excluded.tokens,
+                        turns_compacted = summaries.turns_compacted + excluded.turns_compacted,
+                        updated_at = excluded.updated_at
+                    """,
+                    (project_id, agent, summary, estimate_tokens(summary), len(old_turns), time.time()),
+                )
+            return True
+
+    def record_exchange(self, project_id: str, agent: str, prompt: str, response: str):
+        """Appends a prompt/response pair and compacts if the budget is exceeded."""
+        self.append_turn(project_id, agent, "user", prompt)
+        self.append_turn(project_id, agent, "agent", response)
+        self.compact(project_id, agent)
+
+    def clear(self, project_id: str, agent: Optional[str] = None):
+        with self._connect() as conn:
+            if agent:
+                conn.execute("DELETE FROM turns WHERE project_id = ? AND agent = ?", (project_id, agent))
+                conn.execute("DELETE FROM summaries WHERE project_id = ? AND agent = ?", (project_id, agent))
+            else:
+                conn.execute("DELETE FROM turns WHERE project_id = ?", (project_id,))
+                conn.execute("DELETE FROM summaries WHERE project_id = ?", (project_id,))
+
+
+session_store = SessionStore()
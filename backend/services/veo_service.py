@@ -11,10 +11,28 @@ import requests
 from typing import Optional, Dict, Any, List
 from enum import Enum
 from dotenv import load_dotenv
+from services.image_normalizer import normalize_image_source
+from services.fair_scheduler import generation_scheduler
+from services.cancellation import JobCancelled, check_cancelled, cancellable_sleep
 
 load_dotenv()
 
 
+def cancel_remote_operation(client: genai.Client, operation):
+    """
+    Asks the API to stop a running operation. Best effort: SDK versions without
+    operations.cancel only stop polling (the caller still frees its slot).
+    """
+    cancel = getattr(client.operations, "cancel", None)
+    if cancel is None or getattr(operation, "done", False):
+        return
+    try:
+        cancel(operation)
+        print(f"Video generation operation cancelled: {operation.name}")
+    except Exception as e:
+        print(f"⚠️ Could not cancel operation {getattr(operation, 'name', '?')}: {e}")
+
+
 class GenerationMode(Enum):
     TEXT_TO_VIDEO = "text_to_video"
     FRAMES_TO_VIDEO = "frames_to_video"
@@ -52,9 +70,10 @@ class VeoService:
         style_image_path: Optional[str] = None,
         input_video_uri: Optional[str] = None,
         is_looping: bool = False,
+        number_of_videos: int = 1,
     ) -> Dict[str, Any]:
         """
-        Generate a video using Veo API.
+        Generate a video using Veo API (submit, wait for completion, download).
         
         Args:
             prompt: Text prompt for video generation
@@ -70,15 +89,82 @@ class VeoService:
             style_image_path: Path to style reference image
             input_video_uri: URI of input video for extend mode
             is_looping: Whether to create a looping video
+            number_of_videos: Number of takes to generate in one operation
             
         Returns:
             Dict containing video_bytes, uri, and metadata
         """
+        with generation_scheduler.slot():
+            operation = self.submit_video(
+                prompt=prompt,
+                model=model,
+                resolution=resolution,
+                aspect_ratio=aspect_ratio,
+                mode=mode,
+                image_path=image_path,
+                image_url=image_url,
+                start_frame_path=start_frame_path,
+                end_frame_path=end_frame_path,
+                reference_images=reference_images,
+                style_image_path=style_image_path,
+                input_video_uri=input_video_uri,
+                is_looping=is_looping,
+                number_of_videos=number_of_videos,
+            )
+            video = self.wait_for_video(operation)
+        video_bytes = self.download_video(video)
+        
+        return {
+            "video_bytes": video_bytes,
+            "uri": video.uri,
+            "video_object": video,
+            "size_bytes": len(video_bytes),
+        }
+    
+    def submit_video(
+        self,
+        prompt: str,
+        model: str = "veo-3.1-generate-preview",
+        resolution: str = "720p",
+        aspect_ratio: str = "16:9",
+        mode: GenerationMode = GenerationMode.TEXT_TO_VIDEO,
+        image_path: Optional[str] = None,
+        image_url: Optional[str] = None,
+        start_frame_path: Optional[str] = None,
+        end_frame_path: Optional[str] = None,
+        reference_images: Optional[List[str]] = None,
+        style_image_path: Optional[str] = None,
+        input_video_uri: Optional[str] = None,
+        is_looping: bool = False,
+        number_of_videos: int = 1,
+    ):
+        """
+        Build the request and start a Veo generation operation (without waiting).
+        
+        Args:
+            prompt: Text prompt for video generation
+            model: Veo model to use
+            resolution: Video resolution (720p or 1080p)
+            aspect_ratio: Video aspect ratio (16:9 or 9:16)
+            mode: Generation mode
+            image_path: Path to image file for frames-to-video mode
+            image_url: URL to image for frames-to-video mode
+            start_frame_path: Path to start frame image
+            end_frame_path: Path to end frame image
+            reference_images: List of reference image paths
+            style_image_path: Path to style reference image
+            input_video_uri: URI of input video for extend mode
+            is_looping: Whether to create a looping video
+            number_of_videos: Number of takes to generate in one operation
+            
+        Returns:
+            The long-running operation
+        """
         print(f"Starting video generation with mode: {mode.value}")
         
         # Build config
         config_dict = {
-            "number_of_videos": 1,
+            "number_of_videos": number_of_videos,
             "resolution": resolution,
         }
         
@@ -99,29 +185,14 @@ class VeoService:
         # Handle different generation modes
         if mode == GenerationMode.FRAMES_TO_VIDEO:
             # Add start frame
-            if image_path:
-                with open(image_path, "rb") as f:
-                    image_bytes = f.read()
-                payload["image"] = types.Image(
-                    image_bytes=image_bytes,
-                    mime_type=self._get_mime_type(image_path)
-                )
-            elif image_url:
-                image_bytes = requests.get(image_url).content
-                payload["image"] = types.Image(
-                    image_bytes=image_bytes,
-                    mime_type="image/jpeg"  # Assume JPEG for URLs
-                )
+            start_source = image_path or image_url
+            if start_source:
+                payload["image"] = self._load_image(start_source, resolution, aspect_ratio)
             
             # Add end frame
             final_end_frame_path = start_frame_path if is_looping else end_frame_path
             if final_end_frame_path:
-                with open(final_end_frame_path, "rb") as f:
-                    end_frame_bytes = f.read()
-                payload["config"].last_frame = types.Image(
-                    image_bytes=end_frame_bytes,
-                    mime_type=self._get_mime_type(final_end_frame_path)
-                )
+                payload["config"].last_frame = self._load_image(final_end_frame_path, resolution, aspect_ratio)
                 if is_looping:
                     print(f"Creating looping video using start frame as end frame")
         
@@ -131,28 +202,18 @@ class VeoService:
             # Add reference images
             if reference_images:
                 for img_path in reference_images:
-                    with open(img_path, "rb") as f:
-                        img_bytes = f.read()
                     reference_images_payload.append(
                         types.VideoGenerationReferenceImage(
-                            image=types.Image(
-                                image_bytes=img_bytes,
-                                mime_type=self._get_mime_type(img_path)
-                            ),
+                            image=self._load_image(img_path, resolution, aspect_ratio, crop=False),
                             reference_type=types.VideoGenerationReferenceType.ASSET
                         )
                     )
             
             # Add style image
             if style_image_path:
-                with open(style_image_path, "rb") as f:
-                    style_bytes = f.read()
                 reference_images_payload.append(
                     types.VideoGenerationReferenceImage(
-                        image=types.Image(
-                            image_bytes=style_bytes,
-                            mime_type=self._get_mime_type(style_image_path)
-                        ),
+                        image=self._load_image(style_image_path, resolution, aspect_ratio, crop=False),
                         reference_type=types.VideoGenerationReferenceType.STYLE
                     )
                 )
@@ -166,15 +227,35 @@ class VeoService:
             payload["video"] = types.Video(uri=input_video_uri)
         
         # Submit video generation request
+        check_cancelled()
         print("Submitting video generation request...")
         operation = self.client.models.generate_videos(**payload)
         print(f"Video generation operation started: {operation.name}")
+        return operation
+    
+    def wait_for_videos(self, operation, poll_interval: float = 10) -> List[types.Video]:
+        """
+        Poll an operation until it completes and return every generated video.
         
+        Args:
+            operation: Operation returned by submit_video
+            poll_interval: Seconds between status checks
+            
+        Returns:
+            The generated types.Video objects (each with its URI)
+            
+        Raises:
+            JobCancelled: The current work was cancelled; polling stops at once
+        """
         # Poll for completion
-        while not operation.done:
-            time.sleep(10)
-            print("...Generating...")
-            operation = self.client.operations.get(operation.name)
+        try:
+            while not operation.done:
+                cancellable_sleep(poll_interval)
+                print("...Generating...")
+                operation = self.client.operations.get(operation.name)
+        except JobCancelled:
+            cancel_remote_operation(self.client, operation)
+            raise
         
         # Check for errors
         if operation.error:
@@ -184,11 +265,19 @@ class VeoService:
         if not operation.result or not operation.result.generated_videos:
             raise RuntimeError("No videos were generated")
         
-        first_video = operation.result.generated_videos[0]
-        if not first_video.video or not first_video.video.uri:
+        videos = [g.video for g in operation.result.generated_videos if g.video and g.video.uri]
+        if not videos:
             raise RuntimeError("Generated video is missing a URI")
         
-        video_uri = first_video.video.uri
+        return videos
+    
+    def wait_for_video(self, operation, poll_interval: float = 10) -> types.Video:
+        """Poll an operation until it completes and return the first generated video."""
+        return self.wait_for_videos(operation, poll_interval)[0]
+    
+    def download_video(self, video: types.Video) -> bytes:
+        """Download the bytes of a generated video."""
+        video_uri = video.uri
         print(f"Fetching video from: {video_uri}")
         
         # Download video
@@ -196,27 +285,22 @@ class VeoService:
         response = requests.get(video_url)
         response.raise_for_status()
         
-        video_bytes = response.content
-        
-        return {
-            "video_bytes": video_bytes,
-            "uri": video_uri,
-            "video_object": first_video.video,
-            "size_bytes": len(video_bytes),
-        }
+        return response.content
     
-    def _get_mime_type(self, file_path: str) -> str:
-        """Get MIME type from file extension."""
-        ext = file_path.lower().split('.')[-1]
-        mime_types = {
-            'jpg': 'image/jpeg',
-            'jpeg': 'image/jpeg',
-            'png': 'image/png',
-            'gif': 'image/gif',
-            'webp': 'image/webp',
-            'mp4': 'video/mp4',
-        }
-        return mime_types.get(ext, 'application/octet-stream')
+    def _load_image(
+        self,
+        source: str,
+        resolution: str,
+        aspect_ratio: str,
+        crop: bool = True,
+    ) -> types.Image:
+        """
+        Load a frame or reference image as a normalized, cached payload.
+        Frames (crop=True) are fitted exactly to the output size; reference
+        images are only downscaled. The mime type comes from the magic bytes.
+        """
+        image_bytes, mime_type = normalize_image_source(source, resolution, aspect_ratio, crop=crop)
+        return types.Image(image_bytes=image_bytes, mime_type=mime_type)
 
 
 # Convenience function for simple text-to-video generation
@@ -0,0 +1,120 @@
+"""
+Video Packaging for Streaming Playback
+Makes stored MP4s start playing before they are fully downloaded:
+moves the moov atom to the front (faststart) and cuts HLS playlists/segments
+next to the blob ({sha}.hls/index.m3u8) with stream copy.
+"""
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from utils.local_file_store import blob_digest, blob_path, blob_url, resolve_media_path
+
+HLS_SEGMENT_SECONDS = 4
+PACKAGING_WORKERS = int(os.getenv("PACKAGING_WORKERS", "2"))
+FFMPEG_TIMEOUT = 600
+
+# ffmpeg does the work in subprocesses, so threads are enough here
+_executor = ThreadPoolExecutor(max_workers=PACKAGING_WORKERS, thread_name_prefix="packaging")
+
+
+def is_faststart(data: bytes) -> bool:
+    """True when the top-level 'moov' box comes before 'mdat'."""
+    offset = 0
+    while offset + 8 <= len(data):
+        size, box_type = struct.unpack(">I4s", data[offset:offset + 8])
+        if box_type == b"moov":
+            return True
+        if box_type == b"mdat":
+            return False
+        if size == 1:
+            if offset + 16 > len(data):
+                return False
+            size = struct.unpack(">Q", data[offset + 8:offset + 16])[0]
+        elif size == 0:
+            return False
+        offset += size
+    return False
+
+
+def faststart(video_bytes: bytes) -> bytes:
+    """Returns the MP4 with its index at the front (remuxed with -c copy when needed)."""
+    if is_faststart(video_bytes):
+        return video_bytes
+
+    with tempfile.TemporaryDirectory(prefix="faststart_") as work_dir:
+        src_path = os.path.join(work_dir, "in.mp4")
+        out_path = os.path.join(work_dir, "out.mp4")
+        with open(src_path, "wb") as f:
+            f.write(video_bytes)
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error", "-i", src_path,
+            "-map", "0", "-c", "copy", "-movflags", "+faststart", out_path,
+        ], check=True, timeout=FFMPEG_TIMEOUT)
+        with open(out_path, "rb") as f:
+            return f.read()
+
+
+def package_hls(video_url: str) -> Optional[str]:
+    """
+    Cuts an HLS VOD playlist for a blob video and returns its URL.
+    The output lives in {sha}.hls/ beside the blob, so it is immutable,
+    shared by every record pointing at the same bytes and released with it.
+    """
+    digest = blob_digest(video_url)
+    src_path = resolve_media_path(video_url)
+    if not digest or not src_path or not os.path.exists(src_path):
+        return None
+
+    out_dir = blob_path(digest, "hls")
+    playlist_url = f"{blob_url(digest, 'hls')}/index.m3u8"
+    if os.path.exists(os.path.join(out_dir, "index.m3u8")):
+        return playlist_url
+
+    work_dir = tempfile.mkdtemp(prefix=f".{digest}.hls.", dir=os.path.dirname(out_dir))
+    try:
+        subprocess.run([
+            "ffmpeg", "-y", "-loglevel", "error", "-i", src_path,
+            "-map", "0", "-c", "copy",
+            "-f", "hls",
+            "-hls_time", str(HLS_SEGMENT_SECONDS),
+            "-hls_playlist_type", "vod",
+            "-hls_flags", "independent_segments",
+            "-hls_segment_filename", os.path.join(work_dir, "seg_%03d.ts"),
+            os.path.join(work_dir, "index.m3u8"),
+        ], check=True, timeout=FFMPEG_TIMEOUT)
+        os.chmod(work_dir, 0o755)
+        try:
+            os.rename(work_dir, out_dir)
+        except OSError:
+            # Another job published the same playlist first
+            shutil.rmtree(work_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(work_dir, ignore_errors=True)
+        raise
+
+    return playlist_url
+
+
+def schedule_hls(video_url: str, on_done: Callable[[str], None]) -> Optional[Future]:
+    """Packages HLS in the background and hands the playlist URL to on_done."""
+    if not blob_digest(video_url):
+        return None
+
+    future = _executor.submit(package_hls, video_url)
+
+    def _notify(done: Future):
+        try:
+            playlist_url = done.result()
+        except Exception as e:
+            print(f"⚠️ HLS packaging failed for {video_url}: {e}")
+            return
+        if playlist_url:
+            on_done(playlist_url)
+
+    future.add_done_callback(_notify)
+    return future
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+# The app imports its modules relative to backend/ (see main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def local_store(tmp_path, monkeypatch):
+    """Points the local DB, blob store and metadata index at a temp directory."""
+    from utils import local_db, local_file_store
+    from utils.bible_cache import bible_cache, firestore_bible_cache
+
+    media_dir = tmp_path / "static" / "media"
+    media_dir.mkdir(parents=True)
+    monkeypatch.setattr(local_db, "DB_FILE", str(tmp_path / "db.json"))
+    monkeypatch.setattr(local_file_store, "STATIC_MEDIA_DIR", str(media_dir))
+    monkeypatch.setattr(local_file_store, "BLOB_DIR", str(media_dir / "blobs"))
+    monkeypatch.setattr(local_file_store, "BLOB_REFS_FILE", str(tmp_path / "blob_refs.json"))
+    monkeypatch.setattr(local_file_store, "MEDIA_META_FILE", str(tmp_path / "media_meta.json"))
+    bible_cache.invalidate()
+    firestore_bible_cache.invalidate()
+    yield tmp_path
+    bible_cache.invalidate()
+    firestore_bible_cache.invalidate()
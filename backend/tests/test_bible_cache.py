@@ -0,0 +1,22 @@
+from utils import local_db
+from utils.bible_cache import firestore_bible_cache
+
+
+def test_backends_do_not_share_bibles(local_store):
+    # Firestore keeps its own, higher version counter for the same project ID
+    firestore_bible_cache.put("proj_1", 7, {"genre": "noir"})
+
+    bible = local_db.update_project_bible("proj_1", {"genre": "comedy"})
+
+    assert bible["version"] == 1
+    assert local_db.get_project_bible("proj_1") == {"genre": "comedy"}
+    assert local_db.get_project_bible_version("proj_1") == 1
+    assert firestore_bible_cache.get("proj_1", lambda: (0, {})) == {"genre": "noir"}
+
+
+def test_local_reads_do_not_load_firestore_bible(local_store):
+    local_db.update_project_bible("proj_1", {"tone": "warm"})
+    firestore_bible_cache.invalidate()
+
+    assert firestore_bible_cache.get("proj_1", lambda: (3, {"tone": "cold"})) == {"tone": "cold"}
+    assert local_db.get_project_bible("proj_1") == {"tone": "warm"}
@@ -0,0 +1,38 @@
+import subprocess
+
+import pytest
+
+pytest.importorskip("google.genai")
+
+from tools import continuity_tools
+from utils import local_db
+
+
+class FakeVeo:
+    def __init__(self, api_key=None):
+        self.calls = 0
+
+    def generate_video(self, **kwargs):
+        self.calls += 1
+        return {"video_bytes": b"not really an mp4", "uri": f"veo://video/{self.calls}"}
+
+
+def test_ffmpeg_failure_marks_scene_and_stops_chain(local_store, monkeypatch):
+    first, second = local_db.save_scenes("proj_1", [
+        {"imageUrl": "/static/media/proj_1/a.png", "sequence_number": 1, "status": "image_selected"},
+        {"imageUrl": "/static/media/proj_1/b.png", "sequence_number": 2, "status": "image_selected"},
+    ])
+
+    def failing_ffmpeg(cmd, **kwargs):
+        raise subprocess.CalledProcessError(1, cmd)
+
+    monkeypatch.setattr(continuity_tools, "VeoService", FakeVeo)
+    monkeypatch.setattr(continuity_tools.subprocess, "run", failing_ffmpeg)
+
+    generated = continuity_tools.run_continuity_chain("proj_1", regenerate_first=True)
+
+    assert generated == []
+    failed = local_db.get_scene("proj_1", first)
+    assert failed["status"] == "error"
+    assert "ffmpeg" in failed["error"]
+    assert local_db.get_scene("proj_1", second)["status"] == "image_selected"
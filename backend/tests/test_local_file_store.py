@@ -0,0 +1,53 @@
+import errno
+import os
+import stat
+import tempfile
+
+import pytest
+
+from utils import local_file_store
+from utils.local_file_store import PUBLISHED_FILE_MODE, promote_file, save_blob
+
+
+def _private_source(directory, data=b"frame bytes"):
+    # Same as a draft written through mkstemp: 0600
+    fd, path = tempfile.mkstemp(dir=directory, suffix=".png")
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    return path
+
+
+def _mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@pytest.mark.parametrize("move", [True, False])
+def test_promoted_file_gets_published_mode(tmp_path, move):
+    src = _private_source(tmp_path)
+    target = str(tmp_path / "published.png")
+
+    promote_file(src, target, move=move)
+
+    assert _mode(target) == PUBLISHED_FILE_MODE
+
+
+def test_copied_file_gets_published_mode(tmp_path, monkeypatch):
+    def no_hardlinks(src, dst):
+        raise OSError(errno.EPERM, "hardlinks not allowed")
+
+    monkeypatch.setattr(local_file_store.os, "link", no_hardlinks)
+    src = _private_source(tmp_path)
+    target = str(tmp_path / "published.png")
+
+    assert promote_file(src, target) in ("reflink", "copy")
+    assert _mode(target) == PUBLISHED_FILE_MODE
+    assert os.stat(target).st_mtime_ns == os.stat(src).st_mtime_ns
+
+
+def test_blob_gets_published_mode(local_store):
+    src = _private_source(local_store)
+
+    url = save_blob(src, "png", move=True)
+
+    assert _mode(local_file_store.resolve_media_path(url)) == PUBLISHED_FILE_MODE
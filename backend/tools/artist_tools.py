@@ -3,8 +3,10 @@ from google.genai import types
 import os
 import uuid
 from dotenv import load_dotenv
-from utils.local_db import update_scene
-from utils.local_file_store import save_media
+from utils.local_db import get_scene, update_scene
+from utils.local_file_store import save_blob, release_media, get_media_metadata
+from utils.image_derivatives import schedule_image_derivatives
+from services.cancellation import JobCancelled, check_cancelled
 from PIL import Image
 from io import BytesIO
 import json
@@ -31,6 +33,8 @@ def generate_image(prompt: str, count: int = 2) -> list[str]:
     try:
         # Loop to generate 'count' images
         for i in range(count):
+            # Stop between drafts once the work is cancelled (drafts already saved are kept)
+            check_cancelled()
             print(f"   Generating image {i+1}/{count}...")
             response = client.models.generate_content(
                 model=image_model,
@@ -59,6 +63,8 @@ def generate_image(prompt: str, count: int = 2) -> list[str]:
             
         return generated_files
         
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"❌ Image generation failed: {e}")
         return [f"Error: {str(e)}"]
@@ -103,16 +109,20 @@ def submit_final_scene(project_id: str, scene_id: str, image_path: str, final_pr
     print(f"✅ Submitting scene {scene_id}...")
     
     try:
-        # Save to Local Storage
-        filename = f"{scene_id}.png"
-        public_url = save_media(image_path, filename, project_id)
+        # Save to the content-addressed store (moves the draft when it is on the same filesystem)
+        previous = get_scene(project_id, scene_id) or {}
+        public_url = save_blob(image_path, "png", move=True)
         
         # Update DB
         update_scene(project_id, scene_id, {
             "imageUrl": public_url,
             "imagePromptRevison": final_prompt,
-            "status": "image_completed"
+            "imageMeta": get_media_metadata(public_url),
+            "status": "image_completed",
+            "imageVariants": None
         })
+        release_media(previous.get("imageUrl"))
+        schedule_image_derivatives(project_id, scene_id, public_url)
         
         # Cleanup temp
         if os.path.exists(image_path):
@@ -0,0 +1,193 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, List
+
+from utils.local_db import list_scenes, update_scene
+from utils.local_file_store import blob_digest, blob_path, media_digest, promote_file, resolve_media_path
+from utils.media_probe import probe_video
+from services.veo_service import VeoService, GenerationMode
+from services.cancellation import JobCancelled
+from tools.director_tools import store_scene_video
+
+# Only the tail of the clip is decoded: seek this far before the end
+LAST_FRAME_SEEK = 0.5
+FRAME_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "cache", "frames")
+FFMPEG_TIMEOUT = 120
+
+def _extract_last_frame_file(src_path: str, out_path: str):
+    """Decodes the last LAST_FRAME_SEEK seconds and keeps only the final frame."""
+    tmp_path = f"{out_path}.{os.getpid()}.tmp.png"
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-sseof", f"-{LAST_FRAME_SEEK}",
+        "-i", src_path,
+        "-vsync", "0", "-update", "1",
+        tmp_path,
+    ], check=True, timeout=FFMPEG_TIMEOUT)
+    os.replace(tmp_path, out_path)
+
+def _frame_cache_path(video_url: str) -> Optional[str]:
+    digest = blob_digest(video_url)
+    if digest:
+        # Lives beside the blob, so it is released together with the video
+        return blob_path(digest, "last.png")
+    digest = media_digest(video_url)
+    if digest:
+        os.makedirs(FRAME_CACHE_DIR, exist_ok=True)
+        return os.path.join(FRAME_CACHE_DIR, f"{digest}.png")
+    return None
+
+def extract_last_frame(video_url: str) -> str:
+    """
+    Returns the path of the last frame of a stored video, extracting it
+    once with a fast seek from the end and caching it by content hash.
+    """
+    out_path = _frame_cache_path(video_url)
+    if not out_path:
+        raise FileNotFoundError(f"Video not found: {video_url}")
+    if not os.path.exists(out_path):
+        _extract_last_frame_file(resolve_media_path(video_url), out_path)
+    return out_path
+
+def trim_head(video_path: str, seconds: float, out_path: str):
+    """Drops the first `seconds` (an extension result repeats the clip it extends)."""
+    subprocess.run([
+        "ffmpeg", "-y", "-loglevel", "error",
+        "-ss", f"{seconds:.3f}", "-i", video_path,
+        "-c:v", "libx264", "-preset", "veryfast", "-crf", "18",
+        "-c:a", "aac", "-movflags", "+faststart",
+        out_path,
+    ], check=True, timeout=FFMPEG_TIMEOUT)
+
+def _persist(project_id: str, scene_id: str, video_path: str, frame_path: str, updates: dict):
+    """Stores scene N while scene N+1 is already generating."""
+    with open(video_path, "rb") as f:
+        video_bytes = f.read()
+    public_url = store_scene_video(project_id, scene_id, video_bytes, updates)
+    cached_frame = _frame_cache_path(public_url)
+    if cached_frame and not os.path.exists(cached_frame):
+        promote_file(frame_path, cached_frame)
+    return public_url
+
+def run_continuity_chain(
+    project_id: str,
+    scene_ids: Optional[List[str]] = None,
+    link: str = "frame",
+    api_key: str = None,
+    regenerate_first: bool = False,
+) -> List[str]:
+    """
+    Generates a project's scenes in sequence order so each one continues the
+    previous one.
+
+    link="frame": the last frame of scene N is the start frame of scene N+1
+        (its own storyboard image becomes the end frame).
+    link="extend": scene N+1 extends scene N's Veo video; the repeated head
+        is trimmed off so each scene keeps only its own footage.
+
+    Scene N is stored (faststart, blob store, HLS) on a background thread while
+    scene N+1 is submitted, so persistence never delays the next generation.
+    Returns the scene IDs that were generated.
+    """
+    scenes = [
+        s for s in list_scenes(project_id)
+        if s.get("imageUrl") and (not scene_ids or s["id"] in scene_ids)
+    ]
+    veo = VeoService(api_key=api_key)
+    persist_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chain-persist")
+    pending = []
+    generated = []
+    previous = None
+
+    work_dir = tempfile.mkdtemp(prefix="chain_")
+    try:
+        for index, scene in enumerate(scenes):
+            scene_id = scene["id"]
+
+            if index == 0 and not regenerate_first and scene.get("status") == "completed" and scene.get("videoUrl"):
+                # Anchor the chain on the existing first video
+                previous = {
+                    "scene_id": scene_id,
+                    "frame": extract_last_frame(scene["videoUrl"]),
+                    "uri": scene.get("videoUri"),
+                    # videoUri may be a whole extended chain; its length is kept separately
+                    "duration": (scene.get("continuity") or {}).get("sourceDuration")
+                                or (scene.get("videoMeta") or {}).get("duration"),
+                }
+                continue
+
+            print(f"🔗 Continuity: generating {scene_id} ({index + 1}/{len(scenes)})...")
+            update_scene(project_id, scene_id, {"status": "generating_video"})
+            prompt = scene.get("motion_prompt") or scene.get("visual_prompt") or ""
+            image_path = resolve_media_path(scene["imageUrl"])
+            use_extend = link == "extend" and previous and previous.get("uri") and previous.get("duration")
+
+            try:
+                if previous is None:
+                    result = veo.generate_video(prompt=prompt, mode=GenerationMode.FRAMES_TO_VIDEO, image_path=image_path)
+                elif use_extend:
+                    result = veo.generate_video(
+                        prompt=prompt,
+                        mode=GenerationMode.EXTEND_VIDEO,
+                        input_video_uri=previous["uri"],
+                    )
+                else:
+                    result = veo.generate_video(
+                        prompt=prompt,
+                        mode=GenerationMode.FRAMES_TO_VIDEO,
+                        image_path=previous["frame"],
+                        end_frame_path=image_path,
+                    )
+
+                video_path = os.path.join(work_dir, f"{scene_id}.mp4")
+                with open(video_path, "wb") as f:
+                    f.write(result["video_bytes"])
+                # Length of the video behind result["uri"]: for an extension that is the
+                # whole chain so far, which the next extension repeats before its own footage
+                source_duration = probe_video(video_path)["duration"] if link == "extend" else None
+                if use_extend:
+                    trimmed_path = os.path.join(work_dir, f"{scene_id}.trimmed.mp4")
+                    trim_head(video_path, previous["duration"], trimmed_path)
+                    video_path = trimmed_path
+
+                frame_path = os.path.join(work_dir, f"{scene_id}.last.png")
+                _extract_last_frame_file(video_path, frame_path)
+            except JobCancelled as e:
+                print(f"🛑 Continuity chain cancelled at {scene_id}: {e}")
+                update_scene(project_id, scene_id, {"status": "cancelled", "error": str(e)})
+                raise
+            except Exception as e:
+                # Generation or post-processing (ffmpeg/ffprobe) failed. Every later
+                # scene depends on this one, so the chain stops here
+                print(f"❌ Continuity chain stopped at {scene_id}: {e}")
+                update_scene(project_id, scene_id, {"status": "error", "error": str(e)})
+                break
+
+            updates = {
+                "videoUri": result["uri"],
+                "continuity": {
+                    "previousSceneId": previous["scene_id"] if previous else None,
+                    "link": ("extend" if use_extend else "frame") if previous else None,
+                    "sourceDuration": source_duration,
+                },
+            }
+            pending.append(persist_pool.submit(_persist, project_id, scene_id, video_path, frame_path, updates))
+            generated.append(scene_id)
+
+            previous = {
+                "scene_id": scene_id,
+                "frame": frame_path,
+                "uri": result["uri"],
+                "duration": source_duration,
+            }
+
+        for future in pending:
+            future.result()
+    finally:
+        persist_pool.shutdown(wait=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return generated
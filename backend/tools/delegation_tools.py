@@ -1,84 +1,114 @@
 import asyncio
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.genai import types
+import hashlib
+import json
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
 from agents.writer_agent import writer_agent
 from agents.artist_agent import artist_agent
 from agents.director_agent import director_agent
 from utils.local_db import get_latest_scene
+from utils import workflow_store
+from services.adk_runtime import session_manager, run_agent
+from services.cancellation import JobCancelled
 
-APP_NAME = "agents"
+# The workflow the supervisor is running for. Its delegations are checkpointed
+# there, so a resumed run gets finished ones back instead of paying for them again.
+_workflow: ContextVar[Optional[Dict[str, Any]]] = ContextVar("delegation_workflow", default=None)
 
-async def delegate_to_writer(topic: str, project_id: str) -> str:
-    print(f"👨‍💼 Supervisor: Delegating to Writer for '{topic}'...")
-    session_service = InMemorySessionService()
-    runner = Runner(agent=writer_agent, app_name=APP_NAME, session_service=session_service)
+@contextmanager
+def checkpointing(workflow_id: Optional[str]):
+    """Checkpoints the delegations made inside the block into workflow_id (no-op without one)."""
+    reset = _workflow.set({"id": workflow_id, "calls": Counter()} if workflow_id else None)
+    try:
+        yield
+    finally:
+        _workflow.reset(reset)
+
+async def _checkpointed(name: str, args: Dict[str, Any], fn: Callable[[], Awaitable[str]]) -> str:
+    workflow = _workflow.get()
+    if not workflow:
+        return await fn()
     
-    # Create session first
-    session = await session_service.create_session(
-        app_name=APP_NAME,
-        user_id="system",
-        session_id=project_id
-    )
+    # The supervisor may repeat a call with the same arguments (e.g. "write the next
+    # scene"), so the nth such call in a run maps to the nth checkpoint
+    digest = hashlib.sha256(json.dumps(args, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+    workflow["calls"][digest] += 1
+    step_id = f"delegate:{name}:{digest}:{workflow['calls'][digest]}"
     
+    done = workflow_store.get_checkpoint(workflow["id"], step_id)
+    if done:
+        print(f"⏭️ Supervisor: {name} restored from checkpoint")
+        return done["output"]
+    output = await fn()
+    workflow_store.checkpoint(workflow["id"], step_id, output)
+    return output
+
+async def delegate_to_writer(topic: str, project_id: str) -> str:
+    print(f"👨‍💼 Supervisor: Delegating to Writer for '{topic}'...")
     prompt = f"Topic: {topic}. Project ID: {project_id}. Write the next scene."
-    content = types.Content(role='user', parts=[types.Part(text=prompt)])
-    
-    final_response = ""
-    async for event in runner.run_async(user_id="system", session_id=project_id, new_message=content):
-        if event.is_final_response():
-            final_response = event.content.parts[0].text
     
-    # Get the latest scene to extract scene_id
-    latest_scene = get_latest_scene(project_id)
-    if latest_scene:
-        scene_id = latest_scene.get('id', 'unknown')
-        return f"{final_response}\nScene saved with ID {scene_id}."
+    async def write() -> str:
+        # Each delegation gets its own session, so parallel calls for a project don't collide
+        async with session_manager.session(project_id) as session_id:
+            final_response = await run_agent(writer_agent, prompt, session_id, project_id=project_id)
+        
+        # Get the latest scene to extract scene_id
+        latest_scene = get_latest_scene(project_id)
+        if latest_scene:
+            scene_id = latest_scene.get('id', 'unknown')
+            return f"{final_response}\nScene saved with ID {scene_id}."
+        
+        return final_response
     
-    return final_response
+    return await _checkpointed("writer", {"topic": topic, "project_id": project_id}, write)
 
 async def delegate_to_artist(scene_id: str, visual_prompt: str, project_id: str) -> str:
     print(f"👨‍💼 Supervisor: Delegating to Artist for Scene {scene_id}...")
-    session_service = InMemorySessionService()
-    runner = Runner(agent=artist_agent, app_name=APP_NAME, session_service=session_service)
-    
-    # Create session first
-    session = await session_service.create_session(
-        app_name=APP_NAME,
-        user_id="system",
-        session_id=scene_id
-    )
-    
     prompt = f"Scene ID: {scene_id}. Visual Prompt: {visual_prompt}. Project ID: {project_id}. Generate the image."
-    content = types.Content(role='user', parts=[types.Part(text=prompt)])
     
-    final_response = ""
-    async for event in runner.run_async(user_id="system", session_id=scene_id, new_message=content):
-        if event.is_final_response():
-            final_response = event.content.parts[0].text
-            
-    return final_response
+    async def draw() -> str:
+        async with session_manager.session(scene_id) as session_id:
+            return await run_agent(artist_agent, prompt, session_id, project_id=project_id)
+    
+    return await _checkpointed(
+        "artist", {"scene_id": scene_id, "visual_prompt": visual_prompt, "project_id": project_id}, draw
+    )
 
 async def delegate_to_director(scene_id: str, image_url: str, prompt: str, project_id: str, token: str = None) -> str:
     print(f"👨‍💼 Supervisor: Delegating to Director for Scene {scene_id}...")
-    
+    # The token is left out of the checkpoint key: it identifies the caller, not the work.
+    # Failures raise past the checkpoint, so a resumed run renders them again.
+    try:
+        return await _checkpointed(
+            "director",
+            {"scene_id": scene_id, "image_url": image_url, "prompt": prompt, "project_id": project_id},
+            lambda: _direct(scene_id, image_url, prompt, project_id, token)
+        )
+    except JobCancelled:
+        raise
+    except Exception as e:
+        return f"Error generating video: {str(e)}"
+
+async def _direct(scene_id: str, image_url: str, prompt: str, project_id: str, token: str = None) -> str:
     # Import DirectorAgent class directly to pass token
     from agents.director import DirectorAgent
     
     # Create director agent with optional token
     director_instance = DirectorAgent(api_key=token)
     
-    # Use the DirectorAgent's generate_video method directly instead of ADK
-    try:
-        result = director_instance.generate_video(
-            project_id=project_id,
-            scene_id=scene_id,
-            image_url=image_url,
-            prompt=prompt
-        )
-        return f"Video generated successfully. Video URL: {result.get('video_url', 'N/A')}"
-    except Exception as e:
-        return f"Error generating video: {str(e)}"
+    # Use the DirectorAgent's generate_video method directly instead of ADK.
+    # It blocks while Veo renders, so it runs on a worker thread (which inherits
+    # the caller's tenant and cancellation scope) and the loop stays free for cancels.
+    result = await asyncio.to_thread(
+        director_instance.generate_video,
+        project_id=project_id,
+        scene_id=scene_id,
+        image_url=image_url,
+        prompt=prompt
+    )
+    return f"Video generated successfully. Video URL: {result.get('video_url', 'N/A')}"
 
 def get_latest_scene_info(project_id: str) -> dict:
     """
@@ -4,20 +4,62 @@ from google import genai
 from google.genai import types
 import os
 from dotenv import load_dotenv
-from utils.local_db import update_scene
-from utils.local_file_store import save_media
-import subprocess
+from utils.local_db import get_scene, update_scene
+from utils.local_file_store import save_blob, retain_media, release_media, get_media_metadata, resolve_media_path
+from services.image_normalizer import normalize_image_bytes
+from services.ken_burns import DEFAULT_COMPOSITION, render_ken_burns, resolve_config
+from services.video_packaging import faststart, schedule_hls
+from services.veo_service import VeoService, GenerationMode, cancel_remote_operation
+from services.llm_cache import llm_cache, cache_key
+from services.fair_scheduler import generation_scheduler, INTERACTIVE
+from services.cancellation import JobCancelled, cancellable_sleep
+from concurrent.futures import ThreadPoolExecutor
 load_dotenv()
 
 client = genai.Client(api_key=os.getenv("GOOGLE_API_KEY"))
 model_name = "veo-3.1-generate-preview"  # Correct Veo 3.1 model name
 
+def schedule_scene_hls(project_id: str, scene_id: str, video_url: str):
+    """Packages HLS for a scene video and records hlsUrl if the scene still shows that video."""
+    def _record(playlist_url: str):
+        scene = get_scene(project_id, scene_id) or {}
+        if scene.get("videoUrl") == video_url:
+            update_scene(project_id, scene_id, {"hlsUrl": playlist_url})
+
+    schedule_hls(video_url, _record)
+
+def store_scene_video(project_id: str, scene_id: str, video_bytes: bytes, updates: dict = None) -> str:
+    """
+    Stores a finished scene video (faststart, content-addressed), marks the scene
+    completed, releases the video it replaces and queues HLS packaging.
+    Returns the public URL.
+    """
+    previous = get_scene(project_id, scene_id) or {}
+    try:
+        video_bytes = faststart(video_bytes)
+    except Exception as fs_err:
+        print(f"   ⚠️ faststart remux failed, storing as-is: {fs_err}")
+    public_url = save_blob(video_bytes, "mp4")
+
+    scene_updates = {
+        "videoUrl": public_url,
+        "videoMeta": get_media_metadata(public_url),
+        "hlsUrl": None,
+        "status": "completed"
+    }
+    scene_updates.update(updates or {})
+    update_scene(project_id, scene_id, scene_updates)
+    release_media(previous.get("videoUrl"))
+    schedule_scene_hls(project_id, scene_id, public_url)
+    return public_url
+
 def generate_video_task(project_id: str, scene_id: str, image_url: str, prompt: str) -> str:
     """
     Handles the complete video generation process using Veo 2.0 or fallback.
     """
     print(f"🎬 Director Tool: Starting video generation for {scene_id}...")
     update_scene(project_id, scene_id, {"status": "generating_video"})
+    fallback_composition = None
     
     try:
         # 1. Load the image from local storage
@@ -58,63 +100,69 @@ def generate_video_task(project_id: str, scene_id: str, image_url: str, prompt:
         try:
             print(f"   🎥 Calling Veo 3.1 API with prompt: {prompt[:50]}...")
             
-            # Encode image bytes to base64 as required by Veo API
-            import base64
-            image_b64 = base64.b64encode(image_bytes).decode('utf-8')
+            # Normalize to the 720p 16:9 frame Veo renders (cached by content hash).
+            # types.Image takes raw bytes; the SDK does the base64 encoding itself.
+            frame_bytes, frame_mime_type = normalize_image_bytes(image_bytes, "720p", "16:9")
+            print(f"   📐 Normalized frame: {frame_mime_type} ({len(frame_bytes)} bytes)")
             
             # Call Veo API with correctly formatted Image
             import time
             max_retries = 3
             retry_delay = 10
             
-            for attempt in range(max_retries):
-                try:
-                    response = client.models.generate_videos(
-                        model=model_name,
-                        prompt=prompt,
-                        image=types.Image(image_bytes=image_b64, mime_type="image/png")
-                    )
-                    break # Success
-                except Exception as e:
-                    if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
-                        if attempt < max_retries - 1:
-                            print(f"   ⚠️ Rate limit hit. Retrying in {retry_delay}s... (Attempt {attempt+1}/{max_retries})")
-                            time.sleep(retry_delay)
-                            retry_delay *= 2 # Exponential backoff
+            # Hold a fair-share generation slot for the whole Veo operation
+            with generation_scheduler.slot(project_id=project_id):
+                for attempt in range(max_retries):
+                    try:
+                        response = client.models.generate_videos(
+                            model=model_name,
+                            prompt=prompt,
+                            image=types.Image(image_bytes=frame_bytes, mime_type=frame_mime_type)
+                        )
+                        break # Success
+                    except Exception as e:
+                        if "RESOURCE_EXHAUSTED" in str(e) or "429" in str(e):
+                            if attempt < max_retries - 1:
+                                print(f"   ⚠️ Rate limit hit. Retrying in {retry_delay}s... (Attempt {attempt+1}/{max_retries})")
+                                cancellable_sleep(retry_delay)
+                                retry_delay *= 2 # Exponential backoff
+                            else:
+                                raise e
                         else:
                             raise e
-                    else:
-                        raise e
             
-            # Handle Long Running Operation (LRO)
-            if hasattr(response, 'name') and (not hasattr(response, 'done') or not response.done):
-                print(f"   ⏳ Operation created: {response.name}. Polling for completion...")
-                import time
-                operation_name = response.name
+                # Handle Long Running Operation (LRO)
+                if hasattr(response, 'name') and (not hasattr(response, 'done') or not response.done):
+                    print(f"   ⏳ Operation created: {response.name}. Polling for completion...")
+                    import time
+                    operation_name = response.name
                 
-                while True:
-                    try:
-                        # Pass the operation object itself, not the name string
-                        op = client.operations.get(response)
-                        if op.done:
-                            if op.error:
-                                raise Exception(f"Operation failed: {op.error}")
+                    while True:
+                        try:
+                            # Pass the operation object itself, not the name string
+                            op = client.operations.get(response)
+                            if op.done:
+                                if op.error:
+                                    raise Exception(f"Operation failed: {op.error}")
                             
-                            print("   ✅ Operation completed.")
-                            # The result is likely in op.result (property) which holds the GenerateVideosResponse
-                            if hasattr(op, 'result'):
-                                response = op.result
-                            else:
-                                # Fallback if result property is missing, maybe op itself is the response wrapper?
-                                # But usually op.result is what we want.
-                                pass
-                            break
+                                print("   ✅ Operation completed.")
+                                # The result is likely in op.result (property) which holds the GenerateVideosResponse
+                                if hasattr(op, 'result'):
+                                    response = op.result
+                                else:
+                                    # Fallback if result property is missing, maybe op itself is the response wrapper?
+                                    # But usually op.result is what we want.
+                                    pass
+                                break
                         
-                        print("   ... still working ...")
-                        time.sleep(5)
-                    except Exception as poll_err:
-                        print(f"   ⚠️ Error during polling: {poll_err}")
-                        raise poll_err
+                            print("   ... still working ...")
+                            cancellable_sleep(5)
+                        except JobCancelled:
+                            cancel_remote_operation(client, response)
+                            raise
+                        except Exception as poll_err:
+                            print(f"   ⚠️ Error during polling: {poll_err}")
+                            raise poll_err
 
             # Debug: print response type after polling
             print(f"   ℹ️ Final Response Type: {type(response)}")
@@ -173,6 +221,9 @@ def generate_video_task(project_id: str, scene_id: str, image_url: str, prompt:
                  raise ValueError("No video content in response")
 
                 
+        except JobCancelled:
+            # A cancelled render must not fall back to Ken Burns
+            raise
         except Exception as veo_error:
             # Capture full traceback for detailed debugging
             import traceback, json
@@ -191,40 +242,26 @@ def generate_video_task(project_id: str, scene_id: str, image_url: str, prompt:
                 except Exception as resp_err:
                     print(f"   ⚠️ Failed to extract Veo response details: {resp_err}")
 
-            # Fallback: create a short video from the image using ffmpeg
+            # Fallback: render the scene's Ken Burns composition locally
             try:
-                tmp_img = "/tmp/director_placeholder.png"
-                with open(tmp_img, "wb") as f:
-                    f.write(image_bytes)
-                tmp_mp4 = "/tmp/director_placeholder.mp4"
-                subprocess.run([
-                    "ffmpeg", "-y", "-loop", "1",
-                    "-i", tmp_img,
-                    "-c:v", "libx264",
-                    "-t", "5",
-                    "-pix_fmt", "yuv420p",
-                    "-vf", "scale=1280:720",
-                    tmp_mp4
-                ], check=True)
-                with open(tmp_mp4, "rb") as f:
-                    video_bytes = f.read()
-                print(f"   ✅ Fallback video created via ffmpeg: {len(video_bytes)} bytes")
+                composition = (get_scene(project_id, scene_id) or {}).get("videoComposition") or DEFAULT_COMPOSITION
+                video_bytes = render_ken_burns(image_bytes, composition)
+                fallback_composition = {"type": "ken_burns", "config": resolve_config(composition)}
+                print(f"   ✅ Fallback Ken Burns video rendered: {len(video_bytes)} bytes")
             except Exception as ff_err:
-                print(f"   ⚠️ ffmpeg fallback failed: {ff_err}")
+                print(f"   ⚠️ Ken Burns fallback failed: {ff_err}")
                 video_bytes = image_bytes
         
-        # 3. Save Locally
-        filename = f"{scene_id}.mp4"
-        public_url = save_media(video_bytes, filename, project_id)
-        
-        # 4. Update DB
-        update_scene(project_id, scene_id, {
-            "videoUrl": public_url,
-            "status": "completed"
-        })
+        # 3. Save Locally and 4. Update DB
+        updates = {"videoComposition": fallback_composition} if fallback_composition else None
+        public_url = store_scene_video(project_id, scene_id, video_bytes, updates)
         
         return f"Video generated and saved to {public_url}"
         
+    except JobCancelled as e:
+        print(f"🛑 Director Tool: Video for {scene_id} cancelled ({e})")
+        update_scene(project_id, scene_id, {"status": "cancelled", "error": str(e)})
+        raise
     except Exception as e:
         # Capture full traceback for any failure in the whole process
         import traceback
@@ -236,3 +273,139 @@ def generate_video_task(project_id: str, scene_id: str, image_url: str, prompt:
             "error": error_details
         })
         return f"Failed: {error_details}"
+
+MOTION_PROMPT_MODEL = "gemini-2.0-flash-exp"
+
+def write_motion_prompt(project_id: str, scene_id: str, use_cache: bool = True) -> str:
+    """
+    Generates a motion prompt (camera moves, key actions) from the scene's script and
+    visual description, stores it as the scene's motion_prompt and returns it.
+    Raises LookupError if the scene does not exist.
+    """
+    scene = get_scene(project_id, scene_id)
+    if not scene:
+        raise LookupError(f"Scene {scene_id} not found")
+    
+    prompt_text = f"""Based on the following scene script and visual description, generate a concise motion prompt (2-3 sentences) that describes camera movements and key actions for video generation.
+
+Script:
+{scene.get("script", "")}
+
+Visual Description:
+{scene.get("visual_prompt", "")}
+
+Generate a motion prompt that focuses on:
+- Camera movements (pan, zoom, tilt, etc.)
+- Key character actions
+- Important visual transitions
+
+Motion Prompt:"""
+
+    def _generate() -> str:
+        response = client.models.generate_content(
+            model=MOTION_PROMPT_MODEL,
+            contents=prompt_text
+        )
+        return response.text.strip()
+
+    motion_prompt = llm_cache.get_or_compute(
+        cache_key(MOTION_PROMPT_MODEL, None, None, prompt_text),
+        _generate,
+        use_cache=use_cache
+    )
+    
+    update_scene(project_id, scene_id, {"motion_prompt": motion_prompt})
+    return motion_prompt
+
+MAX_VARIANTS = 4
+
+def _store_candidate(veo: VeoService, video) -> dict:
+    """Downloads one take and stores it in the blob store."""
+    video_bytes = veo.download_video(video)
+    try:
+        video_bytes = faststart(video_bytes)
+    except Exception as fs_err:
+        print(f"   ⚠️ faststart remux failed, storing as-is: {fs_err}")
+    url = save_blob(video_bytes, "mp4")
+    return {"url": url, "uri": video.uri, "meta": get_media_metadata(url)}
+
+def generate_video_variants(project_id: str, scene_id: str, image_url: str, prompt: str, count: int = 2, api_key: str = None) -> list:
+    """
+    Generates several takes of a scene in a single Veo operation, downloads
+    them concurrently and stores them all as `videoCandidates` on the scene.
+    The scene's current video (and its status) is left alone until a candidate
+    is selected; progress is tracked in `videoCandidatesStatus` instead.
+    """
+    count = max(1, min(int(count), MAX_VARIANTS))
+    print(f"🎬 Director Tool: Generating {count} takes for {scene_id}...")
+    update_scene(project_id, scene_id, {"videoCandidatesStatus": "generating", "videoCandidatesError": None})
+
+    try:
+        veo = VeoService(api_key=api_key)
+        # Takes are previews the user is waiting on
+        with generation_scheduler.slot(project_id=project_id, priority=INTERACTIVE):
+            operation = veo.submit_video(
+                prompt=prompt,
+                mode=GenerationMode.FRAMES_TO_VIDEO,
+                image_path=resolve_media_path(image_url) or image_url,
+                number_of_videos=count,
+            )
+            videos = veo.wait_for_videos(operation)
+
+        with ThreadPoolExecutor(max_workers=len(videos), thread_name_prefix="variant-dl") as pool:
+            futures = [pool.submit(_store_candidate, veo, video) for video in videos]
+
+        # Collected per take, so one failed download does not orphan the takes already stored
+        candidates, failures = [], []
+        for future in futures:
+            try:
+                candidates.append(future.result())
+            except Exception as e:
+                failures.append(e)
+        cancelled = next((e for e in failures if isinstance(e, JobCancelled)), None)
+        if cancelled or not candidates:
+            for candidate in candidates:
+                release_media(candidate["url"])
+            raise cancelled or failures[0]
+        if failures:
+            print(f"   ⚠️ {len(failures)} of {len(videos)} takes could not be stored: {failures[0]}")
+
+        previous = get_scene(project_id, scene_id) or {}
+        update_scene(project_id, scene_id, {
+            "videoCandidates": candidates,
+            "videoCandidatesStatus": "ready"
+        })
+        # Each candidate list holds its own references
+        for old in previous.get("videoCandidates") or []:
+            release_media(old.get("url"))
+
+        print(f"   ✅ {len(candidates)} takes stored for {scene_id}")
+        return candidates
+
+    except JobCancelled as e:
+        update_scene(project_id, scene_id, {"videoCandidatesStatus": "cancelled", "videoCandidatesError": str(e)})
+        raise
+    except Exception as e:
+        print(f"❌ Variant generation failed for {scene_id}: {e}")
+        update_scene(project_id, scene_id, {"videoCandidatesStatus": "error", "videoCandidatesError": str(e)})
+        raise
+
+def select_video_candidate(project_id: str, scene_id: str, candidate_url: str) -> str:
+    """Promotes one of the scene's stored takes to its videoUrl."""
+    scene = get_scene(project_id, scene_id) or {}
+    candidate = next((c for c in scene.get("videoCandidates") or [] if c.get("url") == candidate_url), None)
+    if not candidate:
+        raise ValueError(f"Video {candidate_url} is not a candidate of scene {scene_id}")
+
+    retain_media(candidate_url)
+    update_scene(project_id, scene_id, {
+        "videoUrl": candidate_url,
+        "videoUri": candidate.get("uri"),
+        "videoMeta": candidate.get("meta"),
+        "hlsUrl": None,
+        "status": "completed",
+        "videoCandidatesStatus": "selected"
+    })
+    release_media(scene.get("videoUrl"))
+    schedule_scene_hls(project_id, scene_id, candidate_url)
+    return candidate_url
@@ -0,0 +1,113 @@
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.local_db import get_scene, update_scene
+from utils.local_file_store import resolve_media_path
+from utils.job_store import create_job, get_job, update_job, append_job_item
+from services.veo_service import VeoService, GenerationMode
+from services.fair_scheduler import generation_scheduler, BATCH
+from services.cancellation import JobCancelled
+from tools.director_tools import store_scene_video
+
+# Veo 3.1: the first clip is ~8 s, each extension adds ~7 s, up to ~148 s in total
+FIRST_SEGMENT_SECONDS = 8
+EXTENSION_SECONDS = 7
+MAX_TOTAL_SECONDS = 148
+JOB_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "jobs")
+
+def plan_extensions(target_seconds: float) -> int:
+    """Number of extend operations needed to reach target_seconds."""
+    target = min(float(target_seconds), MAX_TOTAL_SECONDS)
+    return max(0, math.ceil((target - FIRST_SEGMENT_SECONDS) / EXTENSION_SECONDS))
+
+def _download_segment(veo: VeoService, video, job_id: str, index: int) -> bytes:
+    """Downloads one link of the chain and keeps it on disk as a checkpoint/preview."""
+    video_bytes = veo.download_video(video)
+    os.makedirs(os.path.join(JOB_DIR, job_id), exist_ok=True)
+    path = os.path.join(JOB_DIR, job_id, f"segment_{index:02d}.mp4")
+    with open(path, "wb") as f:
+        f.write(video_bytes)
+    update_job(job_id, {"downloadedSegments": index + 1})
+    return video_bytes
+
+def generate_long_form(
+    project_id: str,
+    scene_id: str,
+    target_seconds: float,
+    prompt: str = None,
+    api_key: str = None,
+    job_id: str = None,
+) -> str:
+    """
+    Builds one long clip for a scene by chaining Veo EXTEND_VIDEO operations.
+    Each extension only needs the URI of the previous link, so segment k is
+    downloaded on a worker thread while segment k+1 is already submitted.
+    The chain (operation, URI per link) is tracked on the job record.
+    Returns the public URL of the final clip.
+    """
+    scene = get_scene(project_id, scene_id) or {}
+    prompt = prompt or scene.get("motion_prompt") or scene.get("visual_prompt") or ""
+    extensions = plan_extensions(target_seconds)
+
+    job_id = job_id or create_job("long_form", project_id, scene_id, {"targetSeconds": target_seconds})
+    update_job(job_id, {"status": "running", "plannedSegments": extensions + 1, "chain": []})
+    update_scene(project_id, scene_id, {"status": "generating_video", "longFormJobId": job_id})
+    print(f"🎞️ Long-form: {scene_id} -> {target_seconds}s ({extensions} extensions), job {job_id}")
+
+    veo = VeoService(api_key=api_key)
+    downloads = ThreadPoolExecutor(max_workers=2, thread_name_prefix="long-form-dl")
+    try:
+        # The chain is sequential, so it holds a single batch-class slot throughout
+        with generation_scheduler.slot(project_id=project_id, priority=BATCH):
+            image_path = resolve_media_path(scene.get("imageUrl"))
+            if image_path:
+                operation = veo.submit_video(
+                    prompt=prompt, mode=GenerationMode.FRAMES_TO_VIDEO, image_path=image_path, resolution="720p"
+                )
+            else:
+                operation = veo.submit_video(prompt=prompt, mode=GenerationMode.TEXT_TO_VIDEO, resolution="720p")
+
+            download = None
+            for index in range(extensions + 1):
+                video = veo.wait_for_video(operation)
+                append_job_item(job_id, "chain", {
+                    "index": index,
+                    "operation": operation.name,
+                    "uri": video.uri,
+                    "completedAt": time.time(),
+                })
+
+                # Submit the next link first, then fetch this one in the background
+                if index < extensions:
+                    operation = veo.submit_video(
+                        prompt=prompt, mode=GenerationMode.EXTEND_VIDEO, input_video_uri=video.uri, resolution="720p"
+                    )
+                download = downloads.submit(_download_segment, veo, video, job_id, index)
+
+        # Every extension contains the clip it extends, so the last link is the whole sequence
+        final_bytes = download.result()
+        public_url = store_scene_video(project_id, scene_id, final_bytes, {
+            "videoUri": video.uri,
+            "longForm": {"jobId": job_id, "segments": extensions + 1, "targetSeconds": target_seconds},
+        })
+        update_job(job_id, {"status": "completed", "result": public_url})
+        return public_url
+
+    except JobCancelled as e:
+        print(f"🛑 Long-form generation cancelled for {scene_id}: {e}")
+        update_job(job_id, {"status": "cancelled", "error": str(e)})
+        update_scene(project_id, scene_id, {"status": "cancelled", "error": str(e)})
+        raise
+    except Exception as e:
+        print(f"❌ Long-form generation failed for {scene_id}: {e}")
+        update_job(job_id, {"status": "failed", "error": str(e)})
+        update_scene(project_id, scene_id, {"status": "error", "error": str(e)})
+        raise
+    finally:
+        downloads.shutdown(wait=True)
+        # Intermediate links are only checkpoints; the final clip is in the blob store
+        if (get_job(job_id) or {}).get("status") == "completed":
+            shutil.rmtree(os.path.join(JOB_DIR, job_id), ignore_errors=True)
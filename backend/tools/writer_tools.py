@@ -1,5 +1,8 @@
+from typing import Callable, List, Optional, Tuple
 from pydantic import BaseModel, Field
-from utils.local_db import save_scene, get_project_bible
+from utils.local_db import save_scene, save_scenes, get_project_bible
+from utils.events import publish
+from services.cancellation import check_cancelled
 
 # 1. Output Data Structure Definition
 class SceneScript(BaseModel):
@@ -23,9 +26,80 @@ def save_scene_script(project_id: str, scene_data: dict) -> str:
     
     return f"Scene {scene_data['sequence_number']} saved successfully with ID {scene_id}."
 
+# 2b. Bulk Script Saving Tool
+def save_scene_scripts(project_id: str, scenes: list[dict]) -> str:
+    """
+    Saves several written scenes to Local DB in one write.
+    Each item has the same fields as scene_data in save_scene_script.
+    """
+    print(f"✍️ Writer: Saving {len(scenes)} scenes...")
+    
+    for scene_data in scenes:
+        scene_data["status"] = "draft"
+    
+    scene_ids = save_scenes(project_id, scenes)
+    
+    saved = ", ".join(
+        f"{scene_data.get('sequence_number')} -> {scene_id}"
+        for scene_data, scene_id in zip(scenes, scene_ids)
+    )
+    return f"{len(scene_ids)} scenes saved successfully (scene number -> ID): {saved}."
+
 # 3. Context Retrieval Tool
 def get_production_bible_tool(project_id: str) -> dict:
     """
     Retrieves the project's world setting.
     """
     return get_project_bible(project_id)
+
+# 4. Streaming Script Tool
+def stream_script_to_project(
+    project_id: str,
+    topic: str,
+    genre: str = "",
+    tone: str = "",
+    use_cache: bool = True,
+    on_batch: Optional[Callable[[List[Tuple[str, dict]]], None]] = None,
+) -> List[str]:
+    """
+    Streams a multi-scene script from WriterAgent, saving scenes as drafts
+    (one bulk write per streamed chunk) the moment they are complete and
+    announcing each as a "scene_created" event. on_batch, if given, receives
+    the [(scene_id, scene_data)] of every saved batch.
+    Returns the new scene IDs in order.
+    """
+    from agents.writer import WriterAgent
+
+    bible = get_project_bible(project_id)
+    publish(project_id, "script_started", {"topic": topic})
+    
+    scene_ids: List[str] = []
+    try:
+        for batch in WriterAgent().stream_script(
+            topic, genre or bible.get("genre", ""), tone or bible.get("tone", ""),
+            use_cache=use_cache, bible=bible, project_id=project_id
+        ):
+            check_cancelled()
+            batch_data = [
+                {
+                    "sequence_number": scene.sequenceNumber,
+                    "script": scene.script,
+                    "visual_prompt": scene.visual_prompt,
+                    "rationale": scene.rationale,
+                    "status": "draft",
+                }
+                for scene in batch
+            ]
+            batch_ids = save_scenes(project_id, batch_data)
+            scene_ids.extend(batch_ids)
+            for scene_id, scene_data in zip(batch_ids, batch_data):
+                print(f"✍️ Writer: Streamed scene {scene_data['sequence_number']} saved as {scene_id}")
+                publish(project_id, "scene_created", {"scene_id": scene_id, "scene": scene_data})
+            if on_batch:
+                on_batch(list(zip(batch_ids, batch_data)))
+    except Exception as e:
+        publish(project_id, "script_failed", {"error": str(e), "scene_ids": scene_ids})
+        raise
+    
+    publish(project_id, "script_completed", {"scene_ids": scene_ids})
+    return scene_ids
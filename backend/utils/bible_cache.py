@@ -0,0 +1,61 @@
+"""
+Production bible read-through cache.
+Keeps (version, bible) per project in process memory for BIBLE_CACHE_TTL
+seconds, so repeated bible lookups inside one agent loop cost nothing after
+the first. Writers bump the version and put the new bible straight into the
+cache; other processes pick up the change when their entry's TTL runs out.
+
+Each storage backend numbers its bible versions separately, so each gets its
+own cache: bible_cache for the local DB, firestore_bible_cache for Firestore.
+"""
+import copy
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+BIBLE_CACHE_TTL = float(os.getenv("BIBLE_CACHE_TTL", "300"))
+
+
+class BibleCache:
+    def __init__(self, ttl: float = BIBLE_CACHE_TTL):
+        self.ttl = ttl
+        # project_id -> (version, bible, expires_at)
+        self._entries: Dict[str, Tuple[int, Dict[str, Any], float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, project_id: str, load: Callable[[], Tuple[int, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Returns a copy of the cached bible, calling load() -> (version, bible) on a miss or expiry."""
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry and entry[2] > time.monotonic():
+                return copy.deepcopy(entry[1])
+
+        version, bible = load()
+        self.put(project_id, version, bible)
+        return copy.deepcopy(bible)
+
+    def version(self, project_id: str) -> Optional[int]:
+        """Cached version for a project, or None if not cached."""
+        with self._lock:
+            entry = self._entries.get(project_id)
+            return entry[0] if entry else None
+
+    def put(self, project_id: str, version: int, bible: Dict[str, Any]):
+        """Caches a bible unless a newer version is already cached."""
+        with self._lock:
+            entry = self._entries.get(project_id)
+            if entry and entry[0] > version and entry[2] > time.monotonic():
+                return
+            self._entries[project_id] = (version, copy.deepcopy(bible), time.monotonic() + self.ttl)
+
+    def invalidate(self, project_id: Optional[str] = None):
+        with self._lock:
+            if project_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(project_id, None)
+
+
+bible_cache = BibleCache()
+firestore_bible_cache = BibleCache()
@@ -0,0 +1,120 @@
+"""
+Storyboard contact sheets.
+Tiles a project's scene images (in sequence order) into a single JPEG using
+NumPy array composition of cached thumbnails. Sheets are cached under a key
+derived from the scenes' image hashes, so any image change yields a new sheet.
+"""
+import glob
+import hashlib
+import math
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from utils.local_db import list_scenes
+from utils.local_file_store import STATIC_MEDIA_DIR, blob_path, media_digest, resolve_media_path
+
+CELL_WIDTH = 320
+CELL_HEIGHT = 180
+GUTTER = 8
+BACKGROUND = (16, 16, 16)
+DEFAULT_COLUMNS = 5
+THUMB_CACHE_SIZE = 512
+
+_thumb_cache: "OrderedDict[Tuple[str, int, int], np.ndarray]" = OrderedDict()
+_thumb_lock = threading.Lock()
+
+
+def _sheet_dir(project_id: str) -> str:
+    return os.path.join(STATIC_MEDIA_DIR, project_id, "contact_sheets")
+
+
+def _thumbnail_source(image_url: str, digest: str) -> Optional[str]:
+    """Prefers the pre-rendered thumb derivative over the full-size original."""
+    derived = blob_path(digest, "thumb.webp")
+    if os.path.exists(derived):
+        return derived
+    return resolve_media_path(image_url)
+
+
+def _load_tile(image_url: str, digest: str) -> np.ndarray:
+    """Returns a CELL_HEIGHT x CELL_WIDTH x 3 letterboxed tile, cached by image hash."""
+    key = (digest, CELL_WIDTH, CELL_HEIGHT)
+    with _thumb_lock:
+        if key in _thumb_cache:
+            _thumb_cache.move_to_end(key)
+            return _thumb_cache[key]
+
+    from PIL import Image
+
+    tile = np.empty((CELL_HEIGHT, CELL_WIDTH, 3), dtype=np.uint8)
+    tile[:] = BACKGROUND
+    with Image.open(_thumbnail_source(image_url, digest)) as im:
+        im = im.convert("RGB")
+        im.thumbnail((CELL_WIDTH, CELL_HEIGHT), Image.Resampling.LANCZOS)
+        pixels = np.asarray(im)
+    h, w = pixels.shape[:2]
+    top = (CELL_HEIGHT - h) // 2
+    left = (CELL_WIDTH - w) // 2
+    tile[top:top + h, left:left + w] = pixels
+
+    with _thumb_lock:
+        _thumb_cache[key] = tile
+        while len(_thumb_cache) > THUMB_CACHE_SIZE:
+            _thumb_cache.popitem(last=False)
+    return tile
+
+
+def build_contact_sheet(project_id: str, columns: int = DEFAULT_COLUMNS) -> Optional[Tuple[str, str]]:
+    """
+    Builds (or reuses) the contact sheet for a project.
+    Returns (file_path, cache_key), or None when no scene has an image yet.
+    """
+    from PIL import Image
+
+    entries = []
+    for scene in list_scenes(project_id):
+        if not scene.get("imageUrl"):
+            continue
+        digest = media_digest(scene["imageUrl"])
+        if digest:
+            entries.append((scene["imageUrl"], digest))
+    if not entries:
+        return None
+
+    columns = max(1, min(columns, len(entries)))
+    key_source = "|".join(d for _, d in entries) + f"|{columns}|{CELL_WIDTH}x{CELL_HEIGHT}"
+    key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()[:20]
+
+    out_dir = _sheet_dir(project_id)
+    out_path = os.path.join(out_dir, f"{key}.jpg")
+    if os.path.exists(out_path):
+        return out_path, key
+
+    rows = math.ceil(len(entries) / columns)
+    sheet = np.empty(
+        (rows * (CELL_HEIGHT + GUTTER) + GUTTER, columns * (CELL_WIDTH + GUTTER) + GUTTER, 3),
+        dtype=np.uint8,
+    )
+    sheet[:] = BACKGROUND
+
+    for index, (image_url, digest) in enumerate(entries):
+        row, col = divmod(index, columns)
+        y = GUTTER + row * (CELL_HEIGHT + GUTTER)
+        x = GUTTER + col * (CELL_WIDTH + GUTTER)
+        sheet[y:y + CELL_HEIGHT, x:x + CELL_WIDTH] = _load_tile(image_url, digest)
+
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = f"{out_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    Image.fromarray(sheet).save(tmp_path, format="JPEG", quality=85, optimize=True)
+    os.replace(tmp_path, out_path)
+
+    # Older sheets are invalid now that the image hashes changed
+    for stale in glob.glob(os.path.join(out_dir, "*.jpg")):
+        if stale != out_path:
+            os.remove(stale)
+
+    return out_path, key
@@ -0,0 +1,68 @@
+"""
+In-process event bus for Server-Sent Events.
+Publishers (API handlers, background tasks, worker threads) announce project
+events; each SSE connection gets its own bounded queue. Slow clients lose
+their oldest events instead of blocking publishers.
+"""
+import asyncio
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+QUEUE_SIZE = 256
+HEARTBEAT_INTERVAL = 15
+
+_subscribers: Dict[str, List[Tuple[asyncio.AbstractEventLoop, asyncio.Queue]]] = {}
+_lock = threading.Lock()
+
+
+def _put(queue: asyncio.Queue, message: Dict[str, Any]):
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(message)
+
+
+def publish(project_id: str, event: str, data: Optional[Dict[str, Any]] = None):
+    """Announces an event to every subscriber of the project. Safe to call from any thread."""
+    message = {"event": event, "data": data or {}, "at": time.time()}
+    with _lock:
+        targets = list(_subscribers.get(project_id, []))
+    for loop, queue in targets:
+        try:
+            loop.call_soon_threadsafe(_put, queue, message)
+        except RuntimeError:
+            # The subscriber's loop has shut down
+            pass
+
+
+@contextmanager
+def subscription(project_id: str) -> Iterator[asyncio.Queue]:
+    """Registers a queue for the project's events on the running loop for the duration of the block."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    entry = (asyncio.get_running_loop(), queue)
+    with _lock:
+        _subscribers.setdefault(project_id, []).append(entry)
+    try:
+        yield queue
+    finally:
+        with _lock:
+            subscribers = _subscribers.get(project_id, [])
+            if entry in subscribers:
+                subscribers.remove(entry)
+            if not subscribers:
+                _subscribers.pop(project_id, None)
+
+
+async def sse_stream(project_id: str) -> AsyncIterator[str]:
+    """Formats the project's events as an SSE stream with periodic heartbeats."""
+    with subscription(project_id) as queue:
+        yield ": connected\n\n"
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"event: {message['event']}\ndata: {json.dumps(message['data'], default=str)}\n\n"
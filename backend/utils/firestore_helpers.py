@@ -1,4 +1,7 @@
 from backend.utils.firebase_config import db, bucket
+# Same module path as utils.local_db, so each backend's cache is a single instance
+from utils.bible_cache import firestore_bible_cache as bible_cache
+from firebase_admin import firestore
 import datetime
 
 def update_scene(project_id: str, scene_id: str, data: dict):
@@ -19,14 +22,42 @@ def upload_to_storage(file_path: str, destination_path: str) -> str:
     blob.make_public()
     return blob.public_url
 
+def _read_project_bible(project_id: str) -> tuple:
+    doc = db.collection("projects").document(project_id).get()
+    if doc.exists:
+        data = doc.to_dict()
+        return data.get("productionBibleVersion", 0), data.get("productionBible", {})
+    return 0, {}
+
 def get_project_bible(project_id: str) -> dict:
-    """Fetches the production bible from the project document."""
+    """Fetches the production bible from the project document (read through the in-process cache)."""
+    if not db:
+        raise RuntimeError("Firestore is not initialized")
+    
+    return bible_cache.get(project_id, lambda: _read_project_bible(project_id))
+
+def update_project_bible(project_id: str, updates: dict, replace: bool = False, expected_version: int = None) -> dict:
+    """
+    Merges updates into (or replaces) the production bible and bumps its version in a transaction.
+    Raises ValueError if expected_version is given and no longer current.
+    """
     if not db:
         raise RuntimeError("Firestore is not initialized")
     
     doc_ref = db.collection("projects").document(project_id)
-    doc = doc_ref.get()
-    if doc.exists:
-        data = doc.to_dict()
-        return data.get("productionBible", {})
-    return {}
+    
+    @firestore.transactional
+    def _update(transaction):
+        snapshot = doc_ref.get(transaction=transaction)
+        current = snapshot.to_dict() if snapshot.exists else {}
+        current_version = current.get("productionBibleVersion", 0)
+        if expected_version is not None and expected_version != current_version:
+            raise ValueError(f"Bible version conflict: expected {expected_version}, current is {current_version}")
+        data = dict(updates) if replace else {**current.get("productionBible", {}), **updates}
+        version = current_version + 1
+        transaction.set(doc_ref, {"productionBible": data, "productionBibleVersion": version}, merge=True)
+        return version, data
+    
+    version, data = _update(db.transaction())
+    bible_cache.put(project_id, version, data)
+    return {"version": version, "data": data}
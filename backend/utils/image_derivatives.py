@@ -0,0 +1,116 @@
+"""
+Image derivative pipeline.
+Renders thumbnail and display-size WebP/AVIF variants of stored scene images
+on a process pool and records them on the scene as `imageVariants`.
+"""
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Any, Optional
+
+from utils.local_db import get_scene, update_scene
+from utils.local_file_store import blob_digest, blob_path, blob_url, resolve_media_path
+
+# Longest edge in pixels for each variant
+DERIVATIVE_SIZES = {
+    "thumb": 320,
+    "display": 1280,
+}
+FORMAT_OPTIONS = {
+    "webp": {"quality": 80, "method": 4},
+    "avif": {"quality": 60, "speed": 8},
+}
+DERIVATIVE_WORKERS = int(os.getenv("DERIVATIVE_WORKERS", "2"))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Called from request threads; the lock keeps them from each starting a pool
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=DERIVATIVE_WORKERS)
+        return _pool
+
+
+def _supported_formats() -> list[str]:
+    """WebP always; AVIF only when this Pillow build can encode it."""
+    from PIL import features
+
+    formats = ["webp"]
+    try:
+        if features.check("avif"):
+            formats.append("avif")
+    except ValueError:
+        # Older Pillow without the avif feature flag; try the plugin
+        try:
+            import pillow_avif  # noqa: F401
+            formats.append("avif")
+        except ImportError:
+            pass
+    return formats
+
+
+def render_derivatives(src_path: str, digest: str) -> Dict[str, Any]:
+    """
+    Worker entry point: renders every size/format variant of src_path next to
+    its blob (as {sha}.{size}.{format}) and returns the variants map.
+    Existing variants are reused, so re-running is cheap.
+    """
+    from PIL import Image
+
+    variants: Dict[str, Any] = {}
+    formats = _supported_formats()
+
+    with Image.open(src_path) as source:
+        source.load()
+        mode = "RGBA" if source.mode in ("RGBA", "LA", "P") else "RGB"
+        source = source.convert(mode)
+
+        for name, max_edge in DERIVATIVE_SIZES.items():
+            resized = source.copy()
+            # thumbnail() only ever downscales and keeps the aspect ratio
+            resized.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+            entry = {"width": resized.width, "height": resized.height}
+
+            for fmt in formats:
+                ext = f"{name}.{fmt}"
+                out_path = blob_path(digest, ext)
+                if not os.path.exists(out_path):
+                    tmp_path = f"{out_path}.{os.getpid()}.tmp"
+                    resized.save(tmp_path, format=fmt.upper(), **FORMAT_OPTIONS[fmt])
+                    os.replace(tmp_path, out_path)
+                entry[fmt] = blob_url(digest, ext)
+
+            variants[name] = entry
+
+    return variants
+
+
+def schedule_image_derivatives(project_id: str, scene_id: str, image_url: str) -> Optional[Future]:
+    """
+    Queues derivative rendering for a scene image stored in the blob store.
+    The scene is updated when rendering finishes, unless its image changed meanwhile.
+    Returns the Future, or None when the URL is not a blob.
+    """
+    digest = blob_digest(image_url)
+    src_path = resolve_media_path(image_url)
+    if not digest or not src_path:
+        return None
+
+    future = _get_pool().submit(render_derivatives, src_path, digest)
+
+    def _record(done: Future):
+        try:
+            variants = done.result()
+        except Exception as e:
+            print(f"⚠️ Derivative rendering failed for {scene_id}: {e}")
+            return
+        scene = get_scene(project_id, scene_id) or {}
+        if scene.get("imageUrl") == image_url:
+            update_scene(project_id, scene_id, {"imageVariants": variants})
+
+    future.add_done_callback(_record)
+    return future
@@ -0,0 +1,59 @@
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+
+from utils.local_db import _load_db, _transaction
+
+# Jobs live next to projects in the local DB under "jobs"
+
+def create_job(kind: str, project_id: str, scene_id: str = None, data: Dict[str, Any] = None) -> str:
+    """Registers a new job and returns its ID."""
+    job_id = f"job_{uuid.uuid4().hex[:12]}"
+    now = time.time()
+    with _transaction() as db:
+        db.setdefault("jobs", {})[job_id] = {
+            "id": job_id,
+            "kind": kind,
+            "projectId": project_id,
+            "sceneId": scene_id,
+            "status": "queued",
+            "createdAt": now,
+            "updatedAt": now,
+            **(data or {}),
+        }
+    return job_id
+
+def update_job(job_id: str, updates: Dict[str, Any]):
+    """Merges updates into a job record."""
+    with _transaction() as db:
+        job = db.get("jobs", {}).get(job_id)
+        if not job:
+            print(f"Warning: Job {job_id} not found.")
+            return
+        job.update(updates)
+        job["updatedAt"] = time.time()
+
+def append_job_item(job_id: str, key: str, item: Dict[str, Any]):
+    """Appends an entry to a list field of a job (e.g. a segment chain)."""
+    with _transaction() as db:
+        job = db.get("jobs", {}).get(job_id)
+        if not job:
+            print(f"Warning: Job {job_id} not found.")
+            return
+        job.setdefault(key, []).append(item)
+        job["updatedAt"] = time.time()
+
+def get_job(job_id: str) -> Optional[Dict[str, Any]]:
+    """Retrieves a job."""
+    return _load_db().get("jobs", {}).get(job_id)
+
+def list_jobs(project_id: str = None, scene_id: str = None, status: str = None) -> List[Dict[str, Any]]:
+    """Returns jobs matching the given filters, newest first."""
+    jobs = _load_db().get("jobs", {}).values()
+    matches = [
+        j for j in jobs
+        if (project_id is None or j.get("projectId") == project_id)
+        and (scene_id is None or j.get("sceneId") == scene_id)
+        and (status is None or j.get("status") == status)
+    ]
+    return sorted(matches, key=lambda j: j.get("createdAt", 0), reverse=True)
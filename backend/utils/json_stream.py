@@ -0,0 +1,70 @@
+"""
+Incremental JSON array parser.
+Feeds on text chunks of a JSON document as a model streams it and returns
+each element of one array (e.g. "scenes") as soon as that element's closing
+brace arrives, without waiting for the rest of the document.
+"""
+import json
+from typing import Any, Dict, List
+
+
+class JsonArrayStreamParser:
+    """Yields complete objects from the array under `key` in a streamed JSON object."""
+
+    def __init__(self, key: str):
+        self.marker = f'"{key}"'
+        self.buffer = ""
+        self.pos = 0
+        # Before the array ("seek"), inside it ("array"), or after its closing bracket ("done")
+        self.state = "seek"
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.item_start = -1
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consumes a chunk and returns the array elements completed by it."""
+        self.buffer += chunk
+        items: List[Dict[str, Any]] = []
+
+        if self.state == "seek":
+            start = self.buffer.find(self.marker)
+            bracket = self.buffer.find("[", start + len(self.marker)) if start >= 0 else -1
+            if bracket < 0:
+                return items
+            self.state = "array"
+            self.pos = bracket + 1
+
+        while self.state == "array" and self.pos < len(self.buffer):
+            ch = self.buffer[self.pos]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = True
+            elif ch in "{[":
+                if self.depth == 0:
+                    self.item_start = self.pos
+                self.depth += 1
+            elif ch in "}]":
+                if self.depth == 0 and ch == "]":
+                    self.state = "done"
+                else:
+                    self.depth -= 1
+                    if self.depth == 0:
+                        items.append(json.loads(self.buffer[self.item_start:self.pos + 1]))
+                        self.item_start = -1
+            self.pos += 1
+
+        # Drop text that can no longer be part of an element
+        keep_from = self.item_start if self.item_start >= 0 else self.pos
+        if self.state == "array" and keep_from > 0:
+            self.buffer = self.buffer[keep_from:]
+            self.pos -= keep_from
+            if self.item_start >= 0:
+                self.item_start = 0
+        return items
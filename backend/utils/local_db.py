@@ -1,11 +1,19 @@
 import json
 import os
+import threading
 import time
-from typing import Dict, Any, List
+import uuid
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional
+from utils.bible_cache import bible_cache
+from utils.local_file_store import release_media
 
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 DB_FILE = os.path.join(DATA_DIR, "db.json")
 
+# Serializes read-modify-write cycles on the DB file within this process
+_db_lock = threading.RLock()
+
 def _load_db() -> Dict[str, Any]:
     if not os.path.exists(DB_FILE):
         return {"projects": {}}
@@ -16,48 +24,130 @@ def _load_db() -> Dict[str, Any]:
         return {"projects": {}}
 
 def _save_db(data: Dict[str, Any]):
-    with open(DB_FILE, "w") as f:
+    # Write to a temp file and swap it in, so readers never see a half-written DB
+    tmp_path = f"{DB_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
         json.dump(data, f, indent=2)
+    os.replace(tmp_path, DB_FILE)
+
+@contextmanager
+def _transaction() -> Iterator[Dict[str, Any]]:
+    """Loads the DB under the lock and saves it once if the block completes without raising."""
+    with _db_lock:
+        db = _load_db()
+        yield db
+        _save_db(db)
+
+def save_scenes(project_id: str, scenes: List[Dict[str, Any]]) -> List[str]:
+    """Saves several new scenes in one DB write and returns their IDs in order."""
+    with _transaction() as db:
+        project = db["projects"].setdefault(project_id, {"scenes": {}})
+        now = time.time()
+        scene_ids = []
+        for index, scene_data in enumerate(scenes):
+            # Generate ID (the random suffix keeps scenes saved within the same second apart)
+            scene_id = f"scene_{int(now)}_{uuid.uuid4().hex[:6]}"
+            scene_data["id"] = scene_id
+            # Offset so createdAt ordering (get_latest_scene) follows the batch order
+            scene_data["createdAt"] = now + index * 1e-6
+            project["scenes"][scene_id] = scene_data
+            scene_ids.append(scene_id)
+    return scene_ids
 
 def save_scene(project_id: str, scene_data: Dict[str, Any]) -> str:
     """Saves a new scene and returns its ID."""
-    db = _load_db()
-    
-    if project_id not in db["projects"]:
-        db["projects"][project_id] = {"scenes": {}}
-        
-    # Generate ID
-    scene_id = f"scene_{int(time.time())}"
-    scene_data["id"] = scene_id
-    scene_data["createdAt"] = time.time()
-    
-    db["projects"][project_id]["scenes"][scene_id] = scene_data
-    _save_db(db)
-    
-    return scene_id
+    return save_scenes(project_id, [scene_data])[0]
+
+def update_scenes(project_id: str, updates_by_id: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Applies {scene_id: updates} in one DB write. All-or-nothing: raises KeyError
+    (and writes nothing) if any scene is missing. Returns the updated IDs.
+    """
+    with _transaction() as db:
+        scenes = db["projects"].get(project_id, {}).get("scenes", {})
+        missing = [scene_id for scene_id in updates_by_id if scene_id not in scenes]
+        if missing:
+            raise KeyError(f"Scenes not found in project {project_id}: {', '.join(missing)}")
+        for scene_id, updates in updates_by_id.items():
+            scenes[scene_id].update(updates)
+    return list(updates_by_id)
 
 def update_scene(project_id: str, scene_id: str, updates: Dict[str, Any]):
     """Updates an existing scene."""
-    db = _load_db()
-    if project_id in db["projects"] and scene_id in db["projects"][project_id]["scenes"]:
-        db["projects"][project_id]["scenes"][scene_id].update(updates)
-        _save_db(db)
-    else:
+    try:
+        update_scenes(project_id, {scene_id: updates})
+    except KeyError:
         print(f"Warning: Scene {scene_id} in project {project_id} not found.")
 
+def _scene_media_urls(scene: Dict[str, Any]) -> List[str]:
+    """Blob URLs a scene holds a reference on (its image, video and video takes)."""
+    urls = [scene.get("imageUrl"), scene.get("videoUrl")]
+    urls.extend(candidate.get("url") for candidate in scene.get("videoCandidates") or [])
+    return [url for url in urls if url]
+
+def delete_scenes(project_id: str, scene_ids: List[str]) -> List[str]:
+    """
+    Removes scenes in one DB write, dropping their media references, and
+    returns the IDs that existed.
+    """
+    deleted, released = [], []
+    with _transaction() as db:
+        scenes = db["projects"].get(project_id, {}).get("scenes", {})
+        for scene_id in scene_ids:
+            scene = scenes.pop(scene_id, None)
+            if scene is not None:
+                released.extend(_scene_media_urls(scene))
+                deleted.append(scene_id)
+    # Only once the scenes are gone from the saved DB may their media be freed
+    for url in released:
+        release_media(url)
+    return deleted
+
 def get_scene(project_id: str, scene_id: str) -> Dict[str, Any]:
     """Retrieves a scene."""
     db = _load_db()
     return db.get("projects", {}).get(project_id, {}).get("scenes", {}).get(scene_id)
 
+def _read_project_bible(project_id: str) -> tuple:
+    bible = get_project(project_id).get("bible") or {}
+    return bible.get("version", 0), bible.get("data", {})
+
 def get_project_bible(project_id: str) -> Dict[str, Any]:
-    """Mock production bible."""
-    # In a real app, this would be loaded from DB.
-    return {
-        "genre": "Sci-Fi",
-        "tone": "Dark, Cinematic",
-        "characters": ["Neo", "Trinity"]
-    }
+    """Returns the project's production bible ({} if none), read through the in-process cache."""
+    return bible_cache.get(project_id, lambda: _read_project_bible(project_id))
+
+def get_project_bible_version(project_id: str) -> int:
+    """Returns the current bible version (0 if the project has no bible yet)."""
+    version = bible_cache.version(project_id)
+    if version is None:
+        get_project_bible(project_id)
+        version = bible_cache.version(project_id) or 0
+    return version
+
+def update_project_bible(
+    project_id: str,
+    updates: Dict[str, Any],
+    replace: bool = False,
+    expected_version: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Merges updates into the production bible (or replaces it) and bumps its version.
+    Raises ValueError if expected_version is given and no longer current.
+    Returns {"version", "data", "updatedAt"}.
+    """
+    with _transaction() as db:
+        project = db["projects"].setdefault(project_id, {"scenes": {}})
+        current = project.get("bible") or {"version": 0, "data": {}}
+        
+        if expected_version is not None and expected_version != current["version"]:
+            raise ValueError(f"Bible version conflict: expected {expected_version}, current is {current['version']}")
+        
+        data = dict(updates) if replace else {**current["data"], **updates}
+        bible = {"version": current["version"] + 1, "data": data, "updatedAt": time.time()}
+        project["bible"] = bible
+    
+    bible_cache.put(project_id, bible["version"], data)
+    return bible
 
 def get_latest_scene(project_id: str) -> Dict[str, Any]:
     """Gets the most recently created scene."""
@@ -75,6 +165,20 @@ def get_project(project_id: str) -> Dict[str, Any]:
     db = _load_db()
     return db.get("projects", {}).get(project_id, {})
 
+def list_scenes(project_id: str) -> List[Dict[str, Any]]:
+    """Returns a project's scenes in sequence order (creation time breaks ties)."""
+    scenes = get_project(project_id).get("scenes", {}).values()
+    return sorted(
+        scenes,
+        key=lambda x: (x.get("sequence_number", x.get("sequenceNumber", 0)), x.get("createdAt", 0))
+    )
+
+def update_project(project_id: str, updates: Dict[str, Any]):
+    """Updates project-level fields (everything except its scenes)."""
+    with _transaction() as db:
+        project = db["projects"].setdefault(project_id, {"scenes": {}})
+        project.update(updates)
+
 def list_projects() -> List[str]:
     """Returns a list of all project IDs."""
     db = _load_db()
@@ -1,12 +1,130 @@
+import errno
+import fcntl
+import glob
+import hashlib
+import json
 import os
 import shutil
+import tempfile
+import threading
+from typing import Dict, Any, Optional
+
+from utils.media_probe import probe_media
 
 STATIC_MEDIA_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "static", "media")
 
-def save_media(file_path_or_bytes, filename: str, project_id: str = None) -> str:
+# Content-addressed blobs: static/media/blobs/{sha[:2]}/{sha[2:4]}/{sha}.{ext}
+BLOB_DIR = os.path.join(STATIC_MEDIA_DIR, "blobs")
+BLOB_URL_PREFIX = "/static/media/blobs"
+# Refcounts live outside /static so they are never served
+BLOB_REFS_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "blob_refs.json")
+_refs_lock = threading.Lock()
+# Probed metadata per media URL (duration, resolution, codec, bytes, fps)
+MEDIA_META_FILE = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "media_meta.json")
+_meta_lock = threading.Lock()
+
+# Linux FICLONE ioctl (copy-on-write clone on btrfs/xfs/overlayfs-on-xfs)
+FICLONE = 0x40049409
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# mkstemp creates 0600 files and os.replace keeps that mode; published files get
+# the umask default instead. The umask can only be read by setting it, so read it once.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+PUBLISHED_FILE_MODE = 0o666 & ~_UMASK
+
+def _temp_path(target_path: str) -> str:
+    """Reserves a hidden temp file next to target_path (same filesystem, so os.replace is atomic)."""
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=f".{os.path.basename(target_path)}.",
+        suffix=".tmp",
+        dir=os.path.dirname(target_path),
+    )
+    os.close(fd)
+    os.chmod(tmp_path, PUBLISHED_FILE_MODE)
+    return tmp_path
+
+def _write_bytes_atomic(data: bytes, target_path: str):
+    """Writes bytes to a temp file, fsyncs it and renames it over target_path."""
+    tmp_path = _temp_path(target_path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def _reflink_or_copy(src_path: str, tmp_path: str) -> str:
+    """Fills tmp_path from src_path via reflink when supported, else a streamed copy."""
+    with open(src_path, "rb") as src, open(tmp_path, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            method = "reflink"
+        except OSError:
+            dst.seek(0)
+            dst.truncate()
+            shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+            method = "copy"
+        dst.flush()
+        os.fsync(dst.fileno())
+    # Times only: copystat would also copy the source's mode over PUBLISHED_FILE_MODE
+    src_stat = os.stat(src_path)
+    os.utime(tmp_path, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+    return method
+
+def promote_file(src_path: str, target_path: str, move: bool = False) -> str:
+    """
+    Promotes src_path to target_path without duplicating bytes when possible.
+    Tries (in order) rename (only if move=True), hardlink, reflink and finally a
+    streamed copy. Every strategy lands in a temp file first and is published
+    with an atomic os.replace, so readers never see a half-written file.
+    Returns the strategy used.
+    """
+    if os.path.abspath(src_path) == os.path.abspath(target_path):
+        return "noop"
+
+    same_fs = os.stat(src_path).st_dev == os.stat(os.path.dirname(target_path)).st_dev
+
+    if move and same_fs:
+        # A renamed (or hardlinked) file keeps the source's mode, e.g. 0600 from mkstemp
+        os.chmod(src_path, PUBLISHED_FILE_MODE)
+        os.replace(src_path, target_path)
+        return "rename"
+
+    tmp_path = _temp_path(target_path)
+    try:
+        method = None
+        if same_fs:
+            os.remove(tmp_path)
+            try:
+                os.link(src_path, tmp_path)
+                os.chmod(tmp_path, PUBLISHED_FILE_MODE)
+                method = "hardlink"
+            except OSError as e:
+                if e.errno not in (errno.EPERM, errno.EMLINK, errno.EXDEV, errno.ENOTSUP, errno.EACCES):
+                    raise
+        if method is None:
+            method = _reflink_or_copy(src_path, tmp_path)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    if move and os.path.exists(src_path):
+        os.remove(src_path)
+    return method
+
+def save_media(file_path_or_bytes, filename: str, project_id: str = None, move: bool = False) -> str:
     """
     Saves a file (path or bytes) to the local static/media directory.
     If project_id is provided, saves to static/media/{project_id}/filename.
+    Paths are promoted with promote_file (move=True consumes the source);
+    bytes are written through a temp file and atomically renamed into place.
     Returns the relative URL (e.g., /static/media/project_id/filename.png).
     """
     if project_id:
@@ -15,16 +133,223 @@ def save_media(file_path_or_bytes, filename: str, project_id: str = None) -> str
     else:
         save_dir = STATIC_MEDIA_DIR
         url_prefix = "/static/media"
-        
+
     os.makedirs(save_dir, exist_ok=True)
     target_path = os.path.join(save_dir, filename)
-    
+
     if isinstance(file_path_or_bytes, str):
-        # It's a file path, copy it
-        shutil.copy(file_path_or_bytes, target_path)
+        # It's a file path, promote it (rename/hardlink/reflink/copy)
+        promote_file(file_path_or_bytes, target_path, move=move)
     else:
         # It's bytes, write it
-        with open(target_path, "wb") as f:
-            f.write(file_path_or_bytes)
-            
-    return f"{url_prefix}/{filename}"
+        _write_bytes_atomic(file_path_or_bytes, target_path)
+
+    url = f"{url_prefix}/{filename}"
+    # The file was (re)written, so any earlier metadata is stale
+    index_media_metadata(url, target_path)
+    return url
+
+
+# --- Content-addressed blob store ---
+
+def _hash_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _blob_relpath(digest: str, ext: str) -> str:
+    return f"{digest[:2]}/{digest[2:4]}/{digest}.{ext}"
+
+def _load_refs() -> Dict[str, Any]:
+    if not os.path.exists(BLOB_REFS_FILE):
+        return {}
+    try:
+        with open(BLOB_REFS_FILE, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+def _save_refs(refs: Dict[str, Any]):
+    os.makedirs(os.path.dirname(BLOB_REFS_FILE), exist_ok=True)
+    _write_bytes_atomic(json.dumps(refs, indent=2).encode("utf-8"), BLOB_REFS_FILE)
+
+def blob_digest(url: Optional[str]) -> Optional[str]:
+    """Returns the sha256 of a blob URL, or None for legacy/non-blob URLs."""
+    if not url or not url.startswith(BLOB_URL_PREFIX + "/"):
+        return None
+    return os.path.basename(url).split(".", 1)[0]
+
+def blob_path(digest: str, ext: str) -> str:
+    """Filesystem path of a blob (or of a derivative when ext carries a suffix)."""
+    return os.path.join(BLOB_DIR, _blob_relpath(digest, ext))
+
+def blob_url(digest: str, ext: str) -> str:
+    """Public URL of a blob (or of a derivative when ext carries a suffix)."""
+    return f"{BLOB_URL_PREFIX}/{_blob_relpath(digest, ext)}"
+
+def resolve_media_path(url: Optional[str]) -> Optional[str]:
+    """Maps a /static/media/... URL (blob or legacy) to its local file path."""
+    if not url or not url.startswith("/static/media/"):
+        return None
+    rel = url[len("/static/media/"):].split("?", 1)[0]
+    path = os.path.normpath(os.path.join(STATIC_MEDIA_DIR, rel))
+    if not path.startswith(STATIC_MEDIA_DIR):
+        return None
+    return path
+
+def media_digest(url: Optional[str]) -> Optional[str]:
+    """sha256 of the content behind a media URL (free for blob URLs, hashed for legacy files)."""
+    digest = blob_digest(url)
+    if digest:
+        return digest
+    path = resolve_media_path(url)
+    if path and os.path.isfile(path):
+        return _hash_file(path)
+    return None
+
+def save_blob(file_path_or_bytes, ext: str, move: bool = False) -> str:
+    """
+    Stores content once under its sha256 and takes a reference on it.
+    Identical bytes resolve to the same immutable URL, so the result can be
+    served with long-lived cache headers. Every call must be balanced by a
+    release_media() once the referencing record stops pointing at the URL.
+    Returns the blob URL (e.g., /static/media/blobs/ab/cd/abcd....png).
+    """
+    ext = ext.lstrip(".").lower()
+    if isinstance(file_path_or_bytes, str):
+        digest = _hash_file(file_path_or_bytes)
+    else:
+        digest = hashlib.sha256(file_path_or_bytes).hexdigest()
+
+    target_path = blob_path(digest, ext)
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    # Publishing and ref-taking happen under the lock so a concurrent
+    # release_media() cannot delete the blob between the two.
+    with _refs_lock:
+        is_new = not os.path.exists(target_path)
+        if not is_new:
+            # Already stored: dedupe, but still consume the source if asked to
+            if move and isinstance(file_path_or_bytes, str) and os.path.exists(file_path_or_bytes):
+                os.remove(file_path_or_bytes)
+        elif isinstance(file_path_or_bytes, str):
+            promote_file(file_path_or_bytes, target_path, move=move)
+        else:
+            _write_bytes_atomic(file_path_or_bytes, target_path)
+
+        refs = _load_refs()
+        entry = refs.setdefault(digest, {"ext": ext, "refs": 0, "size": os.path.getsize(target_path)})
+        entry["refs"] += 1
+        _save_refs(refs)
+
+    url = blob_url(digest, ext)
+    # Blobs are immutable: probe once, when the bytes first land
+    if is_new or get_media_metadata(url, probe_missing=False) is None:
+        index_media_metadata(url, target_path)
+    return url
+
+def retain_media(url: Optional[str]):
+    """Takes an extra reference on an existing blob URL (e.g. when a second field points at it)."""
+    digest = blob_digest(url)
+    if not digest:
+        return
+
+    with _refs_lock:
+        refs = _load_refs()
+        if digest not in refs:
+            raise FileNotFoundError(f"Blob not found: {url}")
+        refs[digest]["refs"] += 1
+        _save_refs(refs)
+
+def release_media(url: Optional[str]):
+    """
+    Drops one reference on a blob URL and deletes the blob (plus any derived
+    files named {sha}.*) when nothing points at it anymore.
+    Legacy non-blob URLs are ignored.
+    """
+    digest = blob_digest(url)
+    if not digest:
+        return
+
+    with _refs_lock:
+        refs = _load_refs()
+        entry = refs.get(digest)
+        if not entry:
+            return
+        entry["refs"] -= 1
+        if entry["refs"] > 0:
+            _save_refs(refs)
+            return
+        del refs[digest]
+        _save_refs(refs)
+        _drop_media_metadata(url)
+
+        for path in glob.glob(os.path.join(BLOB_DIR, digest[:2], digest[2:4], f"{digest}.*")):
+            try:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+# --- Media metadata index ---
+
+def _load_meta() -> Dict[str, Any]:
+    if not os.path.exists(MEDIA_META_FILE):
+        return {}
+    try:
+        with open(MEDIA_META_FILE, "r") as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        return {}
+
+def _save_meta(index: Dict[str, Any]):
+    os.makedirs(os.path.dirname(MEDIA_META_FILE), exist_ok=True)
+    _write_bytes_atomic(json.dumps(index, indent=2).encode("utf-8"), MEDIA_META_FILE)
+
+def _drop_media_metadata(url: str):
+    with _meta_lock:
+        index = _load_meta()
+        if index.pop(url, None) is not None:
+            _save_meta(index)
+
+def index_media_metadata(url: str, path: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Probes a media file once and stores its compact metadata under its URL.
+    If the file is missing or cannot be probed, any earlier entry is dropped:
+    it described content that is no longer there.
+    """
+    path = path or resolve_media_path(url)
+    meta = None
+    if path and os.path.isfile(path):
+        try:
+            meta = probe_media(path)
+        except Exception as e:
+            print(f"⚠️ Metadata probe failed for {url}: {e}")
+    if meta is None:
+        _drop_media_metadata(url)
+        return None
+
+    with _meta_lock:
+        index = _load_meta()
+        index[url] = meta
+        _save_meta(index)
+    return meta
+
+def get_media_metadata(url: Optional[str], probe_missing: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Returns the indexed metadata for a media URL.
+    Files written before the index existed are probed on first request
+    (unless probe_missing=False) and remembered from then on.
+    """
+    if not url:
+        return None
+    with _meta_lock:
+        meta = _load_meta().get(url)
+    if meta is None and probe_missing:
+        meta = index_media_metadata(url)
+    return meta
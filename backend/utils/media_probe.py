@@ -0,0 +1,84 @@
+"""
+Media probing helpers (ffprobe for video, PIL for images).
+"""
+import json
+import os
+import subprocess
+from fractions import Fraction
+from typing import Dict, Any, Optional
+
+PROBE_TIMEOUT = 30
+
+IMAGE_EXTENSIONS = {"png", "jpg", "jpeg", "webp", "gif", "avif"}
+VIDEO_EXTENSIONS = {"mp4", "mov", "webm", "m4v"}
+
+
+def _fps(rate: Optional[str]) -> Optional[float]:
+    if not rate or rate in ("0/0", "N/A"):
+        return None
+    return round(float(Fraction(rate)), 3)
+
+
+def probe_video(path: str) -> Dict[str, Any]:
+    """
+    Returns the stream parameters of a video file:
+    duration, width, height, codec, pixFmt, fps, hasAudio and, when there is
+    an audio stream, audioCodec, sampleRate and channels.
+    """
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-show_entries",
+        "format=duration:stream=codec_type,codec_name,width,height,pix_fmt,avg_frame_rate,r_frame_rate,sample_rate,channels",
+        "-of", "json",
+        path,
+    ], check=True, capture_output=True, text=True, timeout=PROBE_TIMEOUT)
+    info = json.loads(result.stdout)
+
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+
+    meta = {
+        "duration": round(float(info.get("format", {}).get("duration") or 0), 3),
+        "width": video.get("width"),
+        "height": video.get("height"),
+        "codec": video.get("codec_name"),
+        "pixFmt": video.get("pix_fmt"),
+        "fps": _fps(video.get("avg_frame_rate")) or _fps(video.get("r_frame_rate")),
+        "hasAudio": audio is not None,
+    }
+    if audio:
+        meta.update({
+            "audioCodec": audio.get("codec_name"),
+            "sampleRate": int(audio.get("sample_rate") or 0),
+            "channels": audio.get("channels"),
+        })
+    return meta
+
+
+def probe_image(path: str) -> Dict[str, Any]:
+    """Returns width, height and format of an image file (reads the header only)."""
+    from PIL import Image
+
+    with Image.open(path) as im:
+        return {
+            "width": im.width,
+            "height": im.height,
+            "format": (im.format or "").lower(),
+        }
+
+
+def probe_media(path: str) -> Optional[Dict[str, Any]]:
+    """
+    Compact metadata for a stored media file, or None for unknown types.
+    Always includes kind ("image"/"video") and bytes.
+    """
+    ext = path.rsplit(".", 1)[-1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        meta = {"kind": "image", **probe_image(path)}
+    elif ext in VIDEO_EXTENSIONS:
+        meta = {"kind": "video", **probe_video(path)}
+    else:
+        return None
+    meta["bytes"] = os.path.getsize(path)
+    return meta
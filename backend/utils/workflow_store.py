@@ -0,0 +1,149 @@
+import time
+import uuid
+from typing import Dict, Any, Iterable, List, Optional
+
+from utils.local_db import _load_db, _transaction
+
+# Workflows live next to projects in the local DB under "workflows".
+# A workflow is one pipeline run; each completed step is checkpointed with its
+# output so a resumed run skips it instead of paying for it again.
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+CANCELLED = "cancelled"
+
+# Allowed status changes; failed, interrupted and cancelled runs may be resumed
+TRANSITIONS = {
+    QUEUED: {RUNNING, FAILED, INTERRUPTED, CANCELLED},
+    RUNNING: {COMPLETED, FAILED, INTERRUPTED, CANCELLED},
+    FAILED: {RUNNING},
+    INTERRUPTED: {RUNNING},
+    CANCELLED: {RUNNING},
+    COMPLETED: set(),
+}
+
+def create_workflow(kind: str, project_id: str, params: Dict[str, Any] = None) -> str:
+    """Registers a new queued workflow and returns its ID."""
+    workflow_id = f"wf_{uuid.uuid4().hex[:12]}"
+    now = time.time()
+    with _transaction() as db:
+        db.setdefault("workflows", {})[workflow_id] = {
+            "id": workflow_id,
+            "kind": kind,
+            "projectId": project_id,
+            "params": params or {},
+            "status": QUEUED,
+            "steps": {},
+            "attempts": 0,
+            "createdAt": now,
+            "updatedAt": now,
+        }
+    return workflow_id
+
+def transition(workflow_id: str, status: str, updates: Dict[str, Any] = None) -> Dict[str, Any]:
+    """
+    Moves a workflow to a new status (merging updates) and returns the record.
+    Raises KeyError for an unknown workflow and ValueError for a transition
+    TRANSITIONS does not allow, so two resumes cannot both claim a run.
+    """
+    with _transaction() as db:
+        workflow = db.get("workflows", {}).get(workflow_id)
+        if not workflow:
+            raise KeyError(f"Workflow {workflow_id} not found")
+        if status not in TRANSITIONS[workflow["status"]]:
+            raise ValueError(f"Workflow {workflow_id} cannot go from {workflow['status']} to {status}")
+        workflow.update(updates or {})
+        workflow["status"] = status
+        if status == RUNNING:
+            workflow["attempts"] = workflow.get("attempts", 0) + 1
+        workflow["updatedAt"] = time.time()
+        return dict(workflow)
+
+def checkpoint(workflow_id: str, step_id: str, output: Any = None):
+    """Records a completed step and its (JSON-serializable) output."""
+    with _transaction() as db:
+        workflow = db.get("workflows", {}).get(workflow_id)
+        if not workflow:
+            print(f"Warning: Workflow {workflow_id} not found.")
+            return
+        workflow.setdefault("steps", {})[step_id] = {"output": output, "completedAt": time.time()}
+        workflow["updatedAt"] = workflow["steps"][step_id]["completedAt"]
+
+def clear_checkpoints(project_id: str, prefixes: Iterable[str]) -> int:
+    """
+    Drops the checkpoints of every workflow in the project whose step ID starts
+    with one of prefixes (e.g. "scene_123:" after that scene is edited), so a
+    resumed run redoes those steps. Returns how many were dropped.
+    """
+    prefixes = tuple(prefixes)
+    cleared = 0
+    with _transaction() as db:
+        for workflow in db.get("workflows", {}).values():
+            if workflow.get("projectId") != project_id:
+                continue
+            steps = workflow.get("steps", {})
+            stale = [step_id for step_id in steps if step_id.startswith(prefixes)]
+            for step_id in stale:
+                del steps[step_id]
+            if stale:
+                workflow["updatedAt"] = time.time()
+                cleared += len(stale)
+    return cleared
+
+def get_checkpoint(workflow_id: str, step_id: str) -> Optional[Dict[str, Any]]:
+    """Returns {"output", "completedAt"} for a completed step, or None."""
+    return (get_workflow(workflow_id) or {}).get("steps", {}).get(step_id)
+
+def update_workflow(workflow_id: str, updates: Dict[str, Any]):
+    """Merges updates into a workflow record without changing its status."""
+    with _transaction() as db:
+        workflow = db.get("workflows", {}).get(workflow_id)
+        if not workflow:
+            print(f"Warning: Workflow {workflow_id} not found.")
+            return
+        updates = {k: v for k, v in updates.items() if k != "status"}
+        workflow.update(updates)
+        workflow["updatedAt"] = time.time()
+
+def append_workflow_item(workflow_id: str, key: str, items: List[Any]):
+    """Extends a list field of a workflow (e.g. scenes saved by an unfinished step)."""
+    with _transaction() as db:
+        workflow = db.get("workflows", {}).get(workflow_id)
+        if not workflow:
+            print(f"Warning: Workflow {workflow_id} not found.")
+            return
+        workflow.setdefault(key, []).extend(items)
+        workflow["updatedAt"] = time.time()
+
+def get_workflow(workflow_id: str) -> Optional[Dict[str, Any]]:
+    """Retrieves a workflow."""
+    return _load_db().get("workflows", {}).get(workflow_id)
+
+def list_workflows(project_id: str = None, status: str = None) -> List[Dict[str, Any]]:
+    """Returns workflows matching the given filters, newest first."""
+    workflows = _load_db().get("workflows", {}).values()
+    matches = [
+        w for w in workflows
+        if (project_id is None or w.get("projectId") == project_id)
+        and (status is None or w.get("status") == status)
+    ]
+    return sorted(matches, key=lambda w: w.get("createdAt", 0), reverse=True)
+
+def mark_interrupted() -> List[str]:
+    """
+    Marks every running or queued workflow as interrupted and returns their IDs.
+    Called at startup: the local DB belongs to a single backend process, so a
+    workflow still "running" then was cut off by a crash or redeploy, and one
+    still "queued" lost the background task that would have started it.
+    """
+    interrupted = []
+    with _transaction() as db:
+        for workflow in db.get("workflows", {}).values():
+            if workflow.get("status") in (RUNNING, QUEUED):
+                workflow["status"] = INTERRUPTED
+                workflow["updatedAt"] = time.time()
+                interrupted.append(workflow["id"])
+    return interrupted
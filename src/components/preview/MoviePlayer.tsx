@@ -61,13 +61,17 @@ export const MoviePlayer: React.FC<MoviePlayerProps> = ({ scene }) => {
     if (scene.videoUrl) {
         return (
             <div className="w-full h-full bg-black">
+                {/* HLS first where the browser plays it natively; otherwise the faststart MP4 */}
                 <video
-                    src={scene.videoUrl}
+                    key={scene.videoUrl}
                     controls
                     autoPlay
                     loop
                     className="w-full h-full object-contain"
-                />
+                >
+                    {scene.hlsUrl && <source src={scene.hlsUrl} type="application/vnd.apple.mpegurl" />}
+                    <source src={scene.videoUrl} type="video/mp4" />
+                </video>
             </div>
         );
     }
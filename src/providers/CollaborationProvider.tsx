@@ -9,6 +9,7 @@ import { Scene } from "@/agents/writer"; // Re-using Scene interface, might need
 export interface SceneWithState extends Scene {
     imageUrl?: string;
     videoUrl?: string;
+    hlsUrl?: string;
     videoComposition?: any;
     status?: string;
     lockedBy?: string;